@@ -0,0 +1,46 @@
+"""Throughput of the sync ``_call`` vs the native ``_acall`` for N concurrent questions.
+
+    python benchmarks/async_throughput.py --questions 32 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+from fakes import FakeSagemakerRuntime, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--query-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    database = sales_database(query_latency=args.query_latency)
+    chain = SQLDatabaseChainWithInsight.from_llm(
+        fake_llm(FakeSagemakerRuntime(latency=args.llm_latency)), database
+    )
+    questions = [f"What is total sale amount of Fruits ({i})" for i in range(args.questions)]
+
+    start = time.perf_counter()
+    for question in questions:
+        chain(question)
+    sync_elapsed = time.perf_counter() - start
+
+    async def run_all():
+        return await asyncio.gather(*(chain.acall(q) for q in questions))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    async_elapsed = time.perf_counter() - start
+
+    print(f"{'mode':<8}{'seconds':>10}{'questions/s':>14}")
+    for mode, elapsed in (("sync", sync_elapsed), ("async", async_elapsed)):
+        print(f"{mode:<8}{elapsed:>10.2f}{len(questions) / elapsed:>14.1f}")
+    print(f"speedup: {sync_elapsed / async_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Time and memory to fetch Athena results with the REST vs Arrow cursors.
+
+Queries go through ``QueryDatabase.run_query`` on the engine
+``get_database()`` builds, with a fake Athena client (DuckDB underneath)
+and moto's S3 server standing in for the staging bucket. ``GetQueryResults``
+pages cost ``--page-latency`` seconds each; the Arrow cursors download the
+CSV (or, with UNLOAD, Parquet) result from the local S3 instead.
+
+    python benchmarks/athena_results.py --rows 1000 10000 100000
+
+Peak memory is the Python heap (tracemalloc); Arrow's own buffers are not
+included, but they are released once rows are built.
+"""
+import argparse
+import time
+import tracemalloc
+import warnings
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fakes import ROOT, FakeAthenaClient, LocalS3, athena_database
+
+RETAIL_PARQUET = f"{ROOT}/samples/data_parquet/retail.parquet"
+MODES = [("rest", False), ("arrow", False), ("arrow", True)]
+SQL = "SELECT * FROM sales"
+
+
+def sales_table(rows):
+    sample = pq.read_table(RETAIL_PARQUET)
+    copies = -(-rows // sample.num_rows)
+    return pa.concat_tables([sample] * copies).slice(0, rows)
+
+
+def measure(database, sql):
+    # timed without tracemalloc, which slows down the Python-heavy REST path
+    started = time.perf_counter()
+    count = len(database.run_query(sql))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    database.run_query(sql)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--page-latency", type=float, default=0.05,
+                        help="seconds per GetQueryResults call")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", FutureWarning)
+
+    with LocalS3() as s3:
+        s3.patch_arrow_filesystem()
+        print(f"{'rows':>8}  {'cursor':<14}{'seconds':>9}{'pages':>7}{'peak MiB':>10}")
+        for rows in args.rows:
+            client = FakeAthenaClient(s3, sales_table(rows), page_latency=args.page_latency)
+            for cursor, unload in MODES:
+                database = athena_database(client, cursor, unload)
+                client.prepare(SQL)
+                pages = client.pages
+                count, elapsed, peak = measure(database, SQL)
+                assert count == rows, (cursor, count)
+                name = f"{cursor}+unload" if unload else cursor
+                print(
+                    f"{rows:>8}  {name:<14}{elapsed:>9.2f}{(client.pages - pages) // 2:>7}"
+                    f"{peak / 2 ** 20:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Local stand-ins for the SageMaker endpoint and Athena used by the benchmarks."""
+import csv
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# same layout the Lambda sees: the common layer plus the handler directory
+sys.path[:0] = [
+    os.path.join(ROOT, "resources/lambda/common/python"),
+    os.path.join(ROOT, "resources/lambda/lambda_custom"),
+]
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from text2sql.database import QueryDatabase, QueryResult  # noqa: E402
+
+RETAIL_CSV = os.path.join(ROOT, "samples/data/retail.csv")
+SALES_COLUMNS = ["transaction_date", "user_id", "product", "price"]
+
+CANNED_SQL = "SELECT SUM(price) FROM sales WHERE product = 'Fruits'"
+
+
+def default_responder(prompt: str) -> str:
+    if prompt.rstrip().endswith("SQLQuery:"):
+        return f" {CANNED_SQL}"
+    if "My Insight:" in prompt:
+        return "Fruits make up a steady share of revenue."
+    return "The total sale amount of Fruits is the sum above."
+
+
+class FakeSagemakerRuntime:
+    """Mimics the ``sagemaker-runtime`` client that ``SagemakerEndpoint`` calls."""
+
+    def __init__(self, latency: float = 0.0, responder: Callable[[str], str] = default_responder):
+        self.latency = latency
+        self.responder = responder
+        self.calls = 0
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType, Accept, **kwargs):
+        self.calls += 1
+        prompt = json.loads(Body)["inputs"]
+        time.sleep(self.latency)
+        payload = [{"generated_text": self.responder(prompt)}]
+        return {"Body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_endpoint_with_response_stream(self, EndpointName, Body, ContentType, **kwargs):
+        self.calls += 1
+        prompt = json.loads(Body)["inputs"]
+        return {"Body": self._stream_events(self.responder(prompt))}
+
+    def _stream_events(self, text: str, part_size: int = 7):
+        # TGI emits one server-sent event per token; the endpoint then cuts the
+        # byte stream at arbitrary offsets, which the small payload parts mimic
+        tokens = text.split(" ")
+        for i, token in enumerate(tokens):
+            time.sleep(self.latency / len(tokens))
+            event = b"data:" + json.dumps({
+                "token": {"text": token if i == 0 else f" {token}", "special": False},
+                "generated_text": text if i == len(tokens) - 1 else None,
+            }).encode("utf-8") + b"\n\n"
+            for offset in range(0, len(event), part_size):
+                yield {"PayloadPart": {"Bytes": event[offset:offset + part_size]}}
+
+
+class SlowSQLDatabase(QueryDatabase):
+    """QueryDatabase that adds a fixed delay per query, standing in for Athena's queue."""
+
+    query_latency: float = 0.0
+
+    def run_query(self, command: str, cancel_token=None) -> QueryResult:
+        time.sleep(self.query_latency)
+        return super().run_query(command, cancel_token)
+
+
+def sales_database(
+        csv_path: str = RETAIL_CSV,
+        query_latency: float = 0.0,
+        sample_rows: int = 3,
+        directory: Optional[str] = None,
+) -> QueryDatabase:
+    """Load ``samples/data/retail.csv`` into a file-backed SQLite ``sales`` table.
+
+    A file (not ``sqlite://``) so every thread sees the same data.
+    """
+    directory = directory or tempfile.mkdtemp(prefix="text2sql-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'retail.db')}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS sales "
+            "(transaction_date DATE, user_id VARCHAR, product VARCHAR, price DOUBLE)"
+        ))
+        with open(csv_path) as f:
+            rows = [dict(zip(SALES_COLUMNS, row)) for row in csv.reader(f)]
+        connection.execute(
+            text("INSERT INTO sales VALUES (:transaction_date, :user_id, :product, :price)"),
+            rows,
+        )
+    database = SlowSQLDatabase(engine, sample_rows_in_table_info=sample_rows)
+    database.query_latency = query_latency
+    return database
+
+
+def fake_llm(runtime: FakeSagemakerRuntime, streaming: bool = False):
+    from insight_chain import ContentHandler
+    from text2sql.streaming import StreamingSagemakerEndpoint
+
+    llm = StreamingSagemakerEndpoint(
+        endpoint_name="fake-endpoint",
+        region_name="us-east-1",
+        model_kwargs={"temperature": 0.01, "max_new_tokens": 200},
+        content_handler=ContentHandler(),
+        streaming=streaming,
+    )
+    llm.client = runtime
+    return llm
+
+
+class LocalS3:
+    """moto's S3 server on localhost, standing in for the Athena staging bucket.
+
+    boto3 finds it through ``AWS_ENDPOINT_URL_S3``; pyarrow's S3 filesystem
+    (which pyathena's ArrowCursor reads with) has to be given the endpoint,
+    see ``patch_arrow_filesystem``.
+    """
+
+    def __init__(self, bucket: str = "text2sql-bench", port: int = 0):
+        import logging
+
+        from moto.server import ThreadedMotoServer
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self.bucket = bucket
+        self.server = ThreadedMotoServer(ip_address="127.0.0.1", port=port or _free_port())
+        self.endpoint = f"http://127.0.0.1:{self.server._port}"
+
+    def __enter__(self) -> "LocalS3":
+        os.environ.update({
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_DEFAULT_REGION": "us-east-1",
+            "AWS_ENDPOINT_URL_S3": self.endpoint,
+        })
+        self.server.start()
+        import boto3
+
+        self.client = boto3.client("s3")
+        self.client.create_bucket(Bucket=self.bucket)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.stop()
+
+    def patch_arrow_filesystem(self) -> None:
+        from pyarrow import fs
+        from pyathena.arrow.result_set import AthenaArrowResultSet
+
+        endpoint = self.endpoint
+
+        def local_filesystem(result_set):
+            return fs.S3FileSystem(
+                access_key="bench", secret_key="bench", region="us-east-1",
+                endpoint_override=endpoint, scheme="http",
+            )
+
+        AthenaArrowResultSet._AthenaArrowResultSet__s3_file_system = local_filesystem
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+ARROW_TO_ATHENA_TYPES = {
+    "string": "varchar", "large_string": "varchar", "double": "double", "float": "float",
+    "int64": "bigint", "int32": "integer", "date32[day]": "date", "bool": "boolean",
+}
+
+
+class FakeAthenaClient:
+    """Mimics the ``athena`` client pyathena calls, running queries on DuckDB.
+
+    Results are written where Athena writes them: a quoted CSV in the
+    staging directory, or Parquet files plus a manifest for ``UNLOAD``.
+    ``GetQueryResults`` pages 1,000 rows per call, each taking
+    ``page_latency`` seconds.
+    """
+
+    UNLOAD = re.compile(r"^\s*UNLOAD\s*\((.*)\)\s*TO\s*'([^']+)'", re.IGNORECASE | re.DOTALL)
+
+    def __init__(self, s3: LocalS3, table, page_latency: float = 0.05, staging_prefix: str = "Unsaved/"):
+        import duckdb
+
+        self.s3 = s3
+        self.page_latency = page_latency
+        self.staging_prefix = staging_prefix
+        self.connection = duckdb.connect()
+        self.connection.register("sales", table)
+        self.executions: Dict[str, Dict] = {}
+        self.results: Dict[str, str] = {}
+        self._tables: Dict[str, object] = {}
+        self._rows: Dict[str, list] = {}
+        self.pages = 0
+
+    def prepare(self, sql: str):
+        """Run ``sql`` ahead of time, so the fake's own work is not measured."""
+        if sql not in self._tables:
+            table = self.connection.execute(sql).fetch_arrow_table()
+            self._tables[sql] = table
+            self._rows[sql] = [
+                {"Data": [{} if v is None else {"VarCharValue": str(v)} for v in row.values()]}
+                for row in table.to_pylist()
+            ]
+        return self._tables[sql]
+
+    def start_query_execution(self, QueryString, **kwargs):
+        import uuid
+
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+
+        query_id = str(uuid.uuid4())
+        output_key = f"{self.staging_prefix}{query_id}.csv"
+        statistics = {}
+        unload = self.UNLOAD.match(QueryString)
+        if unload:
+            sql = unload.group(1).strip()
+            table = self.prepare(sql)
+            location = unload.group(2)[len(f"s3://{self.s3.bucket}/"):]
+            data_key = f"{location}{query_id}_00000.parquet"
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer, compression="snappy")
+            self.s3.client.put_object(Bucket=self.s3.bucket, Key=data_key, Body=buffer.getvalue())
+            output_key = f"{self.staging_prefix}{query_id}-manifest.csv"
+            self.s3.client.put_object(
+                Bucket=self.s3.bucket, Key=output_key, Body=f"s3://{self.s3.bucket}/{data_key}".encode()
+            )
+            statistics["DataManifestLocation"] = f"s3://{self.s3.bucket}/{output_key}"
+        else:
+            sql = QueryString.strip()
+            table = self.prepare(sql)
+            buffer = io.BytesIO()
+            pacsv.write_csv(table, buffer, pacsv.WriteOptions(quoting_style="all_valid"))
+            self.s3.client.put_object(Bucket=self.s3.bucket, Key=output_key, Body=buffer.getvalue())
+
+        self.results[query_id] = sql
+        self.executions[query_id] = {
+            "QueryExecutionId": query_id,
+            "Query": QueryString,
+            "StatementType": "DML",
+            "SubstatementType": "UNLOAD" if unload else "SELECT",
+            "ResultConfiguration": {"OutputLocation": f"s3://{self.s3.bucket}/{output_key}"},
+            "Status": {"State": "SUCCEEDED"},
+            "Statistics": statistics,
+        }
+        return {"QueryExecutionId": query_id}
+
+    def list_table_metadata(self, **kwargs):
+        # only for SQLDatabase's reflection at construction time
+        return {"TableMetadataList": []}
+
+    def get_query_execution(self, QueryExecutionId):
+        return {"QueryExecution": self.executions[QueryExecutionId]}
+
+    def get_query_results(self, QueryExecutionId, MaxResults=1000, NextToken=None):
+        self.pages += 1
+        time.sleep(self.page_latency)
+        sql = self.results[QueryExecutionId]
+        table = self._tables[sql]
+        column_info = [
+            {
+                "Name": field.name, "Label": field.name,
+                "Type": ARROW_TO_ATHENA_TYPES.get(str(field.type), "varchar"),
+                "Precision": 0, "Scale": 0, "Nullable": "UNKNOWN", "CaseSensitive": True,
+            }
+            for field in table.schema
+        ]
+        # The first page starts with the header row, as Athena's does
+        start = int(NextToken or 0)
+        header = [] if start else [{"Data": [{"VarCharValue": f.name} for f in table.schema]}]
+        size = MaxResults - len(header)
+        rows = header + self._rows[sql][start:start + size]
+        response = {"ResultSet": {"Rows": rows, "ResultSetMetadata": {"ColumnInfo": column_info}}}
+        if start + size < table.num_rows:
+            response["NextToken"] = str(start + size)
+        return response
+
+
+def athena_database(fake_client: FakeAthenaClient, cursor: str = "rest", unload: bool = False) -> QueryDatabase:
+    """``get_database()``'s Athena engine with its client swapped for ``fake_client``."""
+    from sqlalchemy import event
+    from text2sql.backends import athena_engine
+
+    os.environ.update({
+        "ATHENA_BUCKET": fake_client.s3.bucket,
+        "ATHENA_DATABASE": "default",
+        "ATHENA_REGION": "us-east-1",
+        "ATHENA_CURSOR": cursor,
+        "ATHENA_UNLOAD": str(unload).lower(),
+    })
+    engine = athena_engine()
+
+    @event.listens_for(engine, "connect")
+    def use_fake_client(dbapi_connection, connection_record):
+        dbapi_connection._client = fake_client
+
+    return QueryDatabase(engine, sample_rows_in_table_info=0)
@@ -0,0 +1,101 @@
+"""Cold-import time of the Lambda handler modules, with a budget check.
+
+Each handler is imported in fresh interpreters under ``-X importtime`` with
+the same ``sys.path`` as in Lambda (common layer + handler directory). The
+median cumulative time of ``import handler`` is compared with its budget,
+and the slowest top-level packages are listed. The deferred line shows what
+the first request pays for the imports moved out of the module.
+
+    python benchmarks/import_time.py             # report
+    python benchmarks/import_time.py --check     # exit 1 over budget (CI)
+
+Budgets are for a developer machine; a 256 MB Lambda has a fraction of a
+vCPU, so real cold imports take several times longer.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON = os.path.join(ROOT, "resources/lambda/common/python")
+
+# handler directory -> (budget in ms for `import handler`, imports deferred to first use)
+HANDLERS = {
+    "lambda_custom": (
+        100,
+        "import insight_chain, text2sql.backends, text2sql.streaming",
+    ),
+    "playground": (
+        100,
+        "from langchain import SQLDatabase, SQLDatabaseChain, SagemakerEndpoint; "
+        "import text2sql.backends, text2sql.callbacks",
+    ),
+}
+
+
+def import_times(handler_dir, statement):
+    """Run ``statement`` under -X importtime; return {module: (self_us, cumulative_us, depth)}."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([COMMON, os.path.join(ROOT, "resources/lambda", handler_dir)]),
+        "PREWARM_CHAIN": "false",
+        "SCHEMA_CACHE_PATH": "",
+    }
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return times
+
+
+def top_packages(times, count):
+    by_package = defaultdict(int)
+    for name, (self_us, _, _) in times.items():
+        by_package[name.split(".")[0]] += self_us
+    return sorted(by_package.items(), key=lambda item: -item[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--budget-ms", type=float, help="override every handler's budget")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a handler is over budget")
+    args = parser.parse_args()
+
+    over_budget = []
+    for handler_dir, (budget, deferred) in HANDLERS.items():
+        budget = args.budget_ms or budget
+        runs = [import_times(handler_dir, "import handler") for _ in range(args.runs)]
+        cold = statistics.median(run["handler"][1] for run in runs) / 1000
+        deferred_ms = statistics.median(
+            sum(c for c, d in ((t[1], t[2]) for t in import_times(handler_dir, deferred).values()) if d == 0)
+            for _ in range(max(1, args.runs // 2))
+        ) / 1000
+
+        status = "ok" if cold <= budget else "OVER BUDGET"
+        print(f"{handler_dir}: import handler {cold:.1f} ms (budget {budget:.0f} ms) {status}")
+        print(f"  deferred to first use: {deferred_ms:.1f} ms")
+        for package, self_us in top_packages(runs[len(runs) // 2], args.top):
+            print(f"  {package:<24}{self_us / 1000:>8.1f} ms")
+        if cold > budget:
+            over_budget.append(handler_dir)
+
+    if args.check and over_budget:
+        sys.exit(f"import time over budget: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Response size and latency with large results offloaded to S3.
+
+Asks for every row of the sales table (10,000 rows) and builds the
+handler's JSON response body with and without ``ResultOffload``, against
+moto's S3 server (``fakes.LocalS3``); the first offloaded run uploads,
+later runs find the object by its hash. The presigned URL in the
+response is then downloaded and checked to hold all rows.
+
+    python benchmarks/offload.py --format parquet
+"""
+import argparse
+import gzip
+import io
+import json
+import statistics
+import time
+import urllib.request
+
+from fakes import FakeSagemakerRuntime, LocalS3, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+from text2sql.database import QueryResult
+from text2sql.offload import DEFAULT_THRESHOLD_BYTES, FORMATS, ResultOffload
+
+QUESTION = "List all sales"
+ALL_ROWS_SQL = "SELECT transaction_date, user_id, product, price FROM sales"
+
+
+def responder(prompt):
+    if prompt.rstrip().endswith("SQLQuery:"):
+        return f" {ALL_ROWS_SQL}"
+    return "Insight." if "My Insight:" in prompt else "Answer."
+
+
+def respond(chain, runs):
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        outputs = chain({"query": QUESTION}, return_only_outputs=True)
+        body = json.dumps({"sql": {"query": QUESTION, **outputs}})
+        seconds.append(time.perf_counter() - started)
+    return outputs, body, statistics.median(seconds)
+
+
+def read_rows(url, result_format):
+    with urllib.request.urlopen(url) as response:
+        data = response.read()
+    if result_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(io.BytesIO(data)).num_rows
+    return len(gzip.decompress(data).splitlines())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD_BYTES)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    database = sales_database()
+    llm = fake_llm(FakeSagemakerRuntime(responder=responder))
+    with LocalS3() as s3:
+        offload = ResultOffload(
+            s3.bucket, threshold_bytes=args.threshold, result_format=args.format, client=s3.client
+        )
+        # imports and the S3 connection, as on a warm Lambda
+        ResultOffload(s3.bucket, threshold_bytes=0, result_format=args.format, client=s3.client) \
+            .offload(QueryResult(["warmup"], [(1,)]))
+        print(f"{'mode':<12}{'body KiB':>10}{'p50 ms':>8}")
+        for label, result_offload in (("inline", None), ("offloaded", offload)):
+            chain = SQLDatabaseChainWithInsight.from_llm(
+                llm, database, result_offload=result_offload
+            )
+            outputs, body, seconds = respond(chain, args.runs)
+            print(f"{label:<12}{len(body) / 1024:>10.1f}{seconds * 1000:>8.0f}")
+        pointer = outputs["intermediate_steps"][2]["offload"]
+        rows = read_rows(pointer["url"], args.format)
+        print(
+            f"{pointer['uri']}: {pointer['bytes'] / 1024:.1f} KiB {args.format} "
+            f"for {pointer['result_bytes'] / 1024:.1f} KiB of rows, {rows}/{pointer['rows']} rows via the URL"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Latency and success rate of routing questions between a fast and a strong model.
+
+Two local SageMaker stand-ins answer the same questions: the fast one in
+``--fast-latency`` seconds, writing a failing query (a column that does not
+exist) for ``--easy-error`` of the simple questions and ``--hard-error`` of
+the complex ones; the strong one in ``--strong-latency`` seconds, always
+right. Each question is asked once, without client retries.
+
+    python benchmarks/routing.py --questions 60 --complex-share 0.3
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from fakes import FakeSagemakerRuntime, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+from text2sql.routing import ModelRouter
+
+PRODUCTS = ["Chips", "Fruits", "Ice cream", "Milk", "Shampoo"]
+SIMPLE = {
+    "What is total sale amount of {a}": "SELECT SUM(price) FROM sales WHERE product = '{a}'",
+    "How many sales of {a} were there": "SELECT COUNT(*) FROM sales WHERE product = '{a}'",
+    "What is the highest price paid for {a}": "SELECT MAX(price) FROM sales WHERE product = '{a}'",
+}
+COMPLEX = {
+    "Compare the monthly revenue of {a} versus {b}":
+        "SELECT strftime('%Y-%m', transaction_date) AS month, product, SUM(price) FROM sales "
+        "WHERE product IN ('{a}', '{b}') GROUP BY month, product",
+    "Which users bought {a} but never bought {b}":
+        "SELECT DISTINCT user_id FROM sales WHERE product = '{a}' AND user_id NOT IN "
+        "(SELECT user_id FROM sales WHERE product = '{b}')",
+    "Show the running total of daily sales of {a}":
+        "SELECT transaction_date, SUM(SUM(price)) OVER (ORDER BY transaction_date) FROM sales "
+        "WHERE product = '{a}' GROUP BY transaction_date",
+}
+
+
+def make_questions(count, complex_share, seed):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        hard = rng.random() < complex_share
+        question, sql = rng.choice(list((COMPLEX if hard else SIMPLE).items()))
+        a, b = rng.sample(PRODUCTS, 2)
+        questions.append((question.format(a=a, b=b), sql.format(a=a, b=b), hard))
+    return questions
+
+
+class ModelRuntime(FakeSagemakerRuntime):
+    """Writes the known SQL of each question, wrong at the given rates."""
+
+    def __init__(self, latency, answers, easy_error, hard_error, seed):
+        super().__init__(latency=latency, responder=self.write)
+        self.answers = answers
+        self.easy_error = easy_error
+        self.hard_error = hard_error
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def write(self, prompt):
+        if not prompt.rstrip().endswith("SQLQuery:"):
+            return "Insight." if "My Insight:" in prompt else "Answer."
+        question = prompt.rstrip()[:-len("SQLQuery:")].rstrip().splitlines()[-1]
+        question = question.split("Question:", 1)[-1].strip()
+        sql, hard = self.answers[question]
+        with self._lock:
+            wrong = self._rng.random() < (self.hard_error if hard else self.easy_error)
+        return " " + (sql.replace("price", "amount") if wrong else sql)
+
+
+def run(args, questions, mode):
+    answers = {question: (sql, hard) for question, sql, hard in questions}
+    fast = ModelRuntime(args.fast_latency, answers, args.easy_error, args.hard_error, args.seed)
+    strong = ModelRuntime(args.strong_latency, answers, 0.0, 0.0, args.seed)
+    router = None
+    if mode == "strong only":
+        llm = fake_llm(strong)
+    else:
+        llm = fake_llm(fast)
+    if mode.startswith("routed"):
+        router = ModelRouter(llm, fake_llm(strong), escalate=mode == "routed + escalation")
+    chain = SQLDatabaseChainWithInsight.from_llm(
+        llm, sales_database(query_latency=args.query_latency), router=router
+    )
+    latencies, answered = [], 0
+    for question, _, _ in questions:
+        started = time.perf_counter()
+        try:
+            chain({"query": question}, return_only_outputs=True)
+            answered += 1
+        except Exception:
+            pass
+        latencies.append(time.perf_counter() - started)
+    return latencies, answered, fast.calls, strong.calls, router.stats() if router else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--complex-share", type=float, default=0.3)
+    parser.add_argument("--fast-latency", type=float, default=0.1)
+    parser.add_argument("--strong-latency", type=float, default=0.5)
+    parser.add_argument("--easy-error", type=float, default=0.05)
+    parser.add_argument("--hard-error", type=float, default=0.6)
+    parser.add_argument("--query-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions, args.complex_share, args.seed)
+    print(f"{'mode':<22}{'answered':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'fast':>7}{'strong':>8}")
+    for mode in ("fast only", "strong only", "routed", "routed + escalation"):
+        latencies, answered, fast_calls, strong_calls, stats = run(args, questions, mode)
+        mean = statistics.mean(latencies) * 1000
+        p50 = statistics.median(latencies) * 1000
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000
+        print(
+            f"{mode:<22}{answered:>7}/{args.questions:<2}{mean:>10.0f}{p50:>10.0f}{p95:>10.0f}"
+            f"{fast_calls:>7}{strong_calls:>8}"
+        )
+        if stats:
+            print(f"  {stats}")
+
+
+if __name__ == "__main__":
+    main()
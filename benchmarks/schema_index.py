@@ -0,0 +1,140 @@
+"""Prompt size and table recall of ``SchemaIndex`` over a large catalog.
+
+Adds ``--tables`` synthetic tables (ERP/CRM/web/finance style names and
+columns) next to the ``sales`` table in the local SQLite database, then
+compares the ``table_info`` the SQL prompt would carry for all tables with
+the top-k tables the index picks per question. Also times the first index
+build, the per-question selection and an incremental refresh after one
+table changes.
+
+    python benchmarks/schema_index.py --tables 300 --top-k 5
+"""
+import argparse
+import statistics
+import time
+
+from fakes import sales_database
+from sqlalchemy import text
+
+from text2sql.database import QueryDatabase
+from text2sql.schema_index import SchemaIndex, TableDocument, catalog_documents
+from text2sql.serialize import estimate_tokens
+
+SYSTEMS = ["erp", "crm", "web", "fin", "hr", "ops", "mkt", "wms"]
+ENTITIES = {
+    "orders": ["order_id", "customer_id", "order_date", "order_total", "currency"],
+    "order_items": ["order_id", "sku", "quantity", "unit_price", "discount"],
+    "customers": ["customer_id", "name", "email", "signup_date", "segment"],
+    "employees": ["employee_id", "name", "department", "salary", "hire_date"],
+    "departments": ["department_id", "name", "cost_center", "manager_id"],
+    "invoices": ["invoice_id", "customer_id", "amount_due", "due_date", "paid"],
+    "payments": ["payment_id", "invoice_id", "amount", "method", "paid_at"],
+    "shipments": ["shipment_id", "order_id", "carrier", "shipped_at", "delivered_at"],
+    "returns": ["return_id", "order_id", "reason", "refund_amount", "returned_at"],
+    "inventory": ["sku", "warehouse_id", "on_hand", "reserved", "snapshot_date"],
+    "warehouses": ["warehouse_id", "city", "country", "capacity"],
+    "suppliers": ["supplier_id", "name", "country", "rating"],
+    "purchase_orders": ["po_id", "supplier_id", "sku", "quantity", "expected_at"],
+    "campaigns": ["campaign_id", "channel", "budget", "start_date", "end_date"],
+    "page_views": ["session_id", "url", "referrer", "viewed_at", "device"],
+    "sessions": ["session_id", "user_id", "started_at", "duration_seconds", "country"],
+    "tickets": ["ticket_id", "customer_id", "priority", "opened_at", "closed_at"],
+    "budgets": ["cost_center", "fiscal_year", "planned", "actual"],
+    "ledger_entries": ["entry_id", "account", "debit", "credit", "posted_at"],
+    "promotions": ["promotion_id", "sku", "discount_pct", "valid_from", "valid_to"],
+}
+COMMON = ["created_at", "updated_at", "status", "region"]
+# Glue column comments of the sales table (stack/cdk_stack.py), which SQLite cannot store
+SALES_COMMENTS = {
+    "transaction_date": "Transaction date",
+    "user_id": "The user who make the purchase",
+    "product": "product name. e.g. 'Fruits', 'Ice scream', 'Milk'",
+    "price": "The price of the product",
+}
+
+# question -> a word the relevant table's name contains
+QUESTIONS = {
+    "What is total sale amount of Fruits": "sales",
+    "How many users bought Milk": "sales",
+    "Which product has the highest price in sales": "sales",
+    "What is the average salary per department of employees": "employees",
+    "Which carrier delivered the most shipments last month": "shipments",
+    "How much refund was paid for returns by reason": "returns",
+    "Which suppliers have the best rating in Germany": "suppliers",
+    "What is the budget of each marketing campaign by channel": "campaigns",
+}
+
+
+def glue_catalog(database):
+    """catalog_documents plus the comments Athena's ListTableMetadata would return."""
+    documents = catalog_documents(database)
+    for i, document in enumerate(documents):
+        if document.name == "sales":
+            columns = [(n, t, SALES_COMMENTS.get(n, c)) for n, t, c in document.columns]
+            documents[i] = TableDocument(document.name, columns, "sample sales data")
+    return documents
+
+
+def add_tables(database, count):
+    names = []
+    with database._engine.begin() as connection:
+        for i in range(count):
+            entity = list(ENTITIES)[i % len(ENTITIES)]
+            system = SYSTEMS[(i // len(ENTITIES)) % len(SYSTEMS)]
+            name = f"{system}_{entity}" + (f"_v{i // (len(ENTITIES) * len(SYSTEMS))}" if i >= len(ENTITIES) * len(SYSTEMS) else "")
+            columns = ENTITIES[entity] + COMMON
+            connection.execute(text(f"CREATE TABLE {name} ({', '.join(c + ' VARCHAR' for c in columns)})"))
+            connection.execute(text(f"INSERT INTO {name} VALUES ({', '.join(repr(f'{c}_1') for c in columns)})"))
+            names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    sales = sales_database()
+    names = add_tables(sales, args.tables)
+    # SQLDatabase reflects its tables when constructed
+    database = QueryDatabase(sales._engine, sample_rows_in_table_info=3)
+    index = SchemaIndex(top_k=args.top_k, catalog=glue_catalog)
+
+    started = time.perf_counter()
+    index.refresh(database)
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    full_tokens = estimate_tokens(database.get_table_info())
+    full_info = time.perf_counter() - started
+    print(f"{len(names) + 1} tables: index built in {build * 1000:.0f} ms, "
+          f"full table_info {full_tokens} tokens ({full_info * 1000:.0f} ms to build)")
+
+    print(f"{'question':<58}{'hit':>5}{'tokens':>8}{'select ms':>11}")
+    hits, tokens, latencies = 0, [], []
+    for question, expected in QUESTIONS.items():
+        started = time.perf_counter()
+        tables, report = index.select(database, question)
+        latencies.append(time.perf_counter() - started)
+        prompt_tokens = estimate_tokens(database.get_table_info(tables))
+        hit = any(expected in t for t in tables or [])
+        hits += hit
+        tokens.append(prompt_tokens)
+        print(f"{question[:56]:<58}{'yes' if hit else 'no':>5}{prompt_tokens:>8}{latencies[-1] * 1000:>11.2f}")
+    print(f"recall@{args.top_k} {hits}/{len(QUESTIONS)}, median prompt schema "
+          f"{statistics.median(tokens):.0f} tokens vs {full_tokens} "
+          f"({1 - statistics.median(tokens) / full_tokens:.1%} smaller), "
+          f"median select {statistics.median(latencies) * 1000:.2f} ms")
+
+    with database._engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {names[0]} ADD COLUMN loyalty_tier VARCHAR"))
+    started = time.perf_counter()
+    changed = index.refresh(database)
+    print(f"refresh after altering one table: {changed} re-indexed in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
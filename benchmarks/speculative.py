@@ -0,0 +1,120 @@
+"""Latency and success rate of racing SQL candidates vs retrying the pipeline.
+
+The local SageMaker stand-in writes, per call, either the right query, a
+reformatted copy of it (de-duplicated before execution), a query on a
+column that does not exist (fails when it runs), or a slow cross join
+that only stops when cancelled. The baseline generates one candidate and
+retries the whole chain on failure, as clients do today; the speculative
+run races ``--candidates`` candidates once and cancels the losers.
+
+    python benchmarks/speculative.py --questions 40 --candidates 3 --failure-rate 0.3
+"""
+import argparse
+import io
+import json
+import random
+import statistics
+import threading
+import time
+
+from fakes import FakeSagemakerRuntime, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+from text2sql.speculative import SQLCandidateRace
+
+PRODUCTS = ["Chips", "Fruits", "Ice cream", "Milk", "Shampoo"]
+VARIANTS = {
+    "right": "SELECT SUM(price) FROM sales WHERE product = '{product}'",
+    "reformatted": "select sum(price)\n  from sales\n where product='{product}'",
+    "broken": "SELECT SUM(amount) FROM sales WHERE product = '{product}'",
+    "slow": "SELECT SUM(a.price) FROM sales a, sales b WHERE a.product = '{product}'",
+}
+
+
+class SamplingRuntime(FakeSagemakerRuntime):
+    """Draws a SQL variant per generation, as a sampling model would."""
+
+    def __init__(self, latency, failure_rate, slow_rate, seed):
+        super().__init__(latency=latency)
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType, Accept, **kwargs):
+        self.calls += 1
+        prompt = json.loads(Body)["inputs"]
+        time.sleep(self.latency)
+        payload = [{"generated_text": self.write(prompt)}]
+        return {"Body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def write(self, prompt):
+        if not prompt.rstrip().endswith("SQLQuery:"):
+            return "Insight." if "My Insight:" in prompt else "Answer."
+        product = prompt.rstrip()[:-len("SQLQuery:")].rstrip().rsplit(" of ", 1)[-1]
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.failure_rate:
+            variant = "broken"
+        elif draw < self.failure_rate + self.slow_rate:
+            variant = "slow"
+        else:
+            variant = "right" if draw < (1 + self.failure_rate + self.slow_rate) / 2 else "reformatted"
+        return " " + VARIANTS[variant].format(product=product)
+
+
+def ask(chain, question, candidates, attempts):
+    for attempt in range(attempts):
+        try:
+            return chain({"query": question, "sql_candidates": candidates}, return_only_outputs=True)
+        except Exception:
+            if attempt == attempts - 1:
+                return None
+
+
+def run(args, candidates, attempts):
+    runtime = SamplingRuntime(args.llm_latency, args.failure_rate, args.slow_rate, args.seed)
+    race = SQLCandidateRace(max_candidates=max(candidates, 1))
+    chain = SQLDatabaseChainWithInsight.from_llm(
+        fake_llm(runtime),
+        sales_database(query_latency=args.query_latency),
+        speculative=race,
+    )
+    latencies, answered = [], 0
+    for i in range(args.questions):
+        question = f"What is total sale amount of {PRODUCTS[i % len(PRODUCTS)]}"
+        started = time.perf_counter()
+        answered += ask(chain, question, candidates, attempts) is not None
+        latencies.append(time.perf_counter() - started)
+    return latencies, answered, runtime.calls, race.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--candidates", type=int, default=3)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--query-latency", type=float, default=0.3)
+    parser.add_argument("--retries", type=int, default=2, help="pipeline retries of the baseline")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<22}{'answered':>10}{'p50 ms':>10}{'p95 ms':>10}{'LLM calls':>11}")
+    for label, candidates, attempts in (
+            (f"1 candidate, {args.retries} retries", 1, args.retries + 1),
+            (f"{args.candidates} candidates", args.candidates, 1),
+    ):
+        latencies, answered, calls, stats = run(args, candidates, attempts)
+        p50 = statistics.median(latencies) * 1000
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000
+        print(f"{label:<22}{answered:>7}/{args.questions:<2}{p50:>10.0f}{p95:>10.0f}{calls:>11}")
+        if stats["races"]:
+            print(f"  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Per-stage latency and allocation of ``SQLDatabaseChainWithInsight``.
+
+Runs the chain against the local SageMaker/Athena stand-ins in ``fakes.py``
+and reports p50/p95/p99 wall time and peak allocation for each stage
+(table info, SQL generation, execution, serialization, answer, insight).
+
+    python benchmarks/stages.py --iterations 50 --llm-latency 0.05
+    python benchmarks/stages.py --replay questions.jsonl --with-caches
+    python benchmarks/stages.py --answer-policy scalar
+
+``--replay`` takes a JSONL file with one ``{"question": ...}`` (or
+``{"query": ...}``) object per line, e.g. questions taken from production logs.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from fakes import FakeSagemakerRuntime, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+from text2sql.answers import LLM, POLICIES, AnswerFormatter
+from text2sql.preflight import SQLPreflight
+from text2sql.result_cache import ResultCache
+from text2sql.schema_cache import SchemaCache
+from text2sql.sql_cache import InMemoryBackend, QuestionSQLCache
+from text2sql.timing import STAGES, StageTimings
+
+DEFAULT_QUESTIONS = [
+    "What is total sale amount of Fruits",
+    "How many users bought Milk",
+    "Which product has the highest revenue",
+]
+
+
+class StaticVersion:
+    """Data version that never changes, so cached results stay valid."""
+
+    def token(self) -> str:
+        return "static"
+
+
+def load_questions(path):
+    questions = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                questions.append(record.get("question") or record["query"])
+    return questions
+
+
+def build_chain(args):
+    database = sales_database(query_latency=args.query_latency)
+    caches = {}
+    if args.with_caches:
+        caches = {
+            "schema_cache": SchemaCache(),
+            "sql_cache": QuestionSQLCache(InMemoryBackend()),
+            "result_cache": ResultCache(StaticVersion()),
+        }
+    if args.preflight:
+        caches["preflight"] = SQLPreflight()
+    if args.answer_policy != LLM:
+        caches["answer_formatter"] = AnswerFormatter(args.answer_policy)
+    return SQLDatabaseChainWithInsight.from_llm(
+        fake_llm(FakeSagemakerRuntime(latency=args.llm_latency)),
+        database,
+        concurrent_generation=args.concurrent,
+        **caches,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--query-latency", type=float, default=0.02)
+    parser.add_argument("--replay", help="JSONL file of questions to replay")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="overlap answer and insight (allocation peaks then overlap too)")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="enable the schema, SQL and result caches")
+    parser.add_argument("--preflight", action="store_true",
+                        help="validate the SQL against the schema before it runs")
+    parser.add_argument("--answer-policy", choices=POLICIES, default=LLM,
+                        help="results whose answer is formatted without the model")
+    args = parser.parse_args()
+
+    questions = load_questions(args.replay) if args.replay else DEFAULT_QUESTIONS
+    chain = build_chain(args)
+
+    tracemalloc.start()
+    runs = []
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        timings = StageTimings(track_memory=True)
+        question = questions[i % len(questions)]
+        chain({"query": question, "stage_timings": timings}, return_only_outputs=True)
+        runs.append(timings)
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    print(f"{len(runs)} runs in {elapsed:.2f}s ({len(questions)} distinct questions)")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>12}")
+    for stage in STAGES:
+        seconds = [run.seconds[stage] for run in runs if stage in run.seconds]
+        if not seconds:
+            continue
+        p50, p95, p99 = np.percentile(np.array(seconds) * 1000, [50, 95, 99])
+        peak = max(run.peak_bytes.get(stage, 0) for run in runs) / 1024
+        print(f"{stage:<16}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{peak:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Bytes read and query time of the sales table stored as CSV vs Parquet.
+
+Runs typical generated queries with DuckDB over local copies of the sample
+data. Bytes read follows Athena's billing: the whole object for CSV, and
+only the column chunks a query touches for Parquet.
+
+    python benchmarks/storage_format.py --scale 100
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import duckdb
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RETAIL_PARQUET = os.path.join(ROOT, "samples/data_parquet/retail.parquet")
+ROW_GROUP_SIZE = 4_000_000
+
+QUERIES = {
+    "total_of_product": (
+        "SELECT SUM(price) FROM sales WHERE product = 'Fruits'",
+        ["price", "product"],
+    ),
+    "total_per_product": (
+        "SELECT product, SUM(price) FROM sales GROUP BY product",
+        ["price", "product"],
+    ),
+    "monthly_of_product": (
+        "SELECT date_trunc('month', transaction_date) AS month, SUM(price) "
+        "FROM sales WHERE product = 'Milk' GROUP BY 1 ORDER BY 1",
+        ["transaction_date", "price", "product"],
+    ),
+    "top_users": (
+        "SELECT user_id, SUM(price) AS spend FROM sales "
+        "GROUP BY user_id ORDER BY spend DESC LIMIT 10",
+        ["user_id", "price"],
+    ),
+}
+
+
+def build_files(directory, scale):
+    table = pa.concat_tables([pq.read_table(RETAIL_PARQUET)] * scale)
+    csv_path = os.path.join(directory, "sales.csv")
+    parquet_path = os.path.join(directory, "sales.parquet")
+    pacsv.write_csv(table, csv_path, write_options=pacsv.WriteOptions(include_header=False))
+    pq.write_table(table, parquet_path, compression="snappy", row_group_size=ROW_GROUP_SIZE)
+    return csv_path, parquet_path, table.num_rows
+
+
+def parquet_bytes_read(path, columns):
+    metadata = pq.ParquetFile(path).metadata
+    total = 0
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for c in range(row_group.num_columns):
+            chunk = row_group.column(c)
+            if chunk.path_in_schema in columns:
+                total += chunk.total_compressed_size
+    return total
+
+
+def time_query(connection, sql, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=10, help="copies of the 10k-row sample")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path, parquet_path, rows = build_files(directory, args.scale)
+        connection = duckdb.connect()
+        sources = {
+            "csv": (
+                "read_csv('{}', header=false, columns={{'transaction_date': 'DATE', "
+                "'user_id': 'VARCHAR', 'product': 'VARCHAR', 'price': 'DOUBLE'}})".format(csv_path)
+            ),
+            "parquet": f"read_parquet('{parquet_path}')",
+        }
+        csv_size = os.path.getsize(csv_path)
+        print(f"rows={rows} csv={csv_size} B parquet={os.path.getsize(parquet_path)} B")
+        print(f"{'query':<22}{'format':<9}{'bytes read':>14}{'median ms':>12}")
+        for name, (sql, columns) in QUERIES.items():
+            for fmt, source in sources.items():
+                connection.execute(f"CREATE OR REPLACE VIEW sales AS SELECT * FROM {source}")
+                elapsed = time_query(connection, sql, args.repeat)
+                read = csv_size if fmt == "csv" else parquet_bytes_read(parquet_path, columns)
+                print(f"{name:<22}{fmt:<9}{read:>14}{elapsed * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Time to first insight byte with and without token streaming.
+
+    python benchmarks/streaming_ttfb.py --llm-latency 2
+"""
+import argparse
+import time
+
+from fakes import FakeSagemakerRuntime, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+from text2sql.streaming import TokenForwarder
+
+
+def measure(chain, question):
+    started = time.perf_counter()
+    first = []
+
+    def on_token(token):
+        if not first:
+            first.append(time.perf_counter())
+
+    result = chain(
+        {"query": question, "insight_callbacks": [TokenForwarder(on_token)]},
+        return_only_outputs=True,
+    )
+    total = time.perf_counter() - started
+    # without streaming the client sees nothing until the whole chain returns
+    ttfb = first[0] - started if first else total
+    return ttfb, total, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--query-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    database = sales_database(query_latency=args.query_latency)
+    question = "What is total sale amount of Fruits"
+    print(f"{'mode':<12}{'ttfb s':>10}{'total s':>10}")
+    for streaming in (False, True):
+        runtime = FakeSagemakerRuntime(latency=args.llm_latency)
+        chain = SQLDatabaseChainWithInsight.from_llm(
+            fake_llm(runtime, streaming=streaming), database, concurrent_generation=True
+        )
+        ttfb, total, result = measure(chain, question)
+        mode = "streaming" if streaming else "buffered"
+        print(f"{mode:<12}{ttfb:>10.2f}{total:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Share of questions ``IntentTemplates`` serves without the LLM, and their latency.
+
+Replays recurring question shapes ("total sale amount of <product>",
+"monthly sales for <product>", "top <n> users by spend on <product>") with
+products and numbers drawn at random, against the local SageMaker stand-in
+(which writes the SQL an LLM would for each shape) and the SQLite sales
+table. Questions answered from a template skip SQL generation and, with
+``--return-direct``, the answer and insight too.
+
+    python benchmarks/templates.py --questions 200 --llm-latency 0.5 --return-direct
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+import sqlglot
+from fakes import FakeSagemakerRuntime, fake_llm, sales_database
+
+from insight_chain import SQLDatabaseChainWithInsight
+from text2sql.templates import IntentTemplates
+
+PRODUCTS = ["Chips", "Fruits", "Ice cream", "Milk", "Shampoo"]
+SHAPES = [
+    ("What is total sale amount of {product}",
+     "SELECT SUM(price) FROM sales WHERE product = '{product}'"),
+    ("Show monthly sales for {product}",
+     "SELECT strftime('%Y-%m', transaction_date) AS month, SUM(price) AS sales FROM sales "
+     "WHERE product = '{product}' GROUP BY month ORDER BY month"),
+    ("Top {n} users by spend on {product}",
+     "SELECT user_id, SUM(price) AS spend FROM sales WHERE product = '{product}' "
+     "GROUP BY user_id ORDER BY spend DESC LIMIT {n}"),
+]
+# a one-off question, never served from a template
+OTHER = ("Which product has the highest revenue",
+         "SELECT product, SUM(price) AS revenue FROM sales GROUP BY product ORDER BY revenue DESC LIMIT 1")
+
+
+def sql_writer(prompt):
+    """Responder that writes each shape's SQL, like a well-behaved model."""
+    if not prompt.rstrip().endswith("SQLQuery:"):
+        return "Insight." if "My Insight:" in prompt else "Answer."
+    question = prompt.rstrip()[:-len("SQLQuery:")].rstrip().splitlines()[-1]
+    question = question.split("Question:", 1)[-1].strip()
+    for question_format, sql_format in SHAPES + [OTHER]:
+        regex = re.escape(question_format).replace(r"\{product\}", "(?P<product>.+)").replace(r"\{n\}", r"(?P<n>\d+)")
+        match = re.fullmatch(regex, question)
+        if match:
+            return " " + sql_format.format(**match.groupdict())
+    return " SELECT COUNT(*) FROM sales"
+
+
+def questions(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        if rng.random() < 0.1:
+            yield OTHER[0]
+        else:
+            question_format, _ = rng.choice(SHAPES)
+            yield question_format.format(product=rng.choice(PRODUCTS), n=rng.choice([3, 5, 10]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--query-latency", type=float, default=0.02)
+    parser.add_argument("--min-support", type=int, default=2)
+    parser.add_argument("--return-direct", action="store_true",
+                        help="skip answer and insight generation on a template match")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    runtime = FakeSagemakerRuntime(latency=args.llm_latency, responder=sql_writer)
+    templates = IntentTemplates(min_support=args.min_support)
+    chain = SQLDatabaseChainWithInsight.from_llm(
+        fake_llm(runtime),
+        sales_database(query_latency=args.query_latency),
+        intent_templates=templates,
+        template_return_direct=args.return_direct,
+    )
+
+    latencies = {True: [], False: []}
+    wrong = 0
+    for question in questions(args.questions, args.seed):
+        started = time.perf_counter()
+        outputs = chain({"query": question}, return_only_outputs=True)
+        step = outputs["intermediate_steps"][2]
+        latencies[step["template"]["hit"]].append(time.perf_counter() - started)
+        if step["template"]["hit"]:
+            # the template must compile to the SQL the model would have written
+            expected = sql_writer(f"{question}\nSQLQuery:")
+            wrong += step["sql_cmd"] != sqlglot.transpile(expected, read="sqlite")[0]
+
+    stats = templates.stats()
+    print(f"{args.questions} questions: {stats['hits']} served from {stats['templates']} templates "
+          f"({stats['served_rate']:.0%}), {wrong} compiled SQL differing from the model's, "
+          f"{runtime.calls} LLM calls")
+    for hit, label in ((False, "LLM"), (True, "template")):
+        if latencies[hit]:
+            print(f"  {label:<9} p50 {statistics.median(latencies[hit]) * 1000:8.1f} ms "
+                  f"({len(latencies[hit])} questions)")
+
+
+if __name__ == "__main__":
+    main()
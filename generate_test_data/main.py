@@ -1,55 +1,290 @@
-from uuid import uuid4
+"""Generate synthetic retail sales data for the workshop and for load tests.
 
-import pandas as pd
+Rows are generated in NumPy-vectorized chunks and streamed to disk, so memory
+stays bounded by ``--chunk-rows`` (plus one row group of single-file Parquet)
+no matter how many rows are written. Every chunk has its own seed derived from
+``--seed``, so the output does not depend on the number of workers.
 
-data = []
-import random
-import datetime
+With no ``--output`` nothing is generated: the Parquet and day-partitioned
+Parquet layouts under ``samples/`` are rewritten from the committed
+``samples/data/retail.csv``, so all three hold the same rows. For load tests,
+e.g.:
 
+    python generate_test_data/main.py --rows 100000000 --users 1000000 \
+        --format parquet --partition-by day --shards 16 --output /tmp/sales
+"""
+import argparse
+import datetime
 import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 current_folder = os.path.dirname(os.path.abspath(__file__))
+samples_folder = os.path.join(current_folder, '../samples')
+samples_csv = os.path.join(samples_folder, 'data', 'retail.csv')
 
+product_lists = {
+    'Fruits': 15.5,
+    'Milk': 21.2,
+    'Chips': 6.3,
+    'Shampoo': 55,
+    'Ice cream': 30
+}
 
-def random_date(start, end):
-    return start + datetime.timedelta(
-        seconds=random.randint(0, int((end - start).total_seconds())))
+# Rows per row group of single-file Parquet, buffered across chunks: about
+# 140 MB compressed with a million users; small files end up with a single one
+PARQUET_ROW_GROUP_SIZE = 4_000_000
+DEFAULT_CHUNK_ROWS = 1_000_000
 
+SALES_SCHEMA = pa.schema([
+    ('transaction_date', pa.date32()),
+    ('user_id', pa.string()),
+    ('product', pa.string()),
+    ('price', pa.float64()),
+])
 
-start = datetime.datetime(2022, 9, 1)
-end = datetime.datetime(2022, 12, 1)
+EXTENSIONS = {'csv': 'csv', 'parquet': 'parquet'}
 
 
-def generate_500_ids():
-    user_ids = []
-    for i in range(500):
-        user_ids.append(uuid4())
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype='S1')
 
-    return user_ids
 
+def generate_user_ids(count, rng):
+    """``count`` random (version 4) UUID strings."""
+    raw = np.frombuffer(rng.bytes(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    digits = np.empty((count, 32), dtype='S1')
+    digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+    chars = np.insert(digits, [8, 12, 16, 20], b'-', axis=1)
+    return chars.view('S36').ravel().astype('U36')
 
-users = generate_500_ids()
 
-product_lists = {
-    'Fruits': 15.5,
-    'Milk': 21.2,
-    'Chips': 6.3,
-    'Shampoo': 55,
-    'Ice cream': 30
-}
+def generate_chunk(rows, users, start, end, rng, partition_by='none'):
+    """One chunk of sales rows as an Arrow table."""
+    product_names = np.array(list(product_lists))
+    product_prices = np.array(list(product_lists.values()), dtype=np.float64)
+    product_idx = rng.integers(0, len(product_names), size=rows)
 
-for i in range(10000):
-    product, price = random.choice(list(product_lists.items()))
-    temp = {
-        'transaction_date': random_date(start, end).strftime("%Y-%m-%d"),
-        'user_id': random.choice(users),
-        'product': product,
-        'price': price,
+    # Uniform over the seconds in [start, end], like the original per-row loop
+    total_seconds = int((end - start).total_seconds())
+    days = rng.integers(0, total_seconds + 1, size=rows) // 86400
+    dates = np.datetime64(start.date(), 'D') + days
 
+    columns = {
+        'transaction_date': pa.array(dates, type=pa.date32()),
+        'user_id': pa.array(users[rng.integers(0, len(users), size=rows)], type=pa.string()),
+        'product': pa.array(product_names[product_idx], type=pa.string()),
+        'price': pa.array(product_prices[product_idx], type=pa.float64()),
     }
+    if partition_by == 'month':
+        columns['month'] = pa.array(np.datetime_as_string(dates.astype('datetime64[M]')))
+    return pa.table(columns)
+
+
+def _shard_batches(args, shard, chunk_seeds, users):
+    for chunk in range(shard, len(chunk_seeds), args.shards):
+        rows = min(args.chunk_rows, args.rows - chunk * args.chunk_rows)
+        rng = np.random.default_rng(chunk_seeds[chunk])
+        yield from generate_chunk(
+            rows, users, args.start, args.end, rng, args.partition_by
+        ).to_batches()
+
+
+def _file_name(args, shard, extension):
+    if args.shards == 1:
+        return f"{args.basename}.{extension}"
+    return f"{args.basename}-{shard:05d}.{extension}"
+
+
+def write_shard(args, shard, chunk_seeds, users):
+    """Stream the chunks of one shard to disk and return the rows written."""
+    batches = _shard_batches(args, shard, chunk_seeds, users)
+    extension = EXTENSIONS[args.format]
+    written = 0
+
+    if args.partition_by != 'none':
+        key = 'transaction_date' if args.partition_by == 'day' else 'month'
+        schema = SALES_SCHEMA
+        if key == 'month':
+            schema = schema.append(pa.field('month', pa.string()))
+        if args.format == 'parquet':
+            file_format = ds.ParquetFileFormat()
+            file_options = file_format.make_write_options(compression='snappy')
+        else:
+            file_format = ds.CsvFileFormat()
+            file_options = file_format.make_write_options(include_header=False, quoting_style='none')
+
+        def counted():
+            nonlocal written
+            for batch in batches:
+                written += batch.num_rows
+                yield batch
+
+        ds.write_dataset(
+            counted(),
+            args.output,
+            schema=schema,
+            format=file_format,
+            file_options=file_options,
+            partitioning=ds.partitioning(pa.schema([schema.field(key)]), flavor='hive'),
+            basename_template=f"part-{shard}-{{i}}.{extension}",
+            max_rows_per_group=PARQUET_ROW_GROUP_SIZE,
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        return written
+
+    path = os.path.join(args.output, _file_name(args, shard, extension))
+    if args.format == 'parquet':
+        with pq.ParquetWriter(path, SALES_SCHEMA, compression='snappy') as writer:
+            # every write_table call starts a row group, so batches are
+            # collected until a full one
+            buffered, buffered_rows = [], 0
+            for batch in batches:
+                buffered.append(batch)
+                buffered_rows += batch.num_rows
+                written += batch.num_rows
+                if buffered_rows >= PARQUET_ROW_GROUP_SIZE:
+                    table = pa.Table.from_batches(buffered, SALES_SCHEMA)
+                    writer.write_table(
+                        table.slice(0, PARQUET_ROW_GROUP_SIZE), row_group_size=PARQUET_ROW_GROUP_SIZE
+                    )
+                    rest = table.slice(PARQUET_ROW_GROUP_SIZE)
+                    buffered, buffered_rows = rest.to_batches(), rest.num_rows
+            if buffered_rows:
+                writer.write_table(
+                    pa.Table.from_batches(buffered, SALES_SCHEMA), row_group_size=PARQUET_ROW_GROUP_SIZE
+                )
+        return written
+
+    writer = pacsv.CSVWriter(
+        path,
+        SALES_SCHEMA,
+        write_options=pacsv.WriteOptions(include_header=False, quoting_style='none'),
+    )
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            written += batch.num_rows
+    return written
+
+
+def remove_previous_parts(output, extension):
+    # Shards of one run share partition directories, so stale files from an
+    # earlier run are cleared up front instead of per shard
+    for directory, _, files in os.walk(output):
+        for name in files:
+            if name.startswith('part-') and name.endswith(f".{extension}"):
+                os.remove(os.path.join(directory, name))
+
+
+def generate(args):
+    """Write ``args.rows`` rows and return (rows written, seconds)."""
+    os.makedirs(args.output, exist_ok=True)
+    if args.partition_by != 'none':
+        remove_previous_parts(args.output, EXTENSIONS[args.format])
+    user_seed, chunks_seed = np.random.SeedSequence(args.seed).spawn(2)
+    users = generate_user_ids(args.users, np.random.default_rng(user_seed))
+    chunk_count = max(1, -(-args.rows // args.chunk_rows))
+    chunk_seeds = chunks_seed.spawn(chunk_count)
+
+    started = time.perf_counter()
+    if args.workers > 1 and args.shards > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, args.shards)) as pool:
+            written = sum(pool.map(
+                write_shard,
+                [args] * args.shards,
+                range(args.shards),
+                [chunk_seeds] * args.shards,
+                [users] * args.shards,
+            ))
+    else:
+        written = sum(write_shard(args, shard, chunk_seeds, users) for shard in range(args.shards))
+    return written, time.perf_counter() - started
+
+
+def derive_samples():
+    """Rewrite the Parquet layouts under ``samples/`` from ``samples/data/retail.csv``."""
+    table = pacsv.read_csv(
+        samples_csv,
+        read_options=pacsv.ReadOptions(column_names=SALES_SCHEMA.names),
+        convert_options=pacsv.ConvertOptions(column_types=SALES_SCHEMA),
+    )
+    parquet_path = os.path.join(samples_folder, 'data_parquet', 'retail.parquet')
+    pq.write_table(table, parquet_path, compression='snappy', row_group_size=PARQUET_ROW_GROUP_SIZE)
+    print(f"{os.path.abspath(parquet_path)}: {table.num_rows} rows")
+
+    partitioned = os.path.join(samples_folder, 'data_partitioned')
+    remove_previous_parts(partitioned, 'parquet')
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        table,
+        partitioned,
+        format=file_format,
+        file_options=file_format.make_write_options(compression='snappy'),
+        partitioning=ds.partitioning(pa.schema([SALES_SCHEMA.field('transaction_date')]), flavor='hive'),
+        basename_template='part-{i}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        # keeps the rows of each partition in CSV order
+        use_threads=False,
+    )
+    print(f"{os.path.abspath(partitioned)}: {table.num_rows} rows")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; children covers the worker processes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, '%Y-%m-%d')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--start', type=parse_date, default=datetime.datetime(2022, 9, 1))
+    parser.add_argument('--end', type=parse_date, default=datetime.datetime(2022, 12, 1))
+    parser.add_argument('--seed', type=int, default=None, help='defaults to a random seed')
+    parser.add_argument('--format', choices=sorted(EXTENSIONS), default='csv')
+    parser.add_argument('--partition-by', choices=['none', 'day', 'month'], default='none')
+    parser.add_argument('--shards', type=int, default=1, help='output files (per partition)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--basename', default='retail')
+    parser.add_argument('--output', help='output directory; omit to rewrite the samples/ Parquet layouts')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.output:
+        derive_samples()
+        return
+    if args.seed is None:
+        args.seed = int(np.random.SeedSequence().entropy % (2 ** 63))
+
+    written, elapsed = generate(args)
+    print(
+        f"{os.path.abspath(args.output)}: {written} rows ({args.format}, partition={args.partition_by}, "
+        f"seed={args.seed}) in {elapsed:.2f}s = {written / elapsed:,.0f} rows/s"
+    )
+    own, children = peak_rss_mb()
+    print(f"peak RSS: {own:.0f} MiB (main), {children:.0f} MiB (largest worker)")
 
-    data.append(temp)
-df = pd.DataFrame(data)
 
-print(os.path.join(current_folder, '../samples/data/retail.csv'))
-df.to_csv(os.path.join(current_folder, '../samples/data/retail.csv'), index=False, header=None)
+if __name__ == '__main__':
+    main()
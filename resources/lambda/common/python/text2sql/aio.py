@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from langchain import SagemakerEndpoint
+from langchain.callbacks.manager import AsyncCallbackManagerForLLMRun
+
+# boto3 and pyathena calls are blocking; keeping them on a dedicated pool
+# leaves the event loop free and sizes concurrency independently of the
+# default executor (which is tiny on a 1-2 vCPU Lambda).
+io_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ASYNC_IO_POOL_SIZE", "32")),
+    thread_name_prefix="aio",
+)
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_pool, functools.partial(fn, *args, **kwargs))
+
+
+class _ThreadsafeTokens:
+    """Stands in for the run manager of ``_call`` on the io pool.
+
+    Tokens are handed to the event loop's queue in the order they arrive.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: "asyncio.Queue[Optional[str]]"):
+        self.loop = loop
+        self.queue = queue
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, token)
+
+
+class AsyncSagemakerEndpoint(SagemakerEndpoint):
+    """SagemakerEndpoint with an ``_acall`` that does not block the event loop.
+
+    The request/response still go through ``content_handler``, so the same
+    ``ContentHandler`` works for both paths. Tokens a streaming ``_call``
+    reports are passed to the async run manager's ``on_llm_new_token``.
+    """
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        if run_manager is None:
+            return await run_blocking(self._call, prompt, stop, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        call = asyncio.ensure_future(
+            run_blocking(self._call, prompt, stop, _ThreadsafeTokens(loop, queue), **kwargs)
+        )
+        # queued after every token, since the executor also completes the
+        # future through call_soon_threadsafe
+        call.add_done_callback(lambda _: queue.put_nowait(None))
+        while True:
+            token = await queue.get()
+            if token is None:
+                break
+            await run_manager.on_llm_new_token(token)
+        return await call
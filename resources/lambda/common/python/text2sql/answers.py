@@ -0,0 +1,144 @@
+import datetime
+import os
+import re
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+from text2sql.database import QueryResult
+
+# ANSWER_POLICY values: which results skip the answer generation
+LLM = "llm"
+SCALAR = "scalar"
+TABLE = "table"
+POLICIES = (LLM, SCALAR, TABLE)
+DEFAULT_POLICY = SCALAR
+DEFAULT_MAX_ROWS = 10
+DEFAULT_MAX_COLUMNS = 3
+
+# Athena names unaliased expressions _col0, _col1, ...
+_UNNAMED = re.compile(r"^_?col\d*$|^\?column\?$", re.IGNORECASE)
+_CALL = re.compile(r"^(\w+)\((?:distinct\s+)?([^()]*)\)$", re.IGNORECASE)
+_FUNCTIONS = {
+    "sum": "total",
+    "avg": "average",
+    "count": "number",
+    "max": "highest",
+    "min": "lowest",
+}
+
+
+def column_label(name: str) -> Optional[str]:
+    """Readable label of a result column, None for generated names."""
+    name = name.strip().strip('"`')
+    if not name or _UNNAMED.match(name):
+        return None
+    call = _CALL.match(name)
+    if call:
+        function, argument = call.group(1).lower(), call.group(2).strip()
+        if function in _FUNCTIONS:
+            if argument in ("*", "1", ""):
+                return "number of rows" if function == "count" else None
+            return f"{_FUNCTIONS[function]} {column_label(argument) or argument}"
+        return None
+    return name.rsplit(".", 1)[-1].replace("_", " ").lower()
+
+
+def format_value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, (float, Decimal)):
+        value = float(value)
+        if value.is_integer():
+            return f"{int(value):,}"
+        return f"{round(value, 6):,}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class AnswerFormatter:
+    """Writes the answer for simple results without the model.
+
+    With the ``scalar`` policy, empty results and single values (the
+    ``SUM(price)`` of "What is total sale amount of Fruits") are rendered
+    from a template using the column names of the cursor; ``table`` also
+    covers results of up to ``max_rows`` rows and ``max_columns`` columns.
+    Anything else, and every result under the ``llm`` policy, still goes to
+    the model.
+    """
+
+    def __init__(
+            self,
+            policy: str = DEFAULT_POLICY,
+            max_rows: int = DEFAULT_MAX_ROWS,
+            max_columns: int = DEFAULT_MAX_COLUMNS,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"answer policy must be one of {POLICIES}, got {policy!r}")
+        self.policy = policy
+        self.max_rows = max_rows
+        self.max_columns = max_columns
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerFormatter"]:
+        policy = os.getenv("ANSWER_POLICY", DEFAULT_POLICY).lower()
+        if policy == LLM:
+            return None
+        return cls(
+            policy=policy,
+            max_rows=int(os.getenv("ANSWER_MAX_ROWS", DEFAULT_MAX_ROWS)),
+            max_columns=int(os.getenv("ANSWER_MAX_COLUMNS", DEFAULT_MAX_COLUMNS)),
+        )
+
+    def shape(self, result: Any) -> Optional[str]:
+        """``empty``, ``scalar`` or ``table`` when the policy covers ``result``."""
+        # plain SQLDatabase results are strings without column names
+        if self.policy == LLM or not isinstance(result, QueryResult) or not result.returns_rows:
+            return None
+        if not result.rows:
+            return "empty"
+        if len(result.rows) == 1 and len(result.columns) == 1:
+            return "scalar"
+        if (
+                self.policy == TABLE
+                and len(result.rows) <= self.max_rows
+                and len(result.columns) <= self.max_columns
+        ):
+            return "table"
+        return None
+
+    def format(self, result: Any) -> Tuple[Optional[str], Dict[str, Any]]:
+        """The answer, or None when the model should write it, and a report."""
+        shape = self.shape(result)
+        report = {"formatted": shape is not None, "policy": self.policy, "shape": shape}
+        if shape == "empty":
+            return "No rows matched the question.", report
+        if shape == "scalar":
+            return self._scalar(result), report
+        if shape == "table":
+            return self._table(result), report
+        return None, report
+
+    @staticmethod
+    def _scalar(result: QueryResult) -> str:
+        label = column_label(result.columns[0])
+        value = format_value(result.rows[0][0])
+        if label is None:
+            return f"The answer is {value}."
+        return f"The {label} is {value}."
+
+    @staticmethod
+    def _table(result: QueryResult) -> str:
+        labels = [column_label(c) or c for c in result.columns]
+        if len(labels) == 1:
+            values = ", ".join(format_value(row[0]) for row in result.rows)
+            return f"{labels[0].capitalize()}: {values}."
+        lines = [
+            "; ".join(f"{label}: {format_value(value)}" for label, value in zip(labels, row))
+            for row in result.rows
+        ]
+        return f"{len(lines)} rows:\n" + "\n".join(lines)
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from langchain import SQLDatabase
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from text2sql.database import QueryDatabase
+
+DEFAULT_BACKEND = "athena"
+DEFAULT_ATHENA_CURSOR = "rest"
+DEFAULT_RESULT_REUSE_MINUTES = 60
+DEFAULT_TABLE = "sales"
+DEFAULT_DATA_PREFIX = "samples/data/"
+# Above this the table is left to Athena; the copy has to fit in /tmp
+DEFAULT_DUCKDB_MAX_BYTES = 64 * 1024 * 1024
+DUCKDB_CACHE_DIR = "/tmp/text2sql-duckdb"
+# Queries only read the copied table: no read_csv/read_text/COPY/ATTACH on
+# the container's files (e.g. /proc/self/environ) or URLs, and no SET to
+# turn that back on
+DUCKDB_QUERY_CONFIG = {"enable_external_access": False, "lock_configuration": True}
+
+# Column types of the Glue table in stack/cdk_stack.py; the CSV has no header
+SALES_COLUMNS = {
+    "transaction_date": "DATE",
+    "user_id": "VARCHAR",
+    "product": "VARCHAR",
+    "price": "DOUBLE",
+}
+
+# (path relative to the table location, size in bytes, version tag)
+DataFile = Tuple[str, int, str]
+
+
+def athena_engine() -> Engine:
+    """Athena engine configured by ``ATHENA_CURSOR`` and friends.
+
+    ``rest`` (default) pages ``GetQueryResults`` 1,000 rows per call.
+    ``arrow`` reads the result file from the staging location in one
+    download into an Arrow table; with ``ATHENA_UNLOAD=true`` the query is
+    wrapped in ``UNLOAD`` and read back as Parquet (row order of ORDER BY
+    queries is not kept). Result reuse lets Athena answer a repeated query
+    from an earlier result of at most ``ATHENA_RESULT_REUSE_MINUTES`` (0
+    turns it off; needs engine version 3).
+    """
+    ATHENA_BUCKET = os.getenv('ATHENA_BUCKET')
+    ATHENA_DATABASE = os.getenv('ATHENA_DATABASE')
+    ATHENA_REGION = os.getenv('ATHENA_REGION')
+    cursor = os.getenv('ATHENA_CURSOR', DEFAULT_ATHENA_CURSOR).lower()
+    if cursor not in ("rest", "arrow"):
+        raise ValueError(f"ATHENA_CURSOR must be 'rest' or 'arrow', got {cursor!r}")
+
+    conn_str = f"awsathena+{cursor}://:@athena.{ATHENA_REGION}.amazonaws.com:443/{ATHENA_DATABASE}?s3_staging_dir=s3://{ATHENA_BUCKET}/Unsaved/"
+    # Passed as connect_args: values in the URL reach pyathena as strings
+    connect_args: Dict[str, Any] = {}
+    reuse_minutes = int(os.getenv('ATHENA_RESULT_REUSE_MINUTES', DEFAULT_RESULT_REUSE_MINUTES))
+    if reuse_minutes > 0:
+        connect_args.update(result_reuse_enable=True, result_reuse_minutes=reuse_minutes)
+    if cursor == "arrow" and os.getenv('ATHENA_UNLOAD', 'false').lower() == 'true':
+        connect_args["cursor_kwargs"] = {"unload": True}
+    return create_engine(conn_str, connect_args=connect_args)
+
+
+def _data_version(files: List[DataFile]) -> str:
+    digest = hashlib.sha256()
+    for path, size, tag in files:
+        digest.update(f"{path}\x1f{size}\x1f{tag}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LocalTableSource:
+    """Table files under a local path (a file or a directory tree)."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+
+    def files(self) -> List[DataFile]:
+        if os.path.isfile(self.path):
+            stat = os.stat(self.path)
+            return [(os.path.basename(self.path), stat.st_size, str(stat.st_mtime_ns))]
+        found = []
+        for directory, _, names in os.walk(self.path):
+            for name in sorted(names):
+                full = os.path.join(directory, name)
+                stat = os.stat(full)
+                found.append((os.path.relpath(full, self.path), stat.st_size, str(stat.st_mtime_ns)))
+        return sorted(found)
+
+    def materialize(self, files: List[DataFile], directory: str) -> List[str]:
+        if os.path.isfile(self.path):
+            return [self.path]
+        return [os.path.join(self.path, relative) for relative, _, _ in files]
+
+
+class S3TableSource:
+    """Table files under ``s3://bucket/prefix``, downloaded on first use."""
+
+    def __init__(self, bucket: str, prefix: str, client: Any = None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+
+    def files(self) -> List[DataFile]:
+        found = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                relative = obj["Key"][len(self.prefix):].lstrip("/")
+                if relative and not relative.endswith("/"):
+                    found.append((relative, obj["Size"], obj["ETag"]))
+        return sorted(found)
+
+    def materialize(self, files: List[DataFile], directory: str) -> List[str]:
+        paths = []
+        for relative, _, _ in files:
+            target = os.path.join(directory, relative)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                key = self.prefix.rstrip("/") + "/" + relative
+                self.client.download_file(self.bucket, key, target + ".part")
+                os.replace(target + ".part", target)
+            paths.append(target)
+        return paths
+
+
+def _scan_sql(paths: List[str], columns: Dict[str, str]) -> str:
+    parquet = [path for path in paths if path.endswith(".parquet")]
+    csv = [path for path in paths if path.endswith(".csv")]
+    # key=value directories (the partitioned layout) become columns
+    if parquet:
+        scan = f"read_parquet({_sql_list(parquet)}, hive_partitioning = true)"
+    elif csv:
+        types = ", ".join(f"'{name}': '{type_}'" for name, type_ in columns.items())
+        scan = f"read_csv({_sql_list(csv)}, header = false, columns = {{{types}}}, hive_partitioning = true)"
+    else:
+        raise ValueError("no CSV or Parquet files at the table location")
+    select = ", ".join(f"CAST({name} AS {type_}) AS {name}" for name, type_ in columns.items())
+    return f"SELECT {select} FROM {scan}"
+
+
+def _sql_list(paths: List[str]) -> str:
+    return "[" + ", ".join("'" + path.replace("'", "''") + "'" for path in paths) + "]"
+
+
+def _remove_other_versions(cache_dir: str, table: str, version: str) -> None:
+    # /tmp also holds the offload and the schema snapshot; only what
+    # from_source wrote is removed: {table}-{version}.duckdb (and its .part
+    # or .wal) and the {version} download directories, including this
+    # version's, since the table is in the DuckDB file now
+    own_file = re.compile(re.escape(table) + r"-([0-9a-f]{16})\.duckdb(\.part|\.wal)?")
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            if re.fullmatch(r"[0-9a-f]{16}", name) and os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                match = own_file.fullmatch(name)
+                if match and match.group(1) != version:
+                    os.remove(path)
+        except OSError as e:
+            print(json.dumps({"duckdb_cache": "cleanup failed", "path": path, "error": repr(e)}))
+
+
+class DuckDBDatabase(QueryDatabase):
+    """QueryDatabase over an in-process DuckDB copy of the table.
+
+    ``dialect`` reports ``dialect_hint`` instead of ``duckdb`` so the prompt
+    keeps asking for the Presto SQL Athena runs; DuckDB accepts the
+    Presto functions the generated queries use.
+    """
+
+    def __init__(self, engine: Engine, dialect_hint: str = "presto", **kwargs: Any):
+        super().__init__(engine, **kwargs)
+        self.dialect_hint = dialect_hint
+
+    @property
+    def dialect(self) -> str:
+        return self.dialect_hint
+
+    @classmethod
+    def from_source(
+            cls,
+            source: Any,
+            table: str = DEFAULT_TABLE,
+            columns: Optional[Dict[str, str]] = None,
+            cache_dir: str = DUCKDB_CACHE_DIR,
+            files: Optional[List[DataFile]] = None,
+            **kwargs: Any,
+    ) -> "DuckDBDatabase":
+        """Load ``source`` into a DuckDB file in ``cache_dir``.
+
+        The file is named after the data version, so a warm container reuses
+        it until objects under the table location change. Files of other
+        versions, and the downloaded table files, are deleted once it exists.
+        """
+        import duckdb
+
+        files = source.files() if files is None else files
+        version = _data_version(files)[:16]
+        db_path = os.path.join(cache_dir, f"{table}-{version}.duckdb")
+        if not os.path.exists(db_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            paths = source.materialize(files, os.path.join(cache_dir, version))
+            partial = db_path + ".part"
+            if os.path.exists(partial):
+                os.remove(partial)
+            with duckdb.connect(partial) as connection:
+                connection.execute(
+                    f"CREATE TABLE {table} AS {_scan_sql(paths, columns or SALES_COLUMNS)}"
+                )
+            os.replace(partial, db_path)
+        _remove_other_versions(cache_dir, table, version)
+
+        # the table files were copied in above, so queries need no file access
+        engine = create_engine(
+            f"duckdb:///{db_path}",
+            connect_args={"read_only": True, "config": DUCKDB_QUERY_CONFIG},
+        )
+        return cls(engine, **kwargs)
+
+
+def table_source_from_env() -> Any:
+    """``DUCKDB_DATA_PATH`` (local, e.g. in tests) or the table's S3 location."""
+    local_path = os.getenv("DUCKDB_DATA_PATH")
+    if local_path:
+        return LocalTableSource(local_path)
+    return S3TableSource(
+        os.environ["ATHENA_BUCKET"],
+        os.getenv("ATHENA_DATA_PREFIX", DEFAULT_DATA_PREFIX),
+    )
+
+
+def create_database(
+        database_cls: Type[SQLDatabase] = QueryDatabase,
+        **kwargs: Any,
+) -> SQLDatabase:
+    """Database for the backend named by ``QUERY_BACKEND``.
+
+    ``athena`` (default) queries Athena. ``duckdb`` answers from an
+    in-process DuckDB copy of the table and falls back to Athena when the
+    table is larger than ``DUCKDB_MAX_BYTES``.
+    """
+    backend = os.getenv("QUERY_BACKEND", DEFAULT_BACKEND).lower()
+    if backend == "athena":
+        return database_cls(athena_engine(), **kwargs)
+    if backend != "duckdb":
+        raise ValueError(f"QUERY_BACKEND must be 'athena' or 'duckdb', got {backend!r}")
+
+    source = table_source_from_env()
+    files = source.files()
+    size = sum(size for _, size, _ in files)
+    max_bytes = int(os.getenv("DUCKDB_MAX_BYTES", DEFAULT_DUCKDB_MAX_BYTES))
+    if size > max_bytes:
+        print(json.dumps({"query_backend": "athena", "table_bytes": size, "duckdb_max_bytes": max_bytes}))
+        return database_cls(athena_engine(), **kwargs)
+
+    return DuckDBDatabase.from_source(
+        source,
+        table=os.getenv("ATHENA_TABLE", DEFAULT_TABLE),
+        cache_dir=os.getenv("DUCKDB_CACHE_DIR", DUCKDB_CACHE_DIR),
+        files=files,
+        **kwargs,
+    )
@@ -0,0 +1,64 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CONCURRENCY = 4
+
+
+def batch_concurrency(requested: Optional[int] = None) -> int:
+    """Requested concurrency capped by BATCH_MAX_CONCURRENCY.
+
+    Keep the cap under the account's Athena concurrent-query quota.
+    """
+    limit = int(os.getenv("BATCH_MAX_CONCURRENCY", DEFAULT_CONCURRENCY))
+    return max(1, min(requested or limit, limit))
+
+
+def validate_questions(questions: Any) -> List[str]:
+    """``questions`` when it is a non-empty list of strings, else ValueError.
+
+    A plain string would otherwise be answered one character at a time.
+    """
+    if not isinstance(questions, list) or not questions:
+        raise ValueError("questions must be a non-empty list of strings")
+    for index, question in enumerate(questions):
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError(f"questions[{index}] must be a non-empty string")
+    return questions
+
+
+def batch_key(question: str) -> str:
+    # only whitespace is folded: case, punctuation and operators change the answer
+    return " ".join(question.split())
+
+
+def run_batch(
+        questions: List[str],
+        run_one: Callable[[str], Any],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """Answer ``questions`` with at most ``max_concurrency`` in flight.
+
+    Questions that differ only in whitespace run once and share the answer.
+    One entry per input question is returned, in input order, holding either
+    ``result`` or ``error``.
+    """
+    unique: "OrderedDict[str, str]" = OrderedDict()
+    for question in validate_questions(questions):
+        unique.setdefault(batch_key(question), question)
+
+    def answer(question: str) -> Dict[str, Any]:
+        try:
+            return {"result": run_one(question)}
+        except Exception as exc:
+            return {"error": {"type": type(exc).__name__, "message": str(exc)}}
+
+    workers = max(1, min(max_concurrency, len(unique)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        answers = dict(zip(unique, pool.map(answer, unique.values())))
+
+    return [
+        {"question": question, **answers[batch_key(question)]}
+        for question in questions
+    ]
@@ -0,0 +1,54 @@
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+from text2sql.timing import StageTimings
+
+
+class StageTimingCallback(BaseCallbackHandler):
+    """Times the stages of a plain ``SQLDatabaseChain`` run from its callbacks.
+
+    LLM calls are attributed to ``llm_stages`` in call order. Execution is the
+    gap between the end of SQL generation and the ``SQLResult:`` text event,
+    and table info is everything before the first LLM call.
+    """
+
+    def __init__(self, timings: StageTimings, llm_stages=("sql_generation", "answer")):
+        self.timings = timings
+        self.llm_stages = llm_stages
+        self._llm_calls = 0
+        self._llm_started: Dict[UUID, float] = {}
+        self._chain_started: Optional[float] = None
+        self._sql_generated_at: Optional[float] = None
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self._chain_started = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        now = time.perf_counter()
+        if self._chain_started is not None:
+            self.timings.add("table_info", now - self._chain_started)
+            self._chain_started = None
+        self._llm_started[run_id] = now
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._llm_started.pop(run_id, None)
+        if started is None:
+            return
+        now = time.perf_counter()
+        stage = self.llm_stages[min(self._llm_calls, len(self.llm_stages) - 1)]
+        self._llm_calls += 1
+        self.timings.add(stage, now - started)
+        if stage == "sql_generation":
+            self._sql_generated_at = now
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._llm_started.pop(run_id, None)
+
+    def on_text(self, text: str, **kwargs: Any) -> None:
+        if text == "\nSQLResult: " and self._sql_generated_at is not None:
+            self.timings.add("execution", time.perf_counter() - self._sql_generated_at)
+            self._sql_generated_at = None
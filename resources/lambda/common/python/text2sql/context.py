@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+ENV_PREFIX = "ATHENA_"
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    # Imported here so handlers can build a WarmContext at import time
+    # without loading botocore and sqlalchemy on the cold-start path
+    from botocore.exceptions import (
+        ConnectionClosedError,
+        ConnectTimeoutError,
+        EndpointConnectionError,
+    )
+    from sqlalchemy.exc import DBAPIError, DisconnectionError
+
+    if isinstance(exc, (
+        DisconnectionError,
+        EndpointConnectionError,
+        ConnectionClosedError,
+        ConnectTimeoutError,
+    )):
+        return True
+    # sqlalchemy flags errors that killed the underlying DBAPI connection
+    return isinstance(exc, DBAPIError) and exc.connection_invalidated
+
+
+def env_fingerprint(prefix: str = ENV_PREFIX) -> Dict[str, str]:
+    return {k: v for k, v in os.environ.items() if k.startswith(prefix)}
+
+
+class WarmContext:
+    """Lazily built, process-level object reused across warm Lambda invocations.
+
+    ``factory`` builds the engine, the SQLDatabase and the chain on top of it.
+    The result is rebuilt when the ``ATHENA_*`` environment changes, when
+    :meth:`invalidate` is called, or after a connection error in :meth:`run`.
+    """
+
+    def __init__(self, factory: Callable[[], T], env_prefix: str = ENV_PREFIX):
+        self._factory = factory
+        self._env_prefix = env_prefix
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._fingerprint: Optional[Dict[str, str]] = None
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+        self.built_at: Optional[float] = None
+
+    def get(self) -> T:
+        fingerprint = env_fingerprint(self._env_prefix)
+        with self._lock:
+            if self._value is not None and fingerprint == self._fingerprint:
+                self.hits += 1
+                return self._value
+            self._value = self._factory()
+            self._fingerprint = fingerprint
+            self.builds += 1
+            self.built_at = time.time()
+            return self._value
+
+    def prewarm(self) -> threading.Thread:
+        """Build the value on a daemon thread.
+
+        Imports and the first build then overlap with whatever runs next
+        (the rest of module init, parsing the first event); a caller of
+        :meth:`get` meanwhile waits on the lock instead of building twice.
+        A failed build is logged and left for the next :meth:`get` to retry.
+        """
+
+        def build() -> None:
+            try:
+                self.get()
+            except Exception as exc:
+                # visible at init rather than only when the first request fails
+                print(json.dumps({"warm_context": "prewarm failed", "error": repr(exc)}))
+
+        thread = threading.Thread(target=build, name="prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self) -> None:
+        with self._lock:
+            if self._value is not None:
+                self.invalidations += 1
+            self._value = None
+            self._fingerprint = None
+
+    def run(self, fn: Callable[[T], Any]) -> Any:
+        """Call ``fn`` with the cached value, rebuilding once on a connection error."""
+        try:
+            return fn(self.get())
+        except Exception as exc:
+            if not is_connection_error(exc):
+                raise
+            self.invalidate()
+            return fn(self.get())
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.builds
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hit_rate, 4),
+        }
@@ -0,0 +1,153 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+
+from langchain import SQLDatabase
+from langchain.sql_database import truncate_word
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+# how long a cancel waits for StartQueryExecution to return the query id
+QUERY_ID_WAIT_SECONDS = 1.0
+
+
+@dataclass
+class QueryResult:
+    """Rows of a query together with the column names from the cursor."""
+
+    columns: List[str]
+    rows: List[Sequence[Any]] = field(default_factory=list)
+    returns_rows: bool = True
+    max_string_length: int = 300
+
+    def __str__(self) -> str:
+        # Same text SQLDatabase.run returns, so prompts and logs do not change
+        if not self.returns_rows:
+            return ""
+        return str([
+            tuple(truncate_word(c, length=self.max_string_length) for c in row)
+            for row in self.rows
+        ])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_arrow(cls, table: Any, max_string_length: int = 300) -> "QueryResult":
+        """Build from a ``pyarrow.Table``, converting one column at a time."""
+        values = [column.to_pylist() for column in table.columns]
+        return cls(
+            columns=list(table.column_names),
+            rows=list(zip(*values)),
+            max_string_length=max_string_length,
+        )
+
+
+def _restore_dates(table: Any, description: Optional[Sequence[Sequence[Any]]]) -> Any:
+    # pyathena parses Athena dates in the CSV as timestamps; cast them back
+    # so rows (and prompts) match the REST cursor's datetime.date values
+    for i, column in enumerate(description or []):
+        if column[1] == "date" and i < table.num_columns and str(table.column(i).type).startswith("timestamp"):
+            table = table.set_column(i, table.field(i).name, table.column(i).cast("date32"))
+    return table
+
+
+class QueryCancelled(Exception):
+    """The query was cancelled before it started."""
+
+
+class CancelToken:
+    """Lets another thread stop the query ``QueryDatabase.run_query`` runs.
+
+    On Athena that is ``StopQueryExecution`` (pyathena's ``Cursor.cancel``);
+    SQLite and DuckDB connections are interrupted. One token per query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel: Optional[Callable[[], None]] = None
+        self.cancelled = False
+
+    def attach(self, cancel: Optional[Callable[[], None]]) -> None:
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("cancelled before it started")
+            self._cancel = cancel
+
+    def detach(self) -> None:
+        with self._lock:
+            self._cancel = None
+
+    def cancel(self) -> bool:
+        """Stop the running query; True when one was stopped."""
+        with self._lock:
+            self.cancelled = True
+            cancel, self._cancel = self._cancel, None
+        if cancel is None:
+            return False
+        try:
+            cancel()
+        except Exception:
+            # the query finished in the meantime
+            return False
+        return True
+
+
+def _stop_athena_query(cursor: Any) -> Callable[[], None]:
+    def stop() -> None:
+        # the id arrives with the StartQueryExecution response
+        deadline = time.monotonic() + QUERY_ID_WAIT_SECONDS
+        while not cursor.query_id and time.monotonic() < deadline:
+            time.sleep(0.02)
+        cursor.cancel()
+
+    return stop
+
+
+def _attach_cancel_token(connection, cursor, statement, parameters, context, executemany) -> None:
+    token = context.execution_options.get("cancel_token") if context is not None else None
+    if token is None:
+        return
+    if hasattr(cursor, "query_id"):
+        token.attach(_stop_athena_query(cursor))
+    else:
+        token.attach(getattr(connection.connection.dbapi_connection, "interrupt", None))
+
+
+class QueryDatabase(SQLDatabase):
+    """SQLDatabase that can also return structured results."""
+
+    def __init__(self, engine: Engine, *args: Any, **kwargs: Any):
+        super().__init__(engine, *args, **kwargs)
+        if not event.contains(engine, "before_cursor_execute", _attach_cancel_token):
+            event.listen(engine, "before_cursor_execute", _attach_cancel_token)
+
+    def run_query(self, command: str, cancel_token: Optional[CancelToken] = None) -> QueryResult:
+        with self._engine.begin() as connection:
+            if cancel_token is not None:
+                connection.execution_options(cancel_token=cancel_token)
+            try:
+                return self._fetch(connection.execute(text(command)))
+            finally:
+                if cancel_token is not None:
+                    cancel_token.detach()
+
+    def _fetch(self, cursor: Any) -> QueryResult:
+        if not cursor.returns_rows:
+            return QueryResult([], returns_rows=False)
+        # pyathena's ArrowCursor already holds the whole result as a table
+        dbapi_cursor = getattr(cursor, "cursor", None)
+        if hasattr(dbapi_cursor, "as_arrow"):
+            table = _restore_dates(dbapi_cursor.as_arrow(), dbapi_cursor.description)
+            return QueryResult.from_arrow(table, self._max_string_length)
+        return QueryResult(
+            columns=list(cursor.keys()),
+            rows=[tuple(row) for row in cursor.fetchall()],
+            max_string_length=self._max_string_length,
+        )
+
+    def run(self, command: str, fetch: str = "all") -> str:
+        if fetch != "all":
+            return super().run(command, fetch)
+        return str(self.run_query(command))
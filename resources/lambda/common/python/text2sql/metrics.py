@@ -0,0 +1,154 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from text2sql.timing import STAGES, StageTimings
+
+DEFAULT_NAMESPACE = "Text2SQL"
+# CloudWatch accepts at most 100 values per metric in one EMF record
+MAX_VALUES_PER_RECORD = 100
+
+STAGE_METRICS = {
+    stage: "".join(part.title() for part in stage.split("_")) + "Time"
+    for stage in STAGES
+}
+
+
+class EMFMetrics:
+    """Per-invocation metrics printed as CloudWatch Embedded Metric Format.
+
+    Lambda ships stdout to CloudWatch Logs, which extracts the metrics from
+    the EMF record, so publishing costs no API call. Keep one instance per
+    module and wrap the Lambda handler with ``log_invocation``; values
+    recorded during the invocation are flushed when it returns.
+    """
+
+    def __init__(self, service: str, namespace: Optional[str] = None):
+        self.service = service
+        self.namespace = namespace or os.getenv("METRICS_NAMESPACE", DEFAULT_NAMESPACE)
+        self._lock = threading.Lock()
+        self._cold_start = True
+        self._reset()
+
+    def _reset(self) -> None:
+        self._timings: List[StageTimings] = []
+        self._values: Dict[str, List[float]] = {}
+        self._units: Dict[str, str] = {}
+        self._properties: Dict[str, Any] = {}
+
+    def new_timings(self) -> StageTimings:
+        """A StageTimings for one question, reported with this invocation."""
+        timings = StageTimings()
+        with self._lock:
+            self._timings.append(timings)
+        return timings
+
+    def put(self, name: str, value: float, unit: str = "Count") -> None:
+        with self._lock:
+            self._values.setdefault(name, []).append(value)
+            self._units[name] = unit
+
+    def set_property(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._properties[key] = value
+
+    def record_outputs(
+            self, outputs: Dict[str, Any], duration_ms: Optional[float] = None
+    ) -> None:
+        """Cache hits and row counts from the chain's sql-exec step.
+
+        ``duration_ms`` of the question is reported per model tier when the
+        chain routes between models.
+        """
+        for step in outputs.get("intermediate_steps", []):
+            if not isinstance(step, dict) or "sql_cmd" not in step:
+                continue
+            if "sql_cache" in step:
+                self.put("SqlCacheHit", int(step["sql_cache"]["hit"]))
+            if "template" in step:
+                self.put("TemplateHit", int(step["template"]["hit"]))
+            if "result_cache" in step:
+                self.put("ResultCacheHit", int(step["result_cache"]["hit"]))
+            if "rows" in step.get("serialization", {}):
+                # absent when the result was plain text rather than rows
+                self.put("ResultRows", step["serialization"]["rows"])
+            if "speculative" in step and "winner" in step["speculative"]:
+                self.put("SqlCandidates", step["speculative"]["distinct"])
+                self.put("SampledCandidateWin", int(step["speculative"]["winner"] > 0))
+                self.put("CandidatesCancelled", step["speculative"]["cancelled"])
+            if "offload" in step:
+                self.put("ResultOffloadBytes", step["offload"]["result_bytes"], "Bytes")
+            if "answer_format" in step:
+                self.put("AnswerFormatted", int(step["answer_format"]["formatted"]))
+            if "schema_index" in step:
+                self.put("SchemaTokensSaved", step["schema_index"]["saved_tokens"])
+            if "routing" in step:
+                tier = step["routing"]["tier"]
+                self.put(f"{tier.title()}TierQuestions", 1)
+                if duration_ms is not None:
+                    self.put(f"{tier.title()}TierLatency", duration_ms, "Milliseconds")
+                if tier == "fast":
+                    # only fast-tier questions escalate, so the Average is the rate
+                    self.put("Escalated", int(step["routing"]["escalated"]))
+
+    def flush(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            values = dict(self._values)
+            units = dict(self._units)
+            for timings in self._timings:
+                for stage, seconds in timings.as_dict().items():
+                    name = STAGE_METRICS.get(stage, stage)
+                    values.setdefault(name, []).append(seconds * 1000)
+                    units[name] = "Milliseconds"
+            properties = dict(self._properties)
+            self._reset()
+
+        records = []
+        longest = max((len(v) for v in values.values()), default=0)
+        for offset in range(0, longest, MAX_VALUES_PER_RECORD):
+            chunk = {
+                name: v[offset:offset + MAX_VALUES_PER_RECORD]
+                for name, v in values.items()
+                if v[offset:offset + MAX_VALUES_PER_RECORD]
+            }
+            record = {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [{
+                        "Namespace": self.namespace,
+                        "Dimensions": [["Service"]],
+                        "Metrics": [{"Name": name, "Unit": units[name]} for name in chunk],
+                    }],
+                },
+                "Service": self.service,
+                **properties,
+                **chunk,
+            }
+            print(json.dumps(record))
+            records.append(record)
+        return records
+
+    def log_invocation(self, handler: Callable) -> Callable:
+        """Decorate a Lambda handler to record its duration, errors and cold start."""
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            with self._lock:
+                cold_start, self._cold_start = self._cold_start, False
+            self.put("ColdStart", int(cold_start))
+            if context is not None:
+                self.set_property("RequestId", getattr(context, "aws_request_id", None))
+            started = time.perf_counter()
+            try:
+                return handler(event, context)
+            except Exception:
+                self.put("Errors", 1)
+                raise
+            finally:
+                self.put("Duration", (time.perf_counter() - started) * 1000, "Milliseconds")
+                self.flush()
+
+        return wrapper
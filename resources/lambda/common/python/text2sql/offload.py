@@ -0,0 +1,171 @@
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+from text2sql.database import QueryResult
+
+DEFAULT_PREFIX = "results/"
+# a fraction of Lambda's 6 MB response limit, so batches of questions fit too
+DEFAULT_THRESHOLD_BYTES = 256 * 1024
+DEFAULT_PREVIEW_ROWS = 20
+DEFAULT_URL_SECONDS = 3600
+# the lifecycle rule on the prefix in stack/cdk_stack.py
+DEFAULT_EXPIRATION_DAYS = 1
+FORMATS = ("jsonl", "parquet")
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def text_size(result: QueryResult) -> int:
+    """About ``len(str(result))``, one row at a time instead of all at once."""
+    return sum(len(str(tuple(row))) + 2 for row in result.rows)
+
+
+def to_jsonl(result: QueryResult) -> bytes:
+    """Gzipped JSON lines, one object per row."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6, mtime=0) as f:
+        for row in result.rows:
+            line = json.dumps(dict(zip(result.columns, row)), default=json_default)
+            f.write(line.encode("utf-8") + b"\n")
+    return buffer.getvalue()
+
+
+def to_parquet(result: QueryResult) -> bytes:
+    """Snappy-compressed Parquet, one column at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(zip(*result.rows)) if result.rows else [()] * len(result.columns)
+    table = pa.Table.from_arrays(
+        [pa.array(list(values)) for values in columns], names=list(result.columns)
+    )
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="snappy")
+    return buffer.getvalue()
+
+
+class ResultOffload:
+    """Moves results too large for the Lambda response to S3.
+
+    Results whose text would be over ``threshold_bytes`` are written under
+    ``prefix`` as gzipped JSON lines or Parquet; the chain then returns the
+    first ``preview_rows`` rows with a pointer and a presigned URL valid for
+    ``url_seconds``. Objects are named after a hash of the rows, so a
+    repeated result is uploaded once; an object the bucket's lifecycle rule
+    (``expiration_days``, 0 for none) would delete before a new URL expires
+    is uploaded again.
+    """
+
+    def __init__(
+            self,
+            bucket: str,
+            prefix: str = DEFAULT_PREFIX,
+            threshold_bytes: int = DEFAULT_THRESHOLD_BYTES,
+            preview_rows: int = DEFAULT_PREVIEW_ROWS,
+            url_seconds: int = DEFAULT_URL_SECONDS,
+            result_format: str = "jsonl",
+            expiration_days: int = DEFAULT_EXPIRATION_DAYS,
+            client: Any = None,
+            clock: Any = time.time,
+    ):
+        if result_format not in FORMATS:
+            raise ValueError(f"result format must be one of {FORMATS}, got {result_format!r}")
+        if expiration_days and url_seconds >= expiration_days * 86400:
+            raise ValueError(
+                f"presigned URLs ({url_seconds} s) must expire before the objects ({expiration_days} days)"
+            )
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.threshold_bytes = threshold_bytes
+        self.preview_rows = preview_rows
+        self.url_seconds = url_seconds
+        self.result_format = result_format
+        self.expiration_days = expiration_days
+        self.client = client
+        self._clock = clock
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultOffload"]:
+        bucket = os.getenv("RESULT_OFFLOAD_BUCKET") or os.getenv("ATHENA_BUCKET")
+        if not bucket or os.getenv("RESULT_OFFLOAD_DISABLED"):
+            return None
+        return cls(
+            bucket,
+            prefix=os.getenv("RESULT_OFFLOAD_PREFIX", DEFAULT_PREFIX),
+            threshold_bytes=int(os.getenv("RESULT_OFFLOAD_THRESHOLD_BYTES", DEFAULT_THRESHOLD_BYTES)),
+            preview_rows=int(os.getenv("RESULT_OFFLOAD_PREVIEW_ROWS", DEFAULT_PREVIEW_ROWS)),
+            url_seconds=int(os.getenv("RESULT_OFFLOAD_URL_SECONDS", DEFAULT_URL_SECONDS)),
+            result_format=os.getenv("RESULT_OFFLOAD_FORMAT", "jsonl"),
+            expiration_days=int(os.getenv("RESULT_OFFLOAD_EXPIRATION_DAYS", DEFAULT_EXPIRATION_DAYS)),
+        )
+
+    def offload(self, result: Any) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """``(preview, pointer)`` when ``result`` was written to S3, else None."""
+        # plain SQLDatabase results are strings without columns to write
+        if not isinstance(result, QueryResult):
+            return None
+        size = text_size(result)
+        if size <= self.threshold_bytes:
+            return None
+        if self.result_format == "parquet":
+            body, suffix = to_parquet(result), ".parquet"
+        else:
+            body, suffix = to_jsonl(result), ".jsonl.gz"
+        key = f"{self.prefix}{hashlib.sha256(body).hexdigest()[:32]}{suffix}"
+        if not self._reusable(key):
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=body)
+        pointer = {
+            "uri": f"s3://{self.bucket}/{key}",
+            "url": self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=self.url_seconds,
+            ),
+            "expires_in": self.url_seconds,
+            "format": self.result_format,
+            "rows": len(result.rows),
+            "columns": list(result.columns),
+            "bytes": len(body),
+            "result_bytes": size,
+        }
+        return self.preview(result, pointer["uri"]), pointer
+
+    def preview(self, result: QueryResult, uri: str) -> str:
+        head = QueryResult(
+            columns=result.columns,
+            rows=result.rows[:self.preview_rows],
+            max_string_length=result.max_string_length,
+        )
+        remaining = len(result.rows) - len(head.rows)
+        return f"{head}\n... {remaining} more rows in {uri}"
+
+    def _reusable(self, key: str) -> bool:
+        """True when ``key`` exists and outlives a URL presigned now."""
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError:
+            return False
+        if not self.expiration_days:
+            return True
+        # putting the object again restarts its lifecycle clock
+        age = self._clock() - head["LastModified"].timestamp()
+        return age < self.expiration_days * 86400 - self.url_seconds
@@ -0,0 +1,367 @@
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import OptimizeError, ParseError
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.optimizer.scope import traverse_scope
+
+DEFAULT_MAX_LIMIT = 1000
+
+# sqlglot dialect for each name SQLDatabase.dialect reports
+SQLGLOT_DIALECTS = {
+    "awsathena": "athena",
+    "presto": "presto",
+    "trino": "trino",
+    "duckdb": "duckdb",
+    "sqlite": "sqlite",
+    "postgresql": "postgres",
+    "mysql": "mysql",
+}
+
+# CREATE [EXTERNAL] TABLE blocks as SQLDatabase.get_table_info renders them,
+# followed on Athena by the table comment and the partition keys
+_CREATE_TABLE = re.compile(
+    r"CREATE (?:EXTERNAL )?TABLE (?:IF NOT EXISTS )?(?P<name>[^\s(]+) \(\n(?P<columns>.*?)\n\)"
+    r"(?:\nCOMMENT '(?:[^'\\]|\\.)*')?"
+    r"(?:\nPARTITIONED BY \(\n(?P<partitions>.*?)\n\))?",
+    re.DOTALL,
+)
+_QUOTES = "`\"[]"
+# DuckDB (and Presto connector) functions that read files or URLs
+_FILE_FUNCTIONS = re.compile(r"^(read_\w+|glob|\w+_scan|parquet_\w+|sniff_csv)$")
+
+
+@dataclass
+class TableSchema:
+    columns: Dict[str, str]
+    partition_keys: List[str] = field(default_factory=list)
+
+
+@lru_cache(maxsize=32)
+def parse_table_info(table_info: str) -> Dict[str, TableSchema]:
+    """Column names/types and partition keys from ``get_table_info`` text.
+
+    Reuses what the schema cache already holds instead of asking the
+    catalog again; lower-cased, since Athena identifiers are case-insensitive.
+    """
+    tables = {}
+    for match in _CREATE_TABLE.finditer(table_info):
+        name = match.group("name").split(".")[-1].strip(_QUOTES).lower()
+        columns = _parse_columns(match.group("columns"))
+        partitions = _parse_columns(match.group("partitions") or "")
+        tables[name] = TableSchema({**columns, **partitions}, list(partitions))
+    return tables
+
+
+def _parse_columns(block: str) -> Dict[str, str]:
+    columns = {}
+    for line in block.split("\n"):
+        line = line.strip().rstrip(",").strip()
+        if not line:
+            continue
+        name, _, column_type = line.partition(" ")
+        # drop COMMENT '...' and NOT NULL style suffixes from the type
+        column_type = re.split(r" (?:COMMENT|NOT NULL|NULL|DEFAULT)\b", column_type)[0]
+        columns[name.strip(_QUOTES).lower()] = column_type.strip() or "UNKNOWN"
+    return columns
+
+
+class PreflightError(ValueError):
+    """Generated SQL refused before it reached the database.
+
+    ``reason`` is one of ``parse``, ``statements``, ``read_only``,
+    ``unknown_table``, ``unknown_column`` or ``scan_scope``.
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+@dataclass
+class ScanScope:
+    """What one query reads from one table."""
+
+    table: str
+    columns: List[str]
+    total_columns: int
+    partition_keys: List[str]
+    partitions: Optional[int] = None
+    """Partitions read; None when a partition key is not bounded by the query."""
+
+
+@dataclass
+class PreflightReport:
+    sql: str
+    """SQL to execute, rewritten when the LIMIT was injected or capped."""
+    limit: Optional[int]
+    limit_action: Optional[str] = None
+    """``injected``, ``capped`` or None when the LIMIT was left alone."""
+    validated: bool = True
+    """False when the schema was unknown, so columns and tables were not checked."""
+    scopes: List[ScanScope] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SQLPreflight:
+    """Checks generated SQL against the cached schema before execution.
+
+    Runs locally in milliseconds, so a misspelt column or a ``DROP`` costs
+    no Athena round trip. Queries must be a single read-only statement
+    without table functions or functions that read files (``read_csv``,
+    ``read_text``, ``glob``, ``parquet_scan``); tables and columns must
+    exist in the ``table_info`` the SQL was generated from. A missing
+    LIMIT is injected as ``top_k`` (what the prompt asks for) and an
+    explicit one is capped at ``max_limit``. With ``max_partitions`` set,
+    queries on a partitioned table that read more partitions than that, or
+    do not bound its partition keys at all, are refused.
+    """
+
+    def __init__(self, max_limit: int = DEFAULT_MAX_LIMIT, max_partitions: int = 0):
+        self.max_limit = max_limit
+        self.max_partitions = max_partitions
+
+    @classmethod
+    def from_env(cls) -> Optional["SQLPreflight"]:
+        if os.getenv("PREFLIGHT_DISABLED"):
+            return None
+        return cls(
+            max_limit=int(os.getenv("PREFLIGHT_MAX_LIMIT", DEFAULT_MAX_LIMIT)),
+            max_partitions=int(os.getenv("PREFLIGHT_MAX_PARTITIONS", "0")),
+        )
+
+    def check(self, sql: str, table_info: str, top_k: int, dialect: str) -> PreflightReport:
+        read = SQLGLOT_DIALECTS.get(dialect)
+        try:
+            statements = [s for s in sqlglot.parse(sql, read=read) if s is not None]
+        except ParseError as exc:
+            error = exc.errors[0] if exc.errors else {}
+            raise PreflightError(
+                "parse",
+                f"could not parse the SQL: {error.get('description', 'invalid syntax')} "
+                f"(line {error.get('line')}, column {error.get('col')})",
+            ) from exc
+        if len(statements) != 1:
+            raise PreflightError("statements", f"expected one SQL statement, got {len(statements)}")
+        expression = statements[0]
+        _check_read_only(expression)
+
+        schema = parse_table_info(table_info)
+        report = PreflightReport(sql=sql, limit=None, validated=bool(schema))
+        if schema:
+            qualified = self._qualify(expression, schema, read)
+            if qualified is not None:
+                report.scopes = _scan_scopes(qualified, schema)
+            else:
+                report.validated = False
+        self._check_scan_scope(report)
+
+        limit, action = self._apply_limit(expression, top_k)
+        report.limit, report.limit_action = limit, action
+        if action is not None:
+            report.sql = expression.sql(dialect=read)
+        return report
+
+    @staticmethod
+    def _qualify(expression: exp.Expression, schema: Dict[str, TableSchema], read: Optional[str]) -> Any:
+        ctes = {cte.alias_or_name.lower() for cte in expression.find_all(exp.CTE)}
+        for table in expression.find_all(exp.Table):
+            name = table.name.lower()
+            if name not in schema and name not in ctes:
+                raise PreflightError("unknown_table", f"table {table.name!r} does not exist")
+
+        try:
+            return qualify(
+                expression.copy(),
+                schema={name: dict(table.columns) for name, table in schema.items()},
+                dialect=read,
+                validate_qualify_columns=True,
+                quote_identifiers=False,
+            )
+        except OptimizeError as exc:
+            raise PreflightError("unknown_column", str(exc)) from exc
+        except Exception:
+            # a construct the qualifier does not support is not the query's
+            # fault; let the database be the judge
+            return None
+
+    def _check_scan_scope(self, report: PreflightReport) -> None:
+        if not self.max_partitions:
+            return
+        for scope in report.scopes:
+            if not scope.partition_keys:
+                continue
+            if scope.partitions is None:
+                raise PreflightError(
+                    "scan_scope",
+                    f"query on {scope.table} must filter on its partition keys "
+                    f"({', '.join(scope.partition_keys)})",
+                )
+            if scope.partitions > self.max_partitions:
+                raise PreflightError(
+                    "scan_scope",
+                    f"query reads {scope.partitions} partitions of {scope.table}, "
+                    f"more than the {self.max_partitions} allowed",
+                )
+
+    def _apply_limit(self, expression: Any, top_k: int) -> Tuple[Optional[int], Optional[str]]:
+        limit = expression.args.get("limit")
+        if limit is None:
+            if _single_row(expression):
+                return None, None
+            expression.set("limit", exp.Limit(expression=exp.Literal.number(top_k)))
+            return top_k, "injected"
+        value = limit.expression
+        if not (isinstance(value, exp.Literal) and value.is_int):
+            return None, None
+        if int(value.this) > self.max_limit:
+            limit.set("expression", exp.Literal.number(self.max_limit))
+            return self.max_limit, "capped"
+        return int(value.this), None
+
+
+def _check_read_only(expression: Any) -> None:
+    if not isinstance(expression, exp.Query):
+        raise PreflightError("read_only", f"only queries may run, not {expression.key.upper()}")
+    for node in expression.walk():
+        if isinstance(node, (exp.DML, exp.DDL, exp.Command)):
+            raise PreflightError("read_only", f"{node.key.upper()} is not allowed in a query")
+        if isinstance(node, exp.Func):
+            _check_function(node)
+        # FROM read_csv(...), FROM generate_series(...) and other table functions
+        if isinstance(node, exp.Table) and not isinstance(node.this, exp.Identifier):
+            if isinstance(node.this, exp.Func):
+                _check_function(node.this)
+            raise PreflightError("unknown_table", f"{node.this.sql()} is not a table")
+
+
+def _check_function(node: Any) -> None:
+    name = (node.name if isinstance(node, exp.Anonymous) else node.sql_name()).lower()
+    if _FILE_FUNCTIONS.match(name):
+        raise PreflightError("file_access", f"{name}() reads files, not tables")
+
+
+def _single_row(expression: Any) -> bool:
+    # SELECT COUNT(*) ... without GROUP BY needs no LIMIT
+    return (
+        isinstance(expression, exp.Select)
+        and not expression.args.get("group")
+        and bool(expression.expressions)
+        and all(p.find(exp.AggFunc) and not p.find(exp.Window) for p in expression.expressions)
+    )
+
+
+def _scan_scopes(qualified: Any, schema: Dict[str, TableSchema]) -> List[ScanScope]:
+    columns: Dict[str, set] = {}
+    # partitions read by each occurrence of a table; None when unbounded
+    partitions: Dict[str, List[Optional[int]]] = {}
+    for scope in traverse_scope(qualified):
+        tables = {
+            alias: source.name.lower()
+            for alias, source in scope.sources.items()
+            if isinstance(source, exp.Table) and source.name.lower() in schema
+        }
+        for column in scope.columns:
+            table = tables.get(column.table)
+            if table is not None:
+                columns.setdefault(table, set()).add(column.name.lower())
+        where = scope.expression.args.get("where")
+        counts = _partition_counts(where.this, tables, schema) if where else {}
+        for alias, table in tables.items():
+            columns.setdefault(table, set())
+            read: Optional[int] = 1
+            for key in schema[table].partition_keys:
+                count = counts.get((alias, key))
+                read = None if count is None or read is None else read * count
+            partitions.setdefault(table, []).append(read)
+
+    scopes = []
+    for table in sorted(columns):
+        table_schema = schema[table]
+        reads = partitions.get(table, [None])
+        scopes.append(ScanScope(
+            table=table,
+            columns=sorted(columns[table]),
+            total_columns=len(table_schema.columns),
+            partition_keys=list(table_schema.partition_keys),
+            partitions=(
+                None if not table_schema.partition_keys or None in reads else sum(reads)
+            ),
+        ))
+    return scopes
+
+
+def _partition_counts(
+        condition: Any, tables: Dict[str, str], schema: Dict[str, TableSchema]
+) -> Dict[Tuple[str, str], Optional[int]]:
+    """Values each partition key can take under ``condition``; only AND-ed
+    comparisons with literals narrow a key, anything else leaves it unbounded."""
+    counts: Dict[Tuple[str, str], Optional[int]] = {}
+    ranges: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    conjuncts = condition.flatten() if isinstance(condition, exp.And) else [condition]
+    for conjunct in conjuncts:
+        column = conjunct.this
+        if not isinstance(column, exp.Column) or column.table not in tables:
+            continue
+        if column.name.lower() not in schema[tables[column.table]].partition_keys:
+            continue
+        key = (column.table, column.name.lower())
+        count = None
+        if isinstance(conjunct, exp.EQ) and _literal(conjunct.expression) is not None:
+            count = 1
+        elif isinstance(conjunct, exp.In) and conjunct.expressions and all(
+                _literal(e) is not None for e in conjunct.expressions):
+            count = len(conjunct.expressions)
+        elif isinstance(conjunct, exp.Between):
+            count = _span(_literal(conjunct.args["low"]), _literal(conjunct.args["high"]))
+        elif isinstance(conjunct, (exp.GT, exp.GTE)):
+            ranges.setdefault(key, {})["low"] = (
+                _literal(conjunct.expression), isinstance(conjunct, exp.GT))
+        elif isinstance(conjunct, (exp.LT, exp.LTE)):
+            ranges.setdefault(key, {})["high"] = (
+                _literal(conjunct.expression), isinstance(conjunct, exp.LT))
+        counts[key] = _narrower(counts.get(key), count)
+    for key, bounds in ranges.items():
+        if "low" in bounds and "high" in bounds:
+            (low, low_open), (high, high_open) = bounds["low"], bounds["high"]
+            span = _span(low, high)
+            if span is not None:
+                span = max(span - low_open - high_open, 0)
+            counts[key] = _narrower(counts.get(key), span)
+    return counts
+
+
+def _narrower(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    if a is None:
+        return b
+    return a if b is None else min(a, b)
+
+
+def _literal(node: Any) -> Any:
+    """A date or int for literal partition values, else None."""
+    if isinstance(node, exp.Cast):
+        node = node.this
+    if not isinstance(node, exp.Literal):
+        return None
+    if not node.is_string:
+        return int(node.this) if node.is_int else None
+    try:
+        return date.fromisoformat(node.this[:10])
+    except ValueError:
+        return node.this
+
+
+def _span(low: Any, high: Any) -> Optional[int]:
+    if isinstance(low, date) and isinstance(high, date):
+        return (high - low).days + 1
+    if isinstance(low, int) and isinstance(high, int):
+        return high - low + 1
+    return None
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_SIZE = 128
+DEFAULT_DATA_PREFIX = "samples/data/"
+DEFAULT_VERSION_INTERVAL = 30
+
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def canonicalize_sql(sql: str) -> str:
+    """Fold case and whitespace outside quoted literals/identifiers."""
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE.sub(" ", parts[i].lower())
+    return "".join(parts).strip()
+
+
+class S3DataVersion:
+    """Data-version token derived from the ETags under a table location.
+
+    Any put/delete under the prefix changes the token. The listing is reused
+    for ``min_interval`` seconds so hot paths do not list S3 on every query.
+    """
+
+    def __init__(
+            self,
+            bucket: str,
+            prefix: str = DEFAULT_DATA_PREFIX,
+            client: Any = None,
+            min_interval: float = DEFAULT_VERSION_INTERVAL,
+            clock: Callable[[], float] = time.time,
+    ):
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+        self.min_interval = min_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._checked_at = 0.0
+
+    def token(self) -> str:
+        with self._lock:
+            now = self._clock()
+            if self._token is None or now - self._checked_at >= self.min_interval:
+                self._token = self._list_token()
+                self._checked_at = now
+            return self._token
+
+    def _list_token(self) -> str:
+        digest = hashlib.sha256()
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                digest.update(f"{obj['Key']}\x1f{obj['ETag']}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU cache of SQL results keyed on canonical SQL plus a data-version token."""
+
+    def __init__(self, version_source: Any, max_size: int = DEFAULT_MAX_SIZE):
+        self.version_source = version_source
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        bucket = os.getenv("ATHENA_BUCKET")
+        if not bucket or os.getenv("RESULT_CACHE_DISABLED"):
+            return None
+        version_source = S3DataVersion(
+            bucket,
+            prefix=os.getenv("RESULT_CACHE_DATA_PREFIX", DEFAULT_DATA_PREFIX),
+            min_interval=float(os.getenv("RESULT_CACHE_VERSION_INTERVAL", DEFAULT_VERSION_INTERVAL)),
+        )
+        return cls(version_source, int(os.getenv("RESULT_CACHE_SIZE", DEFAULT_MAX_SIZE)))
+
+    def get_or_run(self, sql: str, run: Callable[[str], Any]) -> Tuple[Any, bool]:
+        """Return ``(result, hit)``, calling ``run(sql)`` on a miss."""
+        version = self.version_source.token()
+        key = (canonicalize_sql(sql), version)
+        with self._lock:
+            if version != self._version:
+                # data changed, nothing cached under the old token is reachable
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key], True
+        result = run(sql)
+        with self._lock:
+            self.misses += 1
+            if version == self._version:
+                self._entries[key] = result
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return result, False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,184 @@
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain.llms import Bedrock
+
+from text2sql.aio import run_blocking
+from text2sql.preflight import parse_table_info
+from text2sql.schema_index import tokenize
+from text2sql.streaming import outdated_botocore
+
+FAST = "fast"
+STRONG = "strong"
+# questions scoring at least this go to the strong model
+DEFAULT_THRESHOLD = 3
+
+_WORD = re.compile(r"[a-z0-9]+")
+AGGREGATIONS = frozenset(
+    "sum total average avg mean count many max maximum min minimum highest lowest most least".split()
+)
+GROUPINGS = frozenset("per each by group grouped breakdown split".split())
+TIME_WINDOWS = frozenset(
+    "day daily week weekly month monthly quarter quarterly year yearly last since between before after".split()
+)
+# wording that usually needs window functions, subqueries or set logic
+COMPLEX_TERMS = frozenset(
+    "compare compared comparison versus vs ratio percentage percent share growth grew trend "
+    "change changed rank ranking ranked cumulative running rolling median percentile distinct "
+    "unique except without never both than difference correlation retention churn".split()
+)
+NESTED_PHRASES = ("who also", "that also", "than average", "than the average", "at least", "at most")
+
+
+@dataclass
+class Route:
+    tier: str
+    score: float
+    features: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def question_features(question: str, table_info: str = "") -> Dict[str, Any]:
+    """Cheap local signals of how hard a question is to turn into SQL."""
+    text = question.lower()
+    words = _WORD.findall(text)
+    terms = set(tokenize(question))
+    tables, columns = [], set()
+    for table, schema in parse_table_info(table_info).items():
+        if set(tokenize(table)) & terms:
+            tables.append(table)
+        columns.update(c for c in schema.columns if set(tokenize(c)) <= terms)
+    return {
+        "words": len(words),
+        "aggregations": len(AGGREGATIONS.intersection(words)),
+        "grouping": bool(GROUPINGS.intersection(words)),
+        "time_window": bool(TIME_WINDOWS.intersection(words)),
+        "complex_terms": sorted(COMPLEX_TERMS.intersection(words)),
+        "nested": any(phrase in text for phrase in NESTED_PHRASES),
+        "tables": tables,
+        "columns": len(columns),
+    }
+
+
+def complexity_score(features: Dict[str, Any]) -> float:
+    score = 0.0
+    score += 1 if features["words"] > 25 else 0
+    score += 1 if features["words"] > 40 else 0
+    score += 1 if features["aggregations"] > 1 else 0
+    score += 1 if features["grouping"] else 0
+    score += 1 if features["time_window"] else 0
+    # one comparison or set word is enough for the strong model
+    score += min(2 + len(features["complex_terms"]), 4) if features["complex_terms"] else 0
+    score += 2 if features["nested"] else 0
+    # two tables named in one question means a join
+    score += 2 if len(features["tables"]) > 1 else 0
+    score += 1 if features["columns"] > 2 else 0
+    return score
+
+
+class ModelRouter:
+    """Sends simple questions to a fast model and the rest to a strong one.
+
+    Questions are scored from local features (length, aggregation,
+    grouping, time-window and comparison wording, and the tables and
+    columns of ``table_info`` they name); a score of ``threshold`` or more
+    goes to ``strong_llm``. With ``escalate``, SQL from the fast model that
+    fails preflight or execution is written again by the strong model.
+    """
+
+    def __init__(
+            self,
+            fast_llm: Any,
+            strong_llm: Any,
+            threshold: float = DEFAULT_THRESHOLD,
+            escalate: bool = True,
+    ):
+        self.llms = {FAST: fast_llm, STRONG: strong_llm}
+        self.threshold = threshold
+        self.escalate = escalate
+        self._lock = threading.Lock()
+        self.routed = {FAST: 0, STRONG: 0}
+        self.escalations = 0
+        self.failed_escalations = 0
+
+    def classify(self, question: str, table_info: str = "") -> Route:
+        features = question_features(question, table_info)
+        score = complexity_score(features)
+        tier = STRONG if score >= self.threshold else FAST
+        with self._lock:
+            self.routed[tier] += 1
+        return Route(tier, score, features)
+
+    def llm(self, tier: str) -> Any:
+        return self.llms[tier]
+
+    def record_escalation(self, succeeded: bool) -> None:
+        with self._lock:
+            self.escalations += 1
+            if not succeeded:
+                self.failed_escalations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        fast = self.routed[FAST]
+        return {
+            "fast": fast,
+            "strong": self.routed[STRONG],
+            "escalations": self.escalations,
+            "failed_escalations": self.failed_escalations,
+            "escalation_rate": round(self.escalations / fast, 4) if fast else 0.0,
+        }
+
+
+# TGI parameters (see text2sql/speculative.py) Bedrock models reject
+_TGI_ONLY_KWARGS = ("do_sample", "seed")
+
+
+class BedrockCompletion(Bedrock):
+    """Bedrock text model that takes the chain's plain prompts.
+
+    Anthropic models need the Human/Assistant turn format; TGI-only
+    sampling parameters are dropped and ``_acall`` runs on the io pool.
+    """
+
+    def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Any = None,
+            **kwargs: Any,
+    ) -> str:
+        kwargs = {k: v for k, v in kwargs.items() if k not in _TGI_ONLY_KWARGS}
+        if self.model_id.startswith("anthropic.") and "\n\nHuman:" not in prompt:
+            prompt = f"\n\nHuman: {prompt.strip()}\n\nAssistant:"
+        return super()._call(prompt, stop, run_manager, **kwargs)
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Any = None,
+            **kwargs: Any,
+    ) -> str:
+        return await run_blocking(self._call, prompt, stop, **kwargs)
+
+
+def bedrock_llm(model_id: str, region_name: Optional[str] = None, **model_kwargs: Any) -> BedrockCompletion:
+    """``BedrockCompletion`` on the ``bedrock-runtime`` API."""
+    import boto3
+    from botocore.exceptions import UnknownServiceError
+
+    region_name = region_name or os.getenv("BEDROCK_REGION") or os.getenv("AWS_REGION")
+    try:
+        client = boto3.client("bedrock-runtime", region_name=region_name)
+    except UnknownServiceError:
+        raise RuntimeError(outdated_botocore("bedrock-runtime", "invoke_model")) from None
+    return BedrockCompletion(
+        model_id=model_id,
+        client=client,
+        model_kwargs=model_kwargs or None,
+    )
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain import SQLDatabase
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_PERSIST_PATH = "/tmp/text2sql_schema_cache.json"
+
+CacheKey = Tuple[str, Tuple[str, ...], int]
+
+
+def database_id(database: "SQLDatabase") -> str:
+    return database._engine.url.render_as_string(hide_password=True)
+
+
+class SchemaCache:
+    """TTL cache for ``SQLDatabase.get_table_info``.
+
+    Entries are keyed by (database, table set, sample_rows setting). When
+    ``persist_path`` is set, entries are snapshotted to disk so a fresh
+    container can start without asking Glue again.
+    """
+
+    def __init__(
+            self,
+            ttl_seconds: float = DEFAULT_TTL_SECONDS,
+            persist_path: Optional[str] = None,
+            clock: Callable[[], float] = time.time,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[CacheKey, Tuple[float, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        if persist_path:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "SchemaCache":
+        return cls(
+            ttl_seconds=float(os.getenv("SCHEMA_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+            persist_path=os.getenv("SCHEMA_CACHE_PATH", DEFAULT_PERSIST_PATH) or None,
+        )
+
+    @staticmethod
+    def make_key(database: "SQLDatabase", table_names: Optional[List[str]]) -> CacheKey:
+        tables = tuple(sorted(table_names)) if table_names else ("*",)
+        return database_id(database), tables, database._sample_rows_in_table_info
+
+    def get_table_info(
+            self, database: "SQLDatabase", table_names: Optional[List[str]] = None
+    ) -> str:
+        key = self.make_key(database, table_names)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self.hits += 1
+                return entry[1]
+        table_info = database.get_table_info(table_names=table_names)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (now, table_info)
+        self._save()
+        return table_info
+
+    def invalidate(self, database: Optional["SQLDatabase"] = None) -> None:
+        """Drop every entry, or only those of ``database``."""
+        with self._lock:
+            if database is None:
+                self._entries.clear()
+            else:
+                db_id = database_id(database)
+                self._entries = {
+                    k: v for k, v in self._entries.items() if k[0] != db_id
+                }
+        self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _load(self) -> None:
+        try:
+            with open(self.persist_path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(json.dumps({"schema_cache": "unreadable snapshot", "path": self.persist_path, "error": repr(e)}))
+            return
+        except ValueError as e:
+            self._discard_snapshot(e)
+            return
+        now = self._clock()
+        entries = {}
+        try:
+            for item in snapshot:
+                key = (str(item["database"]), tuple(map(str, item["tables"])), int(item["sample_rows"]))
+                stored_at = float(item["stored_at"])
+                table_info = item["table_info"]
+                if not isinstance(table_info, str):
+                    raise TypeError(f"table_info is {type(table_info).__name__}, not str")
+                if now - stored_at < self.ttl_seconds:
+                    entries[key] = (stored_at, table_info)
+        except Exception as e:
+            # a truncated or foreign file is a miss, never an import failure
+            self._discard_snapshot(e)
+            return
+        self._entries.update(entries)
+
+    def _discard_snapshot(self, error: Exception) -> None:
+        print(json.dumps({"schema_cache": "discarded snapshot", "path": self.persist_path, "error": repr(error)}))
+        try:
+            os.remove(self.persist_path)
+        except OSError:
+            pass
+
+    def _save(self) -> None:
+        if not self.persist_path:
+            return
+        with self._lock:
+            snapshot = [
+                {
+                    "database": key[0],
+                    "tables": list(key[1]),
+                    "sample_rows": key[2],
+                    "stored_at": stored_at,
+                    "table_info": table_info,
+                }
+                for key, (stored_at, table_info) in self._entries.items()
+            ]
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.persist_path)
+        except OSError:
+            # A read-only or full /tmp only costs us the snapshot
+            pass
@@ -0,0 +1,282 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain import SQLDatabase
+
+DEFAULT_TOP_K = 5
+DEFAULT_TTL_SECONDS = 3600
+
+# Table names say the most about what a table holds, comments the least
+NAME_WEIGHT = 3
+COLUMN_WEIGHT = 2
+COMMENT_WEIGHT = 1
+
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does e each for from g give how i in is it list "
+    "many me much of on or per show tell than that the their there this to was were "
+    "what when where which who with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words with snake/camel case split and plurals folded."""
+    words = _WORD.findall(_CAMEL.sub(r"\1 \2", text or "").lower())
+    return [_stem(w) for w in words if w not in STOPWORDS]
+
+
+def _stem(word: str) -> str:
+    if len(word) <= 3 or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "ses")):
+        return word[:-2]
+    return word[:-1] if word.endswith("s") else word
+
+
+@dataclass
+class TableDocument:
+    """What the catalog says about one table."""
+
+    name: str
+    columns: List[Tuple[str, str, str]]
+    """(name, type, comment) per column, partition keys included."""
+    comment: str = ""
+    fingerprint: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        raw = "\x1f".join([self.name, self.comment, *("\x1e".join(c) for c in self.columns)])
+        self.fingerprint = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def terms(self) -> Counter:
+        terms = Counter()
+        for token in tokenize(self.name):
+            terms[token] += NAME_WEIGHT
+        for token in tokenize(self.comment):
+            terms[token] += COMMENT_WEIGHT
+        for name, _, comment in self.columns:
+            for token in tokenize(name):
+                terms[token] += COLUMN_WEIGHT
+            for token in tokenize(comment):
+                terms[token] += COMMENT_WEIGHT
+        return terms
+
+    def schema_tokens(self) -> int:
+        # serialize pulls in numpy, which handlers keep off their import path
+        from text2sql.serialize import estimate_tokens
+
+        # the CREATE TABLE part of table_info; sample rows are not counted
+        columns = ", \n\t".join(f"{name} {column_type.upper()}" for name, column_type, _ in self.columns)
+        return estimate_tokens(f"\nCREATE TABLE {self.name} (\n\t{columns}\n)\n")
+
+
+def catalog_documents(database: "SQLDatabase") -> List[TableDocument]:
+    """Describe every usable table of ``database``.
+
+    On Athena a single paginated ListTableMetadata call returns the columns
+    and Glue comments of the whole database; other engines are reflected
+    table by table.
+    """
+    usable = set(database.get_usable_table_names())
+    engine = database._engine
+    documents = []
+    if engine.dialect.name == "awsathena":
+        with engine.connect() as connection:
+            raw_connection = connection.connection.driver_connection
+            with raw_connection.cursor() as cursor:
+                tables = cursor.list_table_metadata(
+                    schema_name=database._schema or raw_connection.schema_name
+                )
+        for table in tables:
+            if table.name in usable:
+                columns = [
+                    (c.name, c.type or "", c.comment or "")
+                    for c in table.columns + table.partition_keys
+                ]
+                documents.append(TableDocument(table.name, columns, table.comment or ""))
+        return documents
+
+    from sqlalchemy import inspect
+
+    # a fresh inspector, since one caches reflection for its lifetime
+    inspector = inspect(engine)
+    for name in sorted(usable):
+        columns = [
+            (c["name"], str(c["type"]), c.get("comment") or "")
+            for c in inspector.get_columns(name, schema=database._schema)
+        ]
+        try:
+            comment = inspector.get_table_comment(name, schema=database._schema).get("text") or ""
+        except NotImplementedError:
+            comment = ""
+        documents.append(TableDocument(name, columns, comment))
+    return documents
+
+
+class SchemaIndex:
+    """TF-IDF index over table names, column names and comments.
+
+    Picks the ``top_k`` tables most similar to a question (cosine
+    similarity with NumPy), so the SQL prompt carries their ``table_info``
+    instead of the whole catalog's. The catalog is listed again after
+    ``ttl_seconds``; only tables whose columns or comments changed are
+    re-tokenized. Keep one instance per process, like the schema cache.
+    """
+
+    def __init__(
+            self,
+            top_k: int = DEFAULT_TOP_K,
+            ttl_seconds: float = DEFAULT_TTL_SECONDS,
+            catalog: Callable[["SQLDatabase"], List[TableDocument]] = catalog_documents,
+            clock: Callable[[], float] = time.time,
+    ):
+        self.top_k = top_k
+        self.ttl_seconds = ttl_seconds
+        self._catalog = catalog
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._documents: Dict[str, TableDocument] = {}
+        self._terms: Dict[str, Counter] = {}
+        self._schema_tokens: Dict[str, int] = {}
+        self._tables: List[str] = []
+        self._vocabulary: Dict[str, int] = {}
+        self._idf: Any = None
+        self._matrix: Any = None
+        self._refreshed_at: Optional[float] = None
+        self._database_id: Optional[str] = None
+        self.refreshes = 0
+        self.updated_tables = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SchemaIndex"]:
+        if os.getenv("SCHEMA_INDEX_DISABLED"):
+            return None
+        return cls(
+            top_k=int(os.getenv("SCHEMA_INDEX_TOP_K", DEFAULT_TOP_K)),
+            ttl_seconds=float(os.getenv("SCHEMA_INDEX_TTL", DEFAULT_TTL_SECONDS)),
+        )
+
+    def refresh(self, database: "SQLDatabase") -> int:
+        """List the catalog and re-index changed tables; returns how many changed."""
+        from text2sql.schema_cache import database_id
+
+        documents = {d.name: d for d in self._catalog(database)}
+        with self._lock:
+            self._database_id = database_id(database)
+            changed = [
+                name for name, document in documents.items()
+                if name not in self._documents
+                or self._documents[name].fingerprint != document.fingerprint
+            ]
+            removed = set(self._documents) - set(documents)
+            # swapped rather than mutated, select() reads it without the lock
+            schema_tokens = dict(self._schema_tokens)
+            for name in changed:
+                self._terms[name] = documents[name].terms()
+                schema_tokens[name] = documents[name].schema_tokens()
+            for name in removed:
+                del self._terms[name]
+                del schema_tokens[name]
+            self._schema_tokens = schema_tokens
+            self._documents = documents
+            if changed or removed or self._matrix is None:
+                self._build_matrix()
+            self._refreshed_at = self._clock()
+            self.refreshes += 1
+            self.updated_tables += len(changed) + len(removed)
+        return len(changed) + len(removed)
+
+    def _build_matrix(self) -> None:
+        import numpy as np
+
+        self._tables = sorted(self._terms)
+        document_frequency = Counter()
+        for terms in self._terms.values():
+            document_frequency.update(terms.keys())
+        self._vocabulary = {term: i for i, term in enumerate(sorted(document_frequency))}
+        count = len(self._tables)
+        self._idf = np.array(
+            [math.log((1 + count) / (1 + document_frequency[t])) + 1 for t in sorted(document_frequency)],
+            dtype=np.float32,
+        )
+        matrix = np.zeros((count, len(self._vocabulary)), dtype=np.float32)
+        for row, table in enumerate(self._tables):
+            for term, weight in self._terms[table].items():
+                matrix[row, self._vocabulary[term]] = weight
+        matrix *= self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def _refresh_if_stale(self, database: "SQLDatabase") -> None:
+        from text2sql.schema_cache import database_id
+
+        stale = (
+            self._refreshed_at is None
+            or database_id(database) != self._database_id
+            or self._clock() - self._refreshed_at >= self.ttl_seconds
+        )
+        if stale:
+            self.refresh(database)
+
+    def scores(self, question: str) -> Dict[str, float]:
+        import numpy as np
+
+        with self._lock:
+            vector = np.zeros(len(self._vocabulary), dtype=np.float32)
+            for token in tokenize(question):
+                index = self._vocabulary.get(token)
+                if index is not None:
+                    vector[index] += 1
+            norm = np.linalg.norm(vector * self._idf) if len(vector) else 0
+            if not norm:
+                return {}
+            similarity = self._matrix @ (vector * self._idf / norm)
+            return {t: float(s) for t, s in zip(self._tables, similarity) if s > 0}
+
+    def select(
+            self, database: "SQLDatabase", question: str
+    ) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+        """``(table_names, report)`` for a question.
+
+        ``table_names`` is None, meaning all tables, when the catalog is no
+        larger than ``top_k`` or no table shares a word with the question.
+        """
+        self._refresh_if_stale(database)
+        schema_tokens = self._schema_tokens
+        all_tokens = sum(schema_tokens.values())
+        report: Dict[str, Any] = {"candidates": len(schema_tokens), "schema_tokens_all": all_tokens}
+        if len(schema_tokens) <= self.top_k:
+            return None, {**report, "tables": None, "schema_tokens": all_tokens, "saved_tokens": 0}
+
+        scores = self.scores(question)
+        if not scores:
+            self.fallbacks += 1
+            return None, {**report, "tables": None, "schema_tokens": all_tokens, "saved_tokens": 0}
+        ranked = sorted(scores, key=lambda t: (-scores[t], t))[: self.top_k]
+        tokens = sum(schema_tokens[t] for t in ranked)
+        return ranked, {
+            **report,
+            "tables": ranked,
+            "scores": {t: round(scores[t], 4) for t in ranked},
+            "schema_tokens": tokens,
+            "saved_tokens": all_tokens - tokens,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tables": len(self._documents),
+            "refreshes": self.refreshes,
+            "updated_tables": self.updated_tables,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,150 @@
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from text2sql.database import QueryResult
+
+DEFAULT_TOKEN_BUDGET = 1000
+DEFAULT_MAX_ROWS = 50
+TOP_K = 3
+
+# No tokenizer ships in the layer; ~4 characters per token is close enough
+# for TGI models to keep prompts inside the context window.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _format_value(value: Any, max_length: int) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    value = str(value).replace("|", "/").replace("\n", " ")
+    return value if len(value) <= max_length else value[:max_length] + "..."
+
+
+def _column_lines(result: QueryResult, rows: Sequence[Sequence[Any]]) -> List[str]:
+    # one line per column: the name is written once instead of per row, and
+    # the columns of a wide result can be dropped from the end
+    return [
+        f"{name}: " + "|".join(_format_value(row[i], result.max_string_length) for row in rows)
+        for i, name in enumerate(result.columns)
+    ]
+
+
+def _fit(header: str, lines: List[str], max_chars: int) -> Tuple[List[str], int]:
+    """``header`` and the leading ``lines`` within ``max_chars``, then a count of the rest.
+
+    Also returns how many of ``lines`` were kept.
+    """
+    for keep in range(len(lines), -1, -1):
+        kept = [header, *lines[:keep]]
+        if keep < len(lines):
+            kept.append(f"... {len(lines) - keep} more columns")
+        if len("\n".join(kept)) <= max_chars:
+            break
+    return kept, keep
+
+
+def _cut(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max(max_chars - 3, 0)] + "..."
+
+
+def _is_numeric(values: List[Any]) -> bool:
+    return bool(values) and all(
+        isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in values
+    )
+
+
+def summarize_columns(result: QueryResult) -> List[str]:
+    """One line of summary statistics per column."""
+    lines = []
+    for i, name in enumerate(result.columns):
+        values = [row[i] for row in result.rows if row[i] is not None]
+        nulls = len(result.rows) - len(values)
+        if _is_numeric(values):
+            array = np.asarray(values, dtype=np.float64)
+            stats = (
+                f"count={array.size} sum={array.sum():.6g} min={array.min():.6g} "
+                f"max={array.max():.6g} mean={array.mean():.6g}"
+            )
+        else:
+            counts = Counter(str(v) for v in values)
+            top = ", ".join(f"{v} ({n})" for v, n in counts.most_common(TOP_K))
+            stats = f"count={len(values)} distinct={len(counts)} top={top}"
+        if nulls:
+            stats += f" nulls={nulls}"
+        lines.append(f"{name}: {stats}")
+    return lines
+
+
+def serialize_result(
+        result: Union[QueryResult, str],
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        max_rows: int = DEFAULT_MAX_ROWS,
+) -> Tuple[str, Dict[str, Any]]:
+    """Render a SQL result for a prompt within ``token_budget`` tokens.
+
+    Small results are written column by column, one ``name: v1|v2|...``
+    line each. When the rows exceed ``max_rows`` or the budget, per-column
+    summary statistics are sent instead, followed by as many leading rows as
+    still fit; columns that do not fit are counted, not listed. The returned
+    dict records the decision for the intermediate steps.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    if not isinstance(result, QueryResult):
+        # plain SQLDatabase.run output; all we can do is cut it
+        result_text = _cut(str(result), max_chars)
+        mode = "full" if result_text == str(result) else "truncated"
+        return result_text, {"mode": mode, "tokens": estimate_tokens(result_text)}
+
+    if not result.returns_rows:
+        return "", {"mode": "full", "rows": 0, "rows_shown": 0, "tokens": 0}
+
+    total_rows = len(result.rows)
+    columns = len(result.columns)
+    if total_rows <= max_rows:
+        result_text = "\n".join(_column_lines(result, result.rows)) if total_rows else "0 rows"
+        if estimate_tokens(result_text) <= token_budget:
+            return result_text, {
+                "mode": "full",
+                "rows": total_rows,
+                "rows_shown": total_rows,
+                "columns_shown": columns,
+                "tokens": estimate_tokens(result_text),
+            }
+
+    lines, columns_shown = _fit(
+        f"{total_rows} rows; column summary:", summarize_columns(result), max_chars
+    )
+    shown = 0
+    if columns_shown == columns:
+        # as many leading rows as fit, written the same way as in full mode
+        values = [
+            [_format_value(row[i], result.max_string_length) for row in result.rows[:max_rows]]
+            for i in range(columns)
+        ]
+        used = len("\n".join(lines)) + len(f"\nfirst {max_rows} rows:")
+        used += sum(len(f"\n{name}: ") for name in result.columns)
+        for count in range(1, min(total_rows, max_rows) + 1):
+            used += sum(len(column[count - 1]) + (count > 1) for column in values)
+            if used > max_chars:
+                break
+            shown = count
+        if shown:
+            lines.append(f"first {shown} rows:")
+            lines.extend(_column_lines(result, result.rows[:shown]))
+    # only a budget too small for the header is left to cut
+    result_text = _cut("\n".join(lines), max_chars)
+    return result_text, {
+        "mode": "summary",
+        "rows": total_rows,
+        "rows_shown": shown,
+        "columns_shown": columns_shown,
+        "tokens": estimate_tokens(result_text),
+    }
@@ -0,0 +1,151 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CANDIDATES = 1
+DEFAULT_MAX_CANDIDATES = 4
+DEFAULT_TEMPERATURE = 0.7
+# how long the winner waits for StopQueryExecution calls to go out
+CANCEL_TIMEOUT_SECONDS = 2.0
+
+# Candidate queries block while pyathena polls; kept off the generation pool
+query_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SPECULATIVE_POOL_SIZE", "8")),
+    thread_name_prefix="speculative",
+)
+# StopQueryExecution calls, so they never queue behind the queries they stop
+cancel_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cancel")
+
+
+def normalize_sql(sql: str, dialect: Optional[str] = None) -> str:
+    """Canonical text of ``sql``, so formatting variants execute once."""
+    import sqlglot
+    from sqlglot.errors import SqlglotError
+
+    try:
+        return sqlglot.transpile(sql, read=dialect, write=dialect)[0]
+    except (SqlglotError, IndexError):
+        return " ".join(sql.split()).rstrip(";")
+
+
+@dataclass
+class RaceResult:
+    index: int
+    """Position of the winning candidate; 0 is the one generated as usual."""
+    sql: str
+    result: Any
+    executed: int
+    failed: int
+    cancelled: int
+
+
+class SQLCandidateRace:
+    """Runs several SQL candidates for one question at once.
+
+    Candidate 0 is generated with the chain's model settings, the others
+    are sampled at ``temperature``. Distinct candidates execute
+    concurrently; the first to succeed wins and the queries still running
+    are cancelled (``StopQueryExecution`` on Athena). ``candidates`` is the
+    default budget per question, which a request can raise up to
+    ``max_candidates``; a budget of 1 generates and runs one query as usual.
+    """
+
+    def __init__(
+            self,
+            candidates: int = DEFAULT_CANDIDATES,
+            max_candidates: int = DEFAULT_MAX_CANDIDATES,
+            temperature: float = DEFAULT_TEMPERATURE,
+            pool: Executor = query_pool,
+    ):
+        self.candidates = candidates
+        self.max_candidates = max_candidates
+        self.temperature = temperature
+        self._pool = pool
+        self._lock = threading.Lock()
+        self.races = 0
+        self.primary_wins = 0
+        self.sampled_wins = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.exhausted = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SQLCandidateRace"]:
+        if os.getenv("SPECULATIVE_DISABLED"):
+            return None
+        return cls(
+            candidates=int(os.getenv("SQL_CANDIDATES", DEFAULT_CANDIDATES)),
+            max_candidates=int(os.getenv("SQL_MAX_CANDIDATES", DEFAULT_MAX_CANDIDATES)),
+            temperature=float(os.getenv("SQL_CANDIDATE_TEMPERATURE", DEFAULT_TEMPERATURE)),
+        )
+
+    def budget(self, requested: Optional[int] = None) -> int:
+        """Candidates for one question: ``requested`` or the default, capped."""
+        return max(1, min(int(requested or self.candidates), self.max_candidates))
+
+    def sampling_kwargs(self, index: int) -> Dict[str, Any]:
+        """Model parameters of sampled candidate ``index``, merged into model_kwargs."""
+        return {"temperature": self.temperature, "do_sample": True, "seed": index}
+
+    def run(
+            self,
+            candidates: List[Tuple[int, str]],
+            run: Callable[[str, Any], Any],
+    ) -> RaceResult:
+        """Execute ``(index, sql)`` candidates with ``run(sql, cancel_token)``.
+
+        Raises the error of the lowest-index candidate when all fail.
+        """
+        from text2sql.database import CancelToken
+
+        futures = {}
+        for index, sql in candidates:
+            token = CancelToken()
+            futures[self._pool.submit(run, sql, token)] = (index, sql, token)
+
+        errors: Dict[int, BaseException] = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: futures[f][0]):
+                index, sql, _ = futures[future]
+                if future.exception() is not None:
+                    errors[index] = future.exception()
+                    continue
+                self._cancel([futures[f][2] for f in pending])
+                with self._lock:
+                    self.races += 1
+                    self.failed += len(errors)
+                    self.cancelled += len(pending)
+                    if index == 0:
+                        self.primary_wins += 1
+                    else:
+                        self.sampled_wins += 1
+                return RaceResult(
+                    index, sql, future.result(),
+                    executed=len(futures), failed=len(errors), cancelled=len(pending),
+                )
+
+        with self._lock:
+            self.races += 1
+            self.failed += len(errors)
+            self.exhausted += 1
+        raise errors[min(errors)]
+
+    def _cancel(self, tokens: List[Any]) -> None:
+        # sent before returning: a frozen Lambda would leave the queries running
+        stops = [cancel_pool.submit(token.cancel) for token in tokens]
+        if stops:
+            wait(stops, timeout=CANCEL_TIMEOUT_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "races": self.races,
+            "primary_wins": self.primary_wins,
+            "sampled_wins": self.sampled_wins,
+            "candidates_failed": self.failed,
+            "queries_cancelled": self.cancelled,
+            "exhausted": self.exhausted,
+        }
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+DEFAULT_MAX_SIZE = 256
+
+# only sentence punctuation at the end: "price > 100" and "price < 100",
+# "-5" and "5", "5%" and "5" are different questions
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, whitespace and a trailing ``?`` so retypings share an entry."""
+    question = _WHITESPACE.sub(" ", question.lower()).strip()
+    return _TRAILING_PUNCTUATION.sub("", question)
+
+
+class InMemoryBackend:
+    """Bounded LRU mapping kept in the Lambda process."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            sql = self._entries.get(key)
+            if sql is not None:
+                self._entries.move_to_end(key)
+            return sql
+
+    def put(self, key: str, sql: str) -> None:
+        with self._lock:
+            self._entries[key] = sql
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DynamoDBBackend:
+    """Shares entries across containers through a DynamoDB table.
+
+    The table needs a string partition key ``cache_key``; enable TTL on the
+    ``expires_at`` attribute to bound its size. Pass ``client`` to use a
+    local stand-in (DynamoDB Local, moto, or any object with the same
+    ``get_item``/``put_item``/``delete_item`` calls).
+    """
+
+    def __init__(self, table_name: str, client: Any = None, ttl_seconds: Optional[int] = None):
+        self.table_name = table_name
+        self._client = client
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def client(self) -> Any:
+        # Created on first use so importing a handler does not load boto3
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def get(self, key: str) -> Optional[str]:
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={"cache_key": {"S": key}},
+            ConsistentRead=False,
+        )
+        item = response.get("Item")
+        if not item:
+            return None
+        expires_at = item.get("expires_at")
+        # TTL deletion is lazy, so expired items can still be returned for a while
+        if expires_at and int(expires_at["N"]) < time.time():
+            return None
+        return item["sql"]["S"]
+
+    def put(self, key: str, sql: str) -> None:
+        item = {"cache_key": {"S": key}, "sql": {"S": sql}}
+        if self.ttl_seconds:
+            item["expires_at"] = {"N": str(int(time.time() + self.ttl_seconds))}
+        self.client.put_item(TableName=self.table_name, Item=item)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_item(TableName=self.table_name, Key={"cache_key": {"S": key}})
+
+
+class QuestionSQLCache:
+    """Maps normalized questions to SQL that previously executed successfully."""
+
+    def __init__(self, backend: Any = None):
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "QuestionSQLCache":
+        table_name = os.getenv("SQL_CACHE_TABLE")
+        if table_name:
+            ttl = os.getenv("SQL_CACHE_TTL")
+            return cls(DynamoDBBackend(table_name, ttl_seconds=int(ttl) if ttl else None))
+        return cls(InMemoryBackend(int(os.getenv("SQL_CACHE_SIZE", DEFAULT_MAX_SIZE))))
+
+    @staticmethod
+    def make_key(question: str, scope: Sequence[str] = ()) -> str:
+        # scope keeps SQL for one database/table set from leaking into another
+        raw = "\x1f".join([*scope, normalize_question(question)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, scope: Sequence[str] = ()) -> Optional[str]:
+        sql = self.backend.get(self.make_key(question, scope))
+        if sql is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return sql
+
+    def put(self, question: str, sql: str, scope: Sequence[str] = ()) -> None:
+        self.backend.put(self.make_key(question, scope), sql)
+
+    def invalidate(self, question: str, scope: Sequence[str] = ()) -> None:
+        self.backend.delete(self.make_key(question, scope))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,122 @@
+import json
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.llms.utils import enforce_stop_tokens
+from pydantic import root_validator
+
+from text2sql.aio import AsyncSagemakerEndpoint
+
+
+class TGIStreamParser:
+    """Incremental parser for text-generation-inference server-sent events.
+
+    ``invoke_endpoint_with_response_stream`` splits the ``data:{...}`` lines
+    at arbitrary byte offsets, so bytes are buffered until a full line is in.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[str]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [token for token in map(self._parse_line, lines) if token]
+
+    def close(self) -> List[str]:
+        line, self._buffer = self._buffer, b""
+        token = self._parse_line(line)
+        return [token] if token else []
+
+    @staticmethod
+    def _parse_line(line: bytes) -> Optional[str]:
+        line = line.strip()
+        if not line.startswith(b"data:"):
+            return None
+        event = json.loads(line[len(b"data:"):])
+        token = event.get("token") or {}
+        if token.get("special"):
+            return None
+        return token.get("text")
+
+
+def outdated_botocore(service: str, operation: str) -> str:
+    import botocore
+
+    return (
+        f"botocore {botocore.__version__} has no {service} {operation}; the Lambda "
+        "runtime's boto3 is too old, build the layer with --keep-runtime-packages"
+    )
+
+
+def iter_payload_tokens(event_stream: Iterable[dict]) -> Iterator[str]:
+    parser = TGIStreamParser()
+    for event in event_stream:
+        part = event.get("PayloadPart")
+        if part:
+            yield from parser.feed(part["Bytes"])
+    yield from parser.close()
+
+
+class StreamingSagemakerEndpoint(AsyncSagemakerEndpoint):
+    """SagemakerEndpoint that can read tokens from the response-stream API.
+
+    With ``streaming`` on, every token is reported through
+    ``on_llm_new_token`` as it arrives and the joined text is returned, so
+    chains behave the same with and without streaming.
+    """
+
+    streaming: bool = False
+
+    @root_validator(skip_on_failure=True)
+    def check_response_stream(cls, values: dict) -> dict:
+        # fail while the chain is built at init, not on the first question
+        client = values.get("client")
+        if values.get("streaming") and not hasattr(client, "invoke_endpoint_with_response_stream"):
+            raise ValueError(outdated_botocore("sagemaker-runtime", "invoke_endpoint_with_response_stream"))
+        return values
+
+    def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        if not self.streaming:
+            return super()._call(prompt, stop, run_manager, **kwargs)
+
+        _model_kwargs = {**(self.model_kwargs or {}), **kwargs}
+        # TGI expects the stream flag next to "inputs", outside "parameters"
+        body = json.loads(self.content_handler.transform_input(prompt, _model_kwargs))
+        body["stream"] = True
+        try:
+            response = self.client.invoke_endpoint_with_response_stream(
+                EndpointName=self.endpoint_name,
+                Body=json.dumps(body).encode("utf-8"),
+                ContentType=self.content_handler.content_type,
+                **(self.endpoint_kwargs or {}),
+            )
+        except Exception as e:
+            raise ValueError(f"Error raised by inference endpoint: {e}")
+
+        tokens = []
+        for token in iter_payload_tokens(response["Body"]):
+            tokens.append(token)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+        text = "".join(tokens)
+        if stop is not None:
+            text = enforce_stop_tokens(text, stop)
+        return text
+
+
+class TokenForwarder(BaseCallbackHandler):
+    """Passes every new LLM token to ``write``."""
+
+    def __init__(self, write: Callable[[str], None]):
+        self.write = write
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.write(token)
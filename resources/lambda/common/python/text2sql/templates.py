@@ -0,0 +1,327 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from text2sql.sql_cache import normalize_question
+
+if TYPE_CHECKING:
+    from langchain import SQLDatabase
+
+# table.column pairs whose distinct values can fill a slot
+DEFAULT_SLOT_COLUMNS = "sales.product"
+# distinct slot fillings that must produce the same SQL before it is served
+DEFAULT_MIN_SUPPORT = 2
+DEFAULT_MAX_TEMPLATES = 256
+DEFAULT_MAX_VALUES = 1000
+DEFAULT_TTL_SECONDS = 3600
+
+_NUMBER = re.compile(r"(?<!\w)\d+(?!\w)")
+
+
+@dataclass(frozen=True)
+class Slot:
+    name: str
+    """Placeholder in the template SQL, e.g. ``product_0``."""
+    column: Optional[str]
+    """``table.column`` the value was found in; None for numbers."""
+    value: Any
+
+
+@dataclass
+class IntentTemplate:
+    """SQL learned for one question shape, with placeholders for its slots."""
+
+    pattern: str
+    """Normalized question with slots, e.g. ``total sale amount of <product>``."""
+    expression: Any
+    """sqlglot expression with ``exp.Placeholder`` nodes."""
+    dialect: Optional[str]
+    cases: Dict[str, str]
+    """Slot name to "lower"/"upper"/"as_is", how the SQL spelled the value."""
+    support: int
+    hits: int = 0
+
+    @property
+    def sql(self) -> str:
+        return self.expression.sql(dialect=self.dialect)
+
+
+@dataclass
+class TemplateMatch:
+    template: IntentTemplate
+    sql: str
+    slots: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "pattern": self.template.pattern,
+            "slots": self.slots,
+            "support": self.template.support,
+        }
+
+
+def _spell(value: str, case: str) -> str:
+    if case == "lower":
+        return value.lower()
+    if case == "upper":
+        return value.upper()
+    return value
+
+
+def _case_of(literal: str, value: str) -> Optional[str]:
+    for case in ("as_is", "lower", "upper"):
+        if literal == _spell(value, case):
+            return case
+    return None
+
+
+class IntentTemplates:
+    """Parameterized SQL learned from successful runs.
+
+    A question is reduced to a pattern by replacing known values of the
+    slot columns (read with ``SELECT DISTINCT`` by :meth:`load_values`,
+    ideally at init, and refreshed on a background thread after
+    ``ttl_seconds``) and plain numbers with slots. When SQL that executed
+    successfully contains exactly those values as literals, they become
+    placeholders; once ``min_support`` different fillings produced the same
+    parameterized SQL, later questions of that shape are compiled straight
+    to SQL. Only known values fill a slot, so a question naming an unknown
+    product still goes to the LLM. Keep one instance per process.
+    """
+
+    def __init__(
+            self,
+            slot_columns: Sequence[str] = (DEFAULT_SLOT_COLUMNS,),
+            min_support: int = DEFAULT_MIN_SUPPORT,
+            max_templates: int = DEFAULT_MAX_TEMPLATES,
+            max_values: int = DEFAULT_MAX_VALUES,
+            ttl_seconds: float = DEFAULT_TTL_SECONDS,
+            clock: Callable[[], float] = time.time,
+    ):
+        self.slot_columns = list(slot_columns)
+        self.min_support = max(1, min_support)
+        self.max_templates = max_templates
+        self.max_values = max_values
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._templates: "OrderedDict[Tuple[str, ...], IntentTemplate]" = OrderedDict()
+        # pattern -> parameterized SQL -> slot fillings seen with it
+        self._candidates: "OrderedDict[Tuple[str, ...], Dict[Any, set]]" = OrderedDict()
+        self._values: Dict[str, Tuple[str, str]] = {}
+        self._values_regex: Optional[re.Pattern] = None
+        self._values_loaded_at: Optional[float] = None
+        self._database_id: Optional[str] = None
+        self._refreshing = False
+        self.hits = 0
+        self.misses = 0
+        self.learned = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["IntentTemplates"]:
+        if os.getenv("TEMPLATES_DISABLED"):
+            return None
+        columns = os.getenv("TEMPLATE_SLOT_COLUMNS", DEFAULT_SLOT_COLUMNS)
+        return cls(
+            slot_columns=[c.strip() for c in columns.split(",") if c.strip()],
+            min_support=int(os.getenv("TEMPLATE_MIN_SUPPORT", DEFAULT_MIN_SUPPORT)),
+            ttl_seconds=float(os.getenv("TEMPLATE_VALUES_TTL", DEFAULT_TTL_SECONDS)),
+        )
+
+    def load_values(self, database: "SQLDatabase") -> int:
+        """Read the distinct values of the slot columns; returns how many."""
+        from sqlalchemy import text
+        from sqlglot import exp
+
+        from text2sql.preflight import SQLGLOT_DIALECTS
+        from text2sql.schema_cache import database_id
+
+        dialect = SQLGLOT_DIALECTS.get(database.dialect)
+        usable = set(database.get_usable_table_names())
+        values: Dict[str, Tuple[str, str]] = {}
+        with database._engine.connect() as connection:
+            for slot_column in self.slot_columns:
+                table, _, column = slot_column.rpartition(".")
+                if table not in usable:
+                    continue
+                query = (
+                    exp.select(column).distinct().from_(table)
+                    .where(exp.column(column).is_(exp.null()).not_())
+                    .limit(self.max_values)
+                )
+                for (value,) in connection.execute(text(query.sql(dialect=dialect))):
+                    if isinstance(value, str) and normalize_question(value):
+                        values.setdefault(normalize_question(value), (slot_column, value))
+        # longest first, so "ice cream cone" wins over "ice cream"
+        alternatives = sorted(values, key=len, reverse=True)
+        regex = re.compile(
+            r"(?<!\w)(" + "|".join(map(re.escape, alternatives)) + r")(?!\w)"
+        ) if alternatives else None
+        with self._lock:
+            self._values, self._values_regex = values, regex
+            self._values_loaded_at = self._clock()
+            self._database_id = database_id(database)
+        return len(values)
+
+    def _load_values_if_stale(self, database: "SQLDatabase") -> None:
+        from text2sql.schema_cache import database_id
+
+        if self._values_loaded_at is None or database_id(database) != self._database_id:
+            # nothing to match against yet
+            self.load_values(database)
+            return
+        with self._lock:
+            expired = self._clock() - self._values_loaded_at >= self.ttl_seconds
+            if not expired or self._refreshing:
+                return
+            self._refreshing = True
+        # questions keep matching the old values meanwhile
+        threading.Thread(
+            target=self._refresh_values, args=(database,), name="template-values", daemon=True
+        ).start()
+
+    def _refresh_values(self, database: "SQLDatabase") -> None:
+        try:
+            self.load_values(database)
+        except Exception as exc:
+            # keep the old values; the next question tries again
+            print(json.dumps({"template_values_error": f"{type(exc).__name__}: {exc}"}))
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def extract(self, question: str) -> Tuple[str, List[Slot]]:
+        """The question's pattern and the slots found in it, in order."""
+        text = normalize_question(question)
+        values, regex = self._values, self._values_regex
+        spans = []
+        if regex is not None:
+            for match in regex.finditer(text):
+                column, value = values[match.group(1)]
+                spans.append((match.start(), match.end(), column, value))
+        for match in _NUMBER.finditer(text):
+            if not any(start < match.end() and match.start() < end for start, end, _, _ in spans):
+                spans.append((match.start(), match.end(), None, int(match.group())))
+        spans.sort(key=lambda span: span[0])
+
+        pattern, slots, counts, position = [], [], {}, 0
+        for start, end, column, value in spans:
+            label = column.rpartition(".")[2] if column else "number"
+            index = counts[label] = counts.get(label, -1) + 1
+            pattern.append(f"{text[position:start]}<{label}>")
+            slots.append(Slot(f"{label}_{index}", column, value))
+            position = end
+        pattern.append(text[position:])
+        return "".join(pattern), slots
+
+    def _parameterize(
+            self, sql: str, slots: List[Slot], dialect: Optional[str]
+    ) -> Optional[Tuple[Any, Dict[str, str]]]:
+        import sqlglot
+        from sqlglot import exp
+        from sqlglot.errors import ParseError
+
+        try:
+            expression = sqlglot.parse_one(sql, read=dialect)
+        except ParseError:
+            return None
+        cases: Dict[str, str] = {}
+        replaced = set()
+        for literal in list(expression.find_all(exp.Literal)):
+            for slot in slots:
+                if slot.column is None:
+                    matches = literal.is_number and literal.this == str(slot.value)
+                else:
+                    case = _case_of(literal.this, slot.value) if literal.is_string else None
+                    matches = case is not None and cases.setdefault(slot.name, case) == case
+                if matches:
+                    literal.replace(exp.Placeholder(this=slot.name))
+                    replaced.add(slot.name)
+                    break
+        # a value the SQL does not use is part of the question, not a slot
+        if replaced != {slot.name for slot in slots}:
+            return None
+        return expression, cases
+
+    def learn(
+            self, database: "SQLDatabase", question: str, sql: str, scope: Sequence[str] = ()
+    ) -> bool:
+        """Record SQL that executed successfully; True when it completed a template."""
+        from text2sql.preflight import SQLGLOT_DIALECTS
+
+        self._load_values_if_stale(database)
+        pattern, slots = self.extract(question)
+        if not slots or len({(s.column, s.value) for s in slots}) < len(slots):
+            return False
+        key = (*scope, pattern)
+        if key in self._templates:
+            return False
+        dialect = SQLGLOT_DIALECTS.get(database.dialect)
+        parameterized = self._parameterize(sql, slots, dialect)
+        if parameterized is None:
+            return False
+        expression, cases = parameterized
+        variant = (expression.sql(dialect=dialect), tuple(sorted(cases.items())))
+        with self._lock:
+            candidates = self._candidates.setdefault(key, {})
+            self._candidates.move_to_end(key)
+            fillings = candidates.setdefault(variant, set())
+            fillings.add(tuple(s.value for s in slots))
+            if len(fillings) < self.min_support:
+                while len(self._candidates) > self.max_templates * 4:
+                    self._candidates.popitem(last=False)
+                return False
+            del self._candidates[key]
+            self._templates[key] = IntentTemplate(
+                pattern, expression, dialect, cases, support=len(fillings)
+            )
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+            self.learned += 1
+        return True
+
+    def match(
+            self, database: "SQLDatabase", question: str, scope: Sequence[str] = ()
+    ) -> Optional[TemplateMatch]:
+        """Compile ``question`` to SQL when a learned template fits it."""
+        from sqlglot import exp
+
+        self._load_values_if_stale(database)
+        pattern, slots = self.extract(question)
+        with self._lock:
+            template = self._templates.get((*scope, pattern)) if slots else None
+            if template is None:
+                self.misses += 1
+                return None
+            self._templates.move_to_end((*scope, pattern))
+            template.hits += 1
+            self.hits += 1
+        values = {
+            slot.name: _spell(slot.value, template.cases.get(slot.name, "as_is"))
+            if slot.column else slot.value
+            for slot in slots
+        }
+        expression = exp.replace_placeholders(template.expression.copy(), **values)
+        return TemplateMatch(template, expression.sql(dialect=template.dialect), values)
+
+    def invalidate(self, match: TemplateMatch, scope: Sequence[str] = ()) -> None:
+        """Forget a template whose SQL failed, e.g. after a schema change."""
+        with self._lock:
+            if self._templates.pop((*scope, match.template.pattern), None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "templates": len(self._templates),
+            "candidates": len(self._candidates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "served_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,67 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, TypeVar
+
+T = TypeVar("T")
+
+STAGES = ("table_info", "sql_generation", "preflight", "execution", "serialization", "answer", "insight")
+
+
+class StageTimings:
+    """Wall time (and optionally allocation peak) per stage of one chain run.
+
+    Pass an instance as ``stage_timings`` in the chain inputs to collect it;
+    stages that run more than once in a request are summed.
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.seconds: Dict[str, float] = {}
+        self.peak_bytes: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # reset_peak is process wide, so memory is only meaningful for
+        # stages that do not overlap (concurrent_generation off)
+        tracking = self.track_memory and tracemalloc.is_tracing()
+        if tracking:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+            if tracking:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def timed(self, name: str, fn: Callable[..., T]) -> Callable[..., T]:
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            with self.stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    async def atimed(self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.stage(name):
+            return await awaitable
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.seconds)
+
+
+class _NullTimings(StageTimings):
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def add(self, name: str, seconds: float) -> None:
+        pass
+
+
+NULL_TIMINGS = _NullTimings()
@@ -1,160 +1,184 @@
 import json
 import os
-from typing import Dict, Any, Optional, List
-
-from langchain import SQLDatabaseChain, SQLDatabase, PromptTemplate, LLMChain
-from langchain import SagemakerEndpoint
-from langchain.callbacks.manager import CallbackManagerForChainRun
-from langchain.chains.sql_database.base import INTERMEDIATE_STEPS_KEY
-from langchain.llms.sagemaker_endpoint import LLMContentHandler
-from sqlalchemy import create_engine
-
-
-class SQLDatabaseChainWithInsight(SQLDatabaseChain):
-    return_intermediate_steps: bool = True
-
-    def _call(
-            self,
-            inputs: Dict[str, Any],
-            run_manager: Optional[CallbackManagerForChainRun] = None,
-    ) -> Dict[str, Any]:
-        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
-        input_text = f"{inputs[self.input_key]}\nSQLQuery:"
-        _run_manager.on_text(input_text, verbose=self.verbose)
-        # If not present, then defaults to None which is all tables.
-        table_names_to_use = inputs.get("table_names_to_use")
-        table_info = self.database.get_table_info(table_names=table_names_to_use)
-        llm_inputs = {
-            "input": input_text,
-            "top_k": str(self.top_k),
-            "dialect": self.database.dialect,
-            "table_info": table_info,
-            "stop": ["\nSQLResult:"],
-        }
-        intermediate_steps: List = []
+import time
+from functools import lru_cache, partial
+
+from text2sql.batch import batch_concurrency, run_batch, validate_questions
+from text2sql.context import WarmContext
+from text2sql.metrics import EMFMetrics
+from text2sql.schema_cache import SchemaCache
+from text2sql.schema_index import SchemaIndex
+from text2sql.sql_cache import QuestionSQLCache
+from text2sql.templates import IntentTemplates
+
+# langchain, sqlalchemy, boto3 and numpy take most of a cold start, so they
+# are imported by build_chain (insight_chain.py) on first use rather than
+# here; see benchmarks/import_time.py for the budget this module is held to.
+
+
+@lru_cache(maxsize=None)
+def get_llm():
+    from insight_chain import ContentHandler
+    from text2sql.streaming import StreamingSagemakerEndpoint
+
+    return StreamingSagemakerEndpoint(
+        endpoint_name='huggingface-pytorch-tgi-inference-2023-07-16-05-23-44-657',
+        region_name='us-east-1',
+        model_kwargs={"temperature": 0.01, "max_new_tokens": 200},
+        content_handler=ContentHandler(),
+        streaming=os.getenv("STREAM_TOKENS", "false").lower() == "true",
+    )
+
+
+@lru_cache(maxsize=None)
+def get_strong_llm():
+    """Model for hard questions from ROUTER_STRONG_MODEL, None when unset.
+
+    "bedrock:<model id>" (e.g. bedrock:anthropic.claude-v1) or
+    "sagemaker:<endpoint name>"; get_llm() stays the fast model.
+    """
+    spec = os.getenv("ROUTER_STRONG_MODEL")
+    if not spec:
+        return None
+    provider, _, model = spec.partition(":")
+    if provider == "bedrock":
+        from text2sql.routing import bedrock_llm
+
+        return bedrock_llm(model, temperature=0.01, max_tokens_to_sample=200)
+    if provider == "sagemaker":
+        from insight_chain import ContentHandler
+        from text2sql.streaming import StreamingSagemakerEndpoint
+
+        return StreamingSagemakerEndpoint(
+            endpoint_name=model,
+            region_name='us-east-1',
+            model_kwargs={"temperature": 0.01, "max_new_tokens": 200},
+            content_handler=ContentHandler(),
+        )
+    raise ValueError(f"ROUTER_STRONG_MODEL must start with bedrock: or sagemaker:, got {spec!r}")
+
+
+def get_router():
+    from text2sql.routing import DEFAULT_THRESHOLD, ModelRouter
+
+    strong_llm = get_strong_llm()
+    if strong_llm is None:
+        return None
+    return ModelRouter(
+        get_llm(),
+        strong_llm,
+        threshold=float(os.getenv("ROUTER_THRESHOLD", DEFAULT_THRESHOLD)),
+        escalate=os.getenv("ROUTER_ESCALATE", "true").lower() == "true",
+    )
+
+
+def get_database():
+    from text2sql.backends import create_database
+    from text2sql.database import QueryDatabase
+
+    # QUERY_BACKEND=duckdb answers small tables in process (text2sql/backends.py)
+    return create_database(QueryDatabase)
+
+
+# Outlives chain rebuilds so a reconnect does not refetch the schema
+schema_cache = SchemaCache.from_env()
+# Narrows table_info to the SCHEMA_INDEX_TOP_K tables a question mentions
+schema_index = SchemaIndex.from_env()
+sql_cache = QuestionSQLCache.from_env()
+# Learned per process; compiles recurring question shapes to SQL without the LLM
+intent_templates = IntentTemplates.from_env()
+
+
+def build_chain():
+    from insight_chain import SQLDatabaseChainWithInsight
+    from text2sql.answers import AnswerFormatter
+    from text2sql.offload import ResultOffload
+    from text2sql.preflight import SQLPreflight
+    from text2sql.result_cache import ResultCache
+    from text2sql.serialize import DEFAULT_TOKEN_BUDGET
+    from text2sql.speculative import SQLCandidateRace
+
+    data_base = get_database()
+    if intent_templates is not None:
+        # SELECT DISTINCT of the slot columns, done here (at init when
+        # prewarmed) instead of on the first question
+        intent_templates.load_values(data_base)
+
+    return SQLDatabaseChainWithInsight.from_llm(
+        get_llm(),
+        data_base,
+        verbose=True,
+        schema_cache=schema_cache,
+        schema_index=schema_index,
+        sql_cache=sql_cache,
+        intent_templates=intent_templates,
+        template_return_direct=os.getenv("TEMPLATE_RETURN_DIRECT", "false").lower() == "true",
+        # Built per chain since the data-version token follows ATHENA_BUCKET
+        result_cache=ResultCache.from_env(),
+        concurrent_generation=os.getenv("CONCURRENT_GENERATION", "true").lower() == "true",
+        result_token_budget=int(os.getenv("RESULT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)),
+        # PREFLIGHT_DISABLED turns it off, PREFLIGHT_MAX_PARTITIONS bounds partition scans
+        preflight=SQLPreflight.from_env(),
+        # SQL_CANDIDATES > 1 (or "sql_candidates" in the event) races sampled queries
+        speculative=SQLCandidateRace.from_env(),
+        # ROUTER_STRONG_MODEL sends complex questions (and failed SQL) to a stronger model
+        router=get_router(),
+        # ANSWER_POLICY=scalar (default) | table | llm: which results skip the answer model
+        answer_formatter=AnswerFormatter.from_env(),
+        # results over RESULT_OFFLOAD_THRESHOLD_BYTES are returned as a presigned S3 URL
+        result_offload=ResultOffload.from_env(),
+    )
+
+
+# Reused across warm invocations, rebuilt when ATHENA_* changes or the connection drops
+warm_chain = WarmContext(build_chain)
+if os.getenv("PREWARM_CHAIN", "true").lower() == "true" and "AWS_LAMBDA_FUNCTION_NAME" in os.environ:
+    warm_chain.prewarm()
+
+
+metrics = EMFMetrics(os.getenv("METRICS_SERVICE", "CustomLambdaFn"))
+
+
+def answer_question(question, sql_candidates=None):
+    inputs = {"query": question, "stage_timings": metrics.new_timings()}
+    if sql_candidates:
+        inputs["sql_candidates"] = sql_candidates
+    started = time.perf_counter()
+    # return_only_outputs keeps the StageTimings out of the response body
+    outputs = warm_chain.run(lambda db_chain: db_chain(inputs, return_only_outputs=True))
+    metrics.record_outputs(outputs, (time.perf_counter() - started) * 1000)
+    return {"query": question, **outputs}
+
+
+@metrics.log_invocation
+def lambda_handler(event, context):
+    if 'questions' in event:
         try:
-            intermediate_steps.append(llm_inputs)  # input: sql generation
-            sql_cmd = self.llm_chain.predict(
-                callbacks=_run_manager.get_child(),
-                **llm_inputs,
-            ).strip()
-
-            _run_manager.on_text(sql_cmd, color="green", verbose=self.verbose)
-            intermediate_steps.append(
-                sql_cmd
-            )  # output: sql generation (no checker)
-            intermediate_steps.append({"sql_cmd": sql_cmd})  # input: sql exec
-            result = self.database.run(sql_cmd)
-            intermediate_steps.append(str(result))  # output: sql exec
-
-            _run_manager.on_text("\nSQLResult: ", verbose=self.verbose)
-            _run_manager.on_text(result, color="yellow", verbose=self.verbose)
-            # If return direct, we just set the final result equal to
-            # the result of the sql query result, otherwise try to get a human readable
-            # final answer
-            _run_manager.on_text("\nAnswer:", verbose=self.verbose)
-            input_text += f"{sql_cmd}\nSQLResult: {result}\nAnswer:"
-            llm_inputs["input"] = input_text
-            intermediate_steps.append(llm_inputs)  # input: final answer
-            sql_data = self.llm_chain.predict(
-                callbacks=_run_manager.get_child(),
-                **llm_inputs,
-            ).strip()
-            intermediate_steps.append(sql_data)  # output: sql data
-            _run_manager.on_text(sql_data, color="green", verbose=self.verbose)
-
-            GET_INSIGHT = """
-                    You are a senior data analytics.
-
-                    Your task is to analyze the given company data in JSON format and provide insights or explanations for any trends or patterns observed. The data pertains to the question: 
-                    {question}.
-                    Your response should be clear and concise, no more than 200 words.
-
-                    Response data: {data}
-
-                    Please note that if the data is empty or null, you should simply state "no insight." 
-
-                    My Insight:
-                    """
-            get_insight_prompt = PromptTemplate(
-                template=GET_INSIGHT, input_variables=["question", "data"]
-            )
-            get_insight_chain = LLMChain(
-                llm=self.llm_chain.llm, prompt=get_insight_prompt
-            )
-
-            get_insight_inputs = {
-                "question": inputs[self.input_key],
-                "data": result,
-            }
-
-            final_result: str = get_insight_chain.predict(
-                callbacks=_run_manager.get_child(), **get_insight_inputs
-            ).strip()
-
-            _run_manager.on_text(
-                final_result, color="blue", verbose=self.verbose
+            questions = validate_questions(event['questions'])
+        except ValueError as exc:
+            return response(400, {'error': str(exc)})
+        metrics.put('Questions', len(questions))
+        body = {
+            'results': run_batch(
+                questions,
+                partial(answer_question, sql_candidates=event.get('sql_candidates')),
+                max_concurrency=batch_concurrency(event.get('max_concurrency')),
             )
+        }
+    else:
+        metrics.put('Questions', 1)
+        body = {'sql': answer_question(event['question'], event.get('sql_candidates'))}
 
-            chain_result: Dict[str, Any] = {self.output_key: final_result}
-            if self.return_intermediate_steps:
-                chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
-            return chain_result
-        except Exception as exc:
-            # Append intermediate steps to exception, to aid in logging and later
-            # improvement of few shot prompt seeds
-            exc.intermediate_steps = intermediate_steps  # type: ignore
-            raise exc
-
-
-class ContentHandler(LLMContentHandler):
-    content_type = "application/json"
-    accepts = "application/json"
-
-    def transform_input(self, prompt: str, model_kwargs={}) -> bytes:
-        input_str = json.dumps({"inputs": prompt, "parameters": model_kwargs})
-        return input_str.encode("utf-8")
-
-    def transform_output(self, output: bytes) -> str:
-        response_json = json.loads(output.read().decode("utf-8"))
-        return response_json[0]["generated_text"]
-
-
-content_handler = ContentHandler()
-llm = SagemakerEndpoint(
-    endpoint_name='huggingface-pytorch-tgi-inference-2023-07-16-05-23-44-657',
-    region_name='us-east-1',
-    model_kwargs={"temperature": 0.01, "max_new_tokens": 200},
-    content_handler=content_handler
-)
-
-
-def get_athena_database():
-    ATHENA_BUCKET = os.getenv('ATHENA_BUCKET')
-    ATHENA_DATABASE = os.getenv('ATHENA_DATABASE')
-    ATHENA_REGION = os.getenv('ATHENA_REGION')
-
-    conn_str = f"awsathena+rest://:@athena.{ATHENA_REGION}.amazonaws.com:443/{ATHENA_DATABASE}?s3_staging_dir=s3://{ATHENA_BUCKET}/Unsaved/"
-    database_engine = create_engine(conn_str)
-    data_base = SQLDatabase(database_engine)
-
-    return data_base
-
-
-def lambda_handler(event, context):
-    question = event['question']
-
-    data_base = get_athena_database()
+    metrics.set_property('WarmContext', warm_chain.stats())
+    return response(200, body)
 
-    db_chain = SQLDatabaseChainWithInsight.from_llm(llm, data_base, verbose=True)
 
-    result = db_chain(question)
+def response(status_code, body):
     return {
-        "statusCode": 200,
+        "statusCode": status_code,
         "headers": {
             "Content-Type": "application/json"
         },
-        "body": json.dumps({
-            'sql': result
-        })
+        "body": json.dumps(body)
     }
+
@@ -0,0 +1,687 @@
+import asyncio
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, Union
+
+from langchain import SQLDatabaseChain, PromptTemplate, LLMChain
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain.chains.sql_database.base import INTERMEDIATE_STEPS_KEY
+from langchain.llms.sagemaker_endpoint import LLMContentHandler
+from text2sql.aio import run_blocking
+from text2sql.answers import AnswerFormatter
+from text2sql.database import CancelToken, QueryDatabase, QueryResult
+from text2sql.offload import ResultOffload
+from text2sql.preflight import SQLGLOT_DIALECTS, PreflightError, SQLPreflight
+from text2sql.result_cache import ResultCache
+from text2sql.routing import FAST, STRONG, ModelRouter, Route
+from text2sql.schema_cache import SchemaCache, database_id
+from text2sql.schema_index import SchemaIndex
+from text2sql.serialize import DEFAULT_MAX_ROWS, DEFAULT_TOKEN_BUDGET, serialize_result
+from text2sql.speculative import SQLCandidateRace, normalize_sql
+from text2sql.sql_cache import QuestionSQLCache
+from text2sql.templates import IntentTemplates, TemplateMatch
+from text2sql.timing import NULL_TIMINGS
+
+GET_INSIGHT = """
+                    You are a senior data analytics.
+
+                    Your task is to analyze the given company data in JSON format and provide insights or explanations for any trends or patterns observed. The data pertains to the question: 
+                    {question}.
+                    Your response should be clear and concise, no more than 200 words.
+
+                    Response data: {data}
+
+                    Please note that if the data is empty or null, you should simply state "no insight." 
+
+                    My Insight:
+                    """
+GET_INSIGHT_PROMPT = PromptTemplate(
+    template=GET_INSIGHT, input_variables=["question", "data"]
+)
+
+# Preflight reasons that mean the cached table_info may be stale
+_SCHEMA_MISMATCH = ("unknown_table", "unknown_column")
+
+# Shared by all chains in the process for concurrent answer/insight generation
+generation_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GENERATION_POOL_SIZE", "8")),
+    thread_name_prefix="generation",
+)
+
+
+@dataclass
+class _QuestionRun:
+    """What one question carries from step to step of ``_call`` and ``_acall``."""
+
+    question: str
+    input_text: str
+    timings: Any
+    table_names: Optional[List[str]]
+    # templates hold for every table set the schema index could pick
+    template_scope: List[str]
+    schema_selection: Optional[Dict[str, Any]] = None
+    table_info: str = ""
+    llm_inputs: Dict[str, Any] = field(default_factory=dict)
+    llm_chain: Optional[LLMChain] = None
+    route: Optional[Route] = None
+    cache_scope: List[str] = field(default_factory=list)
+    template_match: Optional[TemplateMatch] = None
+    sql_cache_hit: bool = False
+    sql_cmd: Optional[str] = None
+    candidates: Optional[List[Tuple[int, str]]] = None
+    sql_exec_step: Dict[str, Any] = field(default_factory=dict)
+    intermediate_steps: List = field(default_factory=list)
+
+    @property
+    def llm_sql(self) -> bool:
+        """Whether the model wrote the SQL, not the SQL cache or a template."""
+        return not self.sql_cache_hit and self.template_match is None
+
+
+class SQLDatabaseChainWithInsight(SQLDatabaseChain):
+    return_intermediate_steps: bool = True
+    schema_cache: Optional[SchemaCache] = None
+    """Cache for table_info; when unset every question asks the database."""
+    schema_index: Optional[SchemaIndex] = None
+    """Picks the tables relevant to a question when none are given; when unset the prompt has all tables."""
+    sql_cache: Optional[QuestionSQLCache] = None
+    """Cache of question to successfully executed SQL, skips SQL generation on a hit."""
+    result_cache: Optional[ResultCache] = None
+    """Cache of SQL results, invalidated when the data under the table location changes."""
+    concurrent_generation: bool = False
+    """Whether to generate the answer and the insight at the same time."""
+    result_token_budget: int = DEFAULT_TOKEN_BUDGET
+    """Approximate tokens the SQL result may take in the answer and insight prompts."""
+    result_max_rows: int = DEFAULT_MAX_ROWS
+    """Rows above which the prompts get column statistics instead of the rows."""
+    preflight: Optional[SQLPreflight] = None
+    """Local checks (and LIMIT injection) for the generated SQL before it runs."""
+    intent_templates: Optional[IntentTemplates] = None
+    """Parameterized SQL learned from successful runs, skips SQL generation on a match."""
+    template_return_direct: bool = False
+    """Whether a template match returns the result rows instead of generating an answer and insight."""
+    speculative: Optional[SQLCandidateRace] = None
+    """Generates several SQL candidates and keeps the first that runs; "sql_candidates" in the inputs sets the budget."""
+    router: Optional[ModelRouter] = None
+    """Picks a fast or a strong model per question; when unset every call goes to ``llm_chain``."""
+    answer_formatter: Optional[AnswerFormatter] = None
+    """Writes the answer for scalar (or, by policy, small) results without the model."""
+    result_offload: Optional[ResultOffload] = None
+    """Writes large results to S3 and keeps a preview and a presigned URL in the output."""
+
+    def _select_tables(
+            self, question: str, table_names: Optional[List[str]]
+    ) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+        if table_names is not None or self.schema_index is None:
+            return table_names, None
+        return self.schema_index.select(self.database, question)
+
+    def _get_table_info(self, table_names: Optional[List[str]]) -> str:
+        if self.schema_cache is None:
+            return self.database.get_table_info(table_names=table_names)
+        return self.schema_cache.get_table_info(self.database, table_names)
+
+    def _preflight(
+            self, sql_cmd: str, table_info: str, sql_exec_step: Dict[str, Any]
+    ) -> str:
+        # raises PreflightError for SQL that would fail or scan too much
+        report = self.preflight.check(
+            sql_cmd, table_info, self.top_k, self.database.dialect
+        )
+        sql_exec_step["preflight"] = report.as_dict()
+        sql_exec_step["sql_cmd"] = report.sql
+        return report.sql
+
+    def _run_sql(
+            self,
+            sql_cmd: str,
+            sql_exec_step: Dict[str, Any],
+            cancel_token: Optional[CancelToken] = None,
+    ) -> Union[QueryResult, str]:
+        if isinstance(self.database, QueryDatabase):
+            run = functools.partial(self.database.run_query, cancel_token=cancel_token)
+        else:
+            run = self.database.run
+        if self.result_cache is None:
+            return run(sql_cmd)
+        result, hit = self.result_cache.get_or_run(sql_cmd, run)
+        sql_exec_step["result_cache"] = {"hit": hit, **self.result_cache.stats()}
+        return result
+
+    def _candidate_budget(self, inputs: Dict[str, Any]) -> int:
+        if self.speculative is None:
+            return 1
+        return self.speculative.budget(inputs.get("sql_candidates"))
+
+    def _route(
+            self, question: str, table_info: str
+    ) -> Tuple[LLMChain, Optional[Route]]:
+        if self.router is None:
+            return self.llm_chain, None
+        route = self.router.classify(question, table_info)
+        return self._tier_chain(route.tier), route
+
+    def _tier_chain(self, tier: str) -> LLMChain:
+        return LLMChain(llm=self.router.llm(tier), prompt=self.llm_chain.prompt)
+
+    def _recover(self, run: _QuestionRun, error: Exception) -> bool:
+        """Forgets the SQL that failed; whether the strong model should write it again."""
+        if run.sql_cache_hit:
+            # the schema moved under a cached query, regenerate next time
+            self.sql_cache.invalidate(run.question, run.cache_scope)
+        if run.template_match is not None:
+            self.intent_templates.invalidate(run.template_match, run.template_scope)
+        if self.schema_cache is not None and isinstance(error, PreflightError) \
+                and error.reason in _SCHEMA_MISMATCH:
+            # the SQL was written against a schema that has since changed
+            self.schema_cache.invalidate(self.database)
+        # cached and template SQL failing says nothing about the fast model
+        if run.route is None or run.route.tier != FAST or not self.router.escalate or not run.llm_sql:
+            return False
+        # the fast model's SQL failed: the strong one writes it and answers,
+        # instead of the client retrying the whole request
+        run.sql_exec_step["routing"].update(
+            escalated=True, failed_sql=run.sql_exec_step["sql_cmd"], error=str(error)
+        )
+        run.llm_chain = self._tier_chain(STRONG)
+        return True
+
+    def _escalated(self, run: _QuestionRun, succeeded: bool) -> None:
+        self.router.record_escalation(succeeded=succeeded)
+        if succeeded:
+            run.sql_exec_step["routing"].update(self.router.stats())
+            run.intermediate_steps[1] = run.sql_cmd
+
+    def _escalate(
+            self, run: _QuestionRun, run_manager: CallbackManagerForChainRun
+    ) -> Union[QueryResult, str]:
+        """Writes and runs the SQL again with the strong model."""
+        try:
+            with run.timings.stage("sql_generation"):
+                run.sql_cmd = run.llm_chain.predict(
+                    callbacks=run_manager.get_child(), **run.llm_inputs
+                ).strip()
+            result = self._execute(run)
+        except Exception:
+            self._escalated(run, succeeded=False)
+            raise
+        self._escalated(run, succeeded=True)
+        return result
+
+    async def _aescalate(
+            self, run: _QuestionRun, run_manager: AsyncCallbackManagerForChainRun
+    ) -> Union[QueryResult, str]:
+        try:
+            with run.timings.stage("sql_generation"):
+                run.sql_cmd = (await run.llm_chain.apredict(
+                    callbacks=run_manager.get_child(), **run.llm_inputs
+                )).strip()
+            result = await run_blocking(self._execute, run)
+        except Exception:
+            self._escalated(run, succeeded=False)
+            raise
+        self._escalated(run, succeeded=True)
+        return result
+
+    def _candidate_chains(self, llm_chain: LLMChain, count: int) -> List[LLMChain]:
+        return [llm_chain] + [
+            LLMChain(
+                llm=llm_chain.llm,
+                prompt=llm_chain.prompt,
+                llm_kwargs=self.speculative.sampling_kwargs(index),
+            )
+            for index in range(1, count)
+        ]
+
+    @staticmethod
+    def _collect_candidates(outputs: List[Any]) -> List[Tuple[int, str]]:
+        # a failed sample only narrows the race; the usual generation must work
+        if isinstance(outputs[0], BaseException):
+            raise outputs[0]
+        return [
+            (index, output.strip()) for index, output in enumerate(outputs)
+            if not isinstance(output, BaseException)
+        ]
+
+    def _generate_candidates(
+            self,
+            llm_chain: LLMChain,
+            llm_inputs: Dict[str, Any],
+            count: int,
+            run_manager: Any,
+    ) -> List[Tuple[int, str]]:
+        futures = [
+            generation_pool.submit(chain.predict, callbacks=run_manager.get_child(), **llm_inputs)
+            for chain in self._candidate_chains(llm_chain, count)
+        ]
+        return self._collect_candidates([
+            future.exception() or future.result() for future in futures
+        ])
+
+    async def _agenerate_candidates(
+            self,
+            llm_chain: LLMChain,
+            llm_inputs: Dict[str, Any],
+            count: int,
+            run_manager: Any,
+    ) -> List[Tuple[int, str]]:
+        outputs = await asyncio.gather(*(
+            chain.apredict(callbacks=run_manager.get_child(), **llm_inputs)
+            for chain in self._candidate_chains(llm_chain, count)
+        ), return_exceptions=True)
+        return self._collect_candidates(outputs)
+
+    def _race(
+            self,
+            candidates: List[Tuple[int, str]],
+            table_info: str,
+            sql_exec_step: Dict[str, Any],
+            timings: Any,
+    ) -> Tuple[str, Union[QueryResult, str]]:
+        """Preflight and de-duplicate the candidates, then run them at once."""
+        dialect = SQLGLOT_DIALECTS.get(self.database.dialect)
+        distinct: List[Tuple[int, str]] = []
+        seen = set()
+        reports: Dict[int, Dict[str, Any]] = {}
+        rejected: List[PreflightError] = []
+        with timings.stage("preflight"):
+            for index, sql in candidates:
+                if self.preflight is not None:
+                    try:
+                        report = self.preflight.check(
+                            sql, table_info, self.top_k, self.database.dialect
+                        )
+                    except PreflightError as exc:
+                        rejected.append(exc)
+                        continue
+                    reports[index], sql = report.as_dict(), report.sql
+                key = normalize_sql(sql, dialect)
+                if key not in seen:
+                    seen.add(key)
+                    distinct.append((index, sql))
+        speculative = sql_exec_step["speculative"] = {
+            "candidates": [sql for _, sql in candidates],
+            "distinct": len(distinct),
+            "rejected": len(rejected),
+        }
+        if not distinct:
+            raise rejected[0]
+
+        # one step per candidate, so result-cache notes do not interleave
+        steps: Dict[str, Dict[str, Any]] = {sql: {} for _, sql in distinct}
+        with timings.stage("execution"):
+            race = self.speculative.run(
+                distinct, lambda sql, token: self._run_sql(sql, steps[sql], token)
+            )
+        sql_exec_step.update(steps[race.sql])
+        if race.index in reports:
+            sql_exec_step["preflight"] = reports[race.index]
+        sql_exec_step["sql_cmd"] = race.sql
+        speculative.update(
+            winner=race.index,
+            failed=race.failed,
+            cancelled=race.cancelled,
+            **self.speculative.stats(),
+        )
+        return race.sql, race.result
+
+    def _offload_result(
+            self, result: Union[QueryResult, str], sql_exec_step: Dict[str, Any]
+    ) -> str:
+        # sized before str(result) is built, which would double the peak
+        offloaded = self.result_offload and self.result_offload.offload(result)
+        if not offloaded:
+            return str(result)
+        preview, sql_exec_step["offload"] = offloaded
+        return preview
+
+    def _format_answer(
+            self, result: Union[QueryResult, str], sql_exec_step: Dict[str, Any]
+    ) -> Optional[str]:
+        if self.answer_formatter is None:
+            return None
+        answer, sql_exec_step["answer_format"] = self.answer_formatter.format(result)
+        return answer
+
+    def _generate_answer(
+            self,
+            result: Union[QueryResult, str],
+            run: _QuestionRun,
+            run_manager: CallbackManagerForChainRun,
+    ) -> str:
+        # a single value needs no model to be put in a sentence
+        answer = self._format_answer(result, run.sql_exec_step)
+        if answer is None:
+            answer = run.llm_chain.predict(callbacks=run_manager.get_child(), **run.llm_inputs)
+        return answer.strip()
+
+    async def _agenerate_answer(
+            self,
+            result: Union[QueryResult, str],
+            run: _QuestionRun,
+            run_manager: AsyncCallbackManagerForChainRun,
+    ) -> str:
+        answer = self._format_answer(result, run.sql_exec_step)
+        if answer is None:
+            answer = await run.llm_chain.apredict(
+                callbacks=run_manager.get_child(), **run.llm_inputs
+            )
+        return answer.strip()
+
+    @staticmethod
+    def _insight_callbacks(inputs: Dict[str, Any], run_manager: Any) -> Any:
+        # "insight_callbacks" in the inputs only observe the insight generation,
+        # e.g. to stream its tokens to the client
+        callbacks = run_manager.get_child()
+        for handler in inputs.get("insight_callbacks") or []:
+            callbacks.add_handler(handler)
+        return callbacks
+
+    def _sql_cache_scope(self, table_names: Optional[List[str]]) -> List[str]:
+        return [database_id(self.database), ",".join(sorted(table_names or []))]
+
+    def _match_template(
+            self, question: str, scope: List[str]
+    ) -> Optional[TemplateMatch]:
+        if self.intent_templates is None:
+            return None
+        return self.intent_templates.match(self.database, question, scope)
+
+    def _chain_result(
+            self, final_result: str, intermediate_steps: List
+    ) -> Dict[str, Any]:
+        chain_result: Dict[str, Any] = {self.output_key: final_result}
+        if self.return_intermediate_steps:
+            chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
+        return chain_result
+
+    # The steps below are shared by _call and _acall, which only differ in how
+    # they call the model and the database. Steps that may block run in the
+    # io pool under _acall.
+
+    def _start(self, inputs: Dict[str, Any]) -> _QuestionRun:
+        question = inputs[self.input_key]
+        # If not present, then defaults to None which is all tables.
+        table_names = inputs.get("table_names_to_use")
+        return _QuestionRun(
+            question=question,
+            input_text=f"{question}\nSQLQuery:",
+            timings=inputs.get("stage_timings") or NULL_TIMINGS,
+            table_names=table_names,
+            template_scope=self._sql_cache_scope(table_names),
+        )
+
+    def _load_schema(self, run: _QuestionRun) -> None:
+        # blocking: a stale index or schema cache lists the catalog again
+        run.table_names, run.schema_selection = self._select_tables(
+            run.question, run.table_names
+        )
+        run.table_info = self._get_table_info(run.table_names)
+        run.llm_inputs = {
+            "input": run.input_text,
+            "top_k": str(self.top_k),
+            "dialect": self.database.dialect,
+            "table_info": run.table_info,
+            "stop": ["\nSQLResult:"],
+        }
+        # local scoring, well under a millisecond
+        run.llm_chain, run.route = self._route(run.question, run.table_info)
+        run.cache_scope = self._sql_cache_scope(run.table_names)
+
+    def _known_sql(self, run: _QuestionRun) -> None:
+        # blocking: the first template match reads the slot values from the
+        # database, and the SQL cache may be DynamoDB
+        run.template_match = self._match_template(run.question, run.template_scope)
+        run.sql_cmd = run.template_match.sql if run.template_match else None
+        if run.sql_cmd is None and self.sql_cache is not None:
+            run.sql_cmd = self.sql_cache.get(run.question, run.cache_scope)
+        run.sql_cache_hit = run.template_match is None and run.sql_cmd is not None
+
+    def _open_sql_exec_step(self, run: _QuestionRun) -> None:
+        run.intermediate_steps.append(
+            run.sql_cmd
+        )  # output: sql generation (no checker)
+        sql_exec_step = run.sql_exec_step = {"sql_cmd": run.sql_cmd}
+        if run.schema_selection is not None:
+            sql_exec_step["schema_index"] = run.schema_selection
+        if self.intent_templates is not None:
+            sql_exec_step["template"] = {
+                "hit": run.template_match is not None,
+                **(run.template_match.as_dict() if run.template_match else {}),
+                **self.intent_templates.stats(),
+            }
+        if self.sql_cache is not None:
+            sql_exec_step["sql_cache"] = {
+                "hit": run.sql_cache_hit, **self.sql_cache.stats()
+            }
+        if run.route is not None:
+            sql_exec_step["routing"] = {
+                **run.route.as_dict(), "escalated": False, **self.router.stats()
+            }
+        run.intermediate_steps.append(sql_exec_step)  # input: sql exec
+
+    def _execute(self, run: _QuestionRun) -> Union[QueryResult, str]:
+        # blocking: runs the query (or races the candidates)
+        if run.candidates is not None:
+            run.sql_cmd, result = self._race(
+                run.candidates, run.table_info, run.sql_exec_step, run.timings
+            )
+            return result
+        run.sql_exec_step["sql_cmd"] = run.sql_cmd
+        if self.preflight is not None:
+            with run.timings.stage("preflight"):
+                run.sql_cmd = self._preflight(run.sql_cmd, run.table_info, run.sql_exec_step)
+        with run.timings.stage("execution"):
+            return self._run_sql(run.sql_cmd, run.sql_exec_step)
+
+    def _remember_sql(self, run: _QuestionRun) -> None:
+        # blocking: the SQL cache may be DynamoDB
+        if self.sql_cache is not None and run.llm_sql:
+            self.sql_cache.put(run.question, run.sql_cmd, run.cache_scope)
+        if self.intent_templates is not None and run.template_match is None:
+            self.intent_templates.learn(
+                self.database, run.question, run.sql_cmd, run.template_scope
+            )
+
+    def _serialize(self, run: _QuestionRun, result: Union[QueryResult, str]) -> str:
+        # blocking: large results go to S3, the response keeps a preview
+        with run.timings.stage("serialization"):
+            run.intermediate_steps.append(
+                self._offload_result(result, run.sql_exec_step)
+            )  # output: sql exec
+            result_text, run.sql_exec_step["serialization"] = serialize_result(
+                result, self.result_token_budget, self.result_max_rows
+            )
+        return result_text
+
+    def _insight_chain(
+            self, run: _QuestionRun, result_text: str
+    ) -> Tuple[LLMChain, Dict[str, Any]]:
+        run.input_text += f"{run.sql_cmd}\nSQLResult: {result_text}\nAnswer:"
+        run.llm_inputs["input"] = run.input_text
+        run.intermediate_steps.append(run.llm_inputs)  # input: final answer
+        # Answer and insight both only depend on the question and result
+        get_insight_chain = LLMChain(llm=run.llm_chain.llm, prompt=GET_INSIGHT_PROMPT)
+        return get_insight_chain, {"question": run.question, "data": result_text}
+
+    def _direct_result(self, run: _QuestionRun) -> bool:
+        # a recurring question shape: the rows are the answer, no LLM call
+        return run.template_match is not None and self.template_return_direct
+
+    def _call(
+            self,
+            inputs: Dict[str, Any],
+            run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        run = self._start(inputs)
+        timings = run.timings
+        _run_manager.on_text(run.input_text, verbose=self.verbose)
+        with timings.stage("table_info"):
+            self._load_schema(run)
+        try:
+            run.intermediate_steps.append(run.llm_inputs)  # input: sql generation
+            with timings.stage("sql_generation"):
+                self._known_sql(run)
+                sql_candidates = self._candidate_budget(inputs)
+                if run.sql_cmd is None and sql_candidates > 1:
+                    run.candidates = self._generate_candidates(
+                        run.llm_chain, run.llm_inputs, sql_candidates, _run_manager
+                    )
+                    run.sql_cmd = run.candidates[0][1]
+                elif run.sql_cmd is None:
+                    run.sql_cmd = run.llm_chain.predict(
+                        callbacks=_run_manager.get_child(),
+                        **run.llm_inputs,
+                    ).strip()
+
+            _run_manager.on_text(run.sql_cmd, color="green", verbose=self.verbose)
+            self._open_sql_exec_step(run)
+            try:
+                result = self._execute(run)
+            except Exception as exc:
+                if not self._recover(run, exc):
+                    raise
+                result = self._escalate(run, _run_manager)
+            self._remember_sql(run)
+            result_text = self._serialize(run, result)
+
+            _run_manager.on_text("\nSQLResult: ", verbose=self.verbose)
+            _run_manager.on_text(result_text, color="yellow", verbose=self.verbose)
+            # If return direct, we just set the final result equal to
+            # the result of the sql query result, otherwise try to get a human readable
+            # final answer
+            if self._direct_result(run):
+                return self._chain_result(result_text, run.intermediate_steps)
+            _run_manager.on_text("\nAnswer:", verbose=self.verbose)
+            get_insight_chain, get_insight_inputs = self._insight_chain(run, result_text)
+            insight_callbacks = self._insight_callbacks(inputs, _run_manager)
+            insight_future = None
+            if self.concurrent_generation:
+                insight_future = generation_pool.submit(
+                    timings.timed("insight", get_insight_chain.predict),
+                    callbacks=insight_callbacks,
+                    **get_insight_inputs,
+                )
+
+            try:
+                with timings.stage("answer"):
+                    sql_data = self._generate_answer(result, run, _run_manager)
+            except Exception:
+                if insight_future is not None:
+                    insight_future.cancel()
+                raise
+            run.intermediate_steps.append(sql_data)  # output: sql data
+            _run_manager.on_text(sql_data, color="green", verbose=self.verbose)
+
+            if insight_future is not None:
+                final_result: str = insight_future.result().strip()
+            else:
+                with timings.stage("insight"):
+                    final_result = get_insight_chain.predict(
+                        callbacks=insight_callbacks, **get_insight_inputs
+                    ).strip()
+
+            _run_manager.on_text(
+                final_result, color="blue", verbose=self.verbose
+            )
+
+            return self._chain_result(final_result, run.intermediate_steps)
+        except Exception as exc:
+            # Append intermediate steps to exception, to aid in logging and later
+            # improvement of few shot prompt seeds
+            exc.intermediate_steps = run.intermediate_steps  # type: ignore
+            raise exc
+
+    async def _acall(
+            self,
+            inputs: Dict[str, Any],
+            run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or AsyncCallbackManagerForChainRun.get_noop_manager()
+        run = self._start(inputs)
+        timings = run.timings
+        await _run_manager.on_text(run.input_text, verbose=self.verbose)
+        with timings.stage("table_info"):
+            await run_blocking(self._load_schema, run)
+        try:
+            run.intermediate_steps.append(run.llm_inputs)  # input: sql generation
+            with timings.stage("sql_generation"):
+                await run_blocking(self._known_sql, run)
+                sql_candidates = self._candidate_budget(inputs)
+                if run.sql_cmd is None and sql_candidates > 1:
+                    run.candidates = await self._agenerate_candidates(
+                        run.llm_chain, run.llm_inputs, sql_candidates, _run_manager
+                    )
+                    run.sql_cmd = run.candidates[0][1]
+                elif run.sql_cmd is None:
+                    run.sql_cmd = (await run.llm_chain.apredict(
+                        callbacks=_run_manager.get_child(),
+                        **run.llm_inputs,
+                    )).strip()
+
+            await _run_manager.on_text(run.sql_cmd, color="green", verbose=self.verbose)
+            self._open_sql_exec_step(run)
+            try:
+                # pyathena polls the query in the io pool, not on the loop
+                result = await run_blocking(self._execute, run)
+            except Exception as exc:
+                if not await run_blocking(self._recover, run, exc):
+                    raise
+                result = await self._aescalate(run, _run_manager)
+            await run_blocking(self._remember_sql, run)
+            result_text = await run_blocking(self._serialize, run, result)
+
+            await _run_manager.on_text("\nSQLResult: ", verbose=self.verbose)
+            await _run_manager.on_text(result_text, color="yellow", verbose=self.verbose)
+            if self._direct_result(run):
+                return self._chain_result(result_text, run.intermediate_steps)
+            await _run_manager.on_text("\nAnswer:", verbose=self.verbose)
+            get_insight_chain, get_insight_inputs = self._insight_chain(run, result_text)
+            insight_callbacks = self._insight_callbacks(inputs, _run_manager)
+
+            async def generate_insight() -> str:
+                with timings.stage("insight"):
+                    return await get_insight_chain.apredict(
+                        callbacks=insight_callbacks, **get_insight_inputs
+                    )
+
+            # started now so it overlaps the answer
+            insight = asyncio.ensure_future(generate_insight())
+            try:
+                sql_data = await timings.atimed("answer", self._agenerate_answer(
+                    result, run, _run_manager
+                ))
+                final_result = (await insight).strip()
+            except BaseException:
+                insight.cancel()
+                raise
+            run.intermediate_steps.append(sql_data)  # output: sql data
+            await _run_manager.on_text(sql_data, color="green", verbose=self.verbose)
+            await _run_manager.on_text(
+                final_result, color="blue", verbose=self.verbose
+            )
+
+            return self._chain_result(final_result, run.intermediate_steps)
+        except Exception as exc:
+            exc.intermediate_steps = run.intermediate_steps  # type: ignore
+            raise exc
+
+class ContentHandler(LLMContentHandler):
+    content_type = "application/json"
+    accepts = "application/json"
+
+    def transform_input(self, prompt: str, model_kwargs={}) -> bytes:
+        input_str = json.dumps({"inputs": prompt, "parameters": model_kwargs})
+        return input_str.encode("utf-8")
+
+    def transform_output(self, output: bytes) -> str:
+        response_json = json.loads(output.read().decode("utf-8"))
+        return response_json[0]["generated_text"]
+
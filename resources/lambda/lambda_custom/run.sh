@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# layers are not on the path of a plain python3 process
+export PYTHONPATH="/opt/python:${LAMBDA_TASK_ROOT}:${PYTHONPATH}"
+exec python3 stream_server.py
@@ -0,0 +1,110 @@
+"""Streams insight tokens over HTTP for the Lambda Web Adapter.
+
+The managed Python runtime cannot stream a Lambda response itself, so the
+streaming function runs this server behind the adapter layer with
+``AWS_LWA_INVOKE_MODE=response_stream``. Each POST ``{"question": ...}`` is
+answered with newline-delimited JSON events: one ``token`` event per insight
+token as it arrives, then a final ``result`` (or ``error``) event.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from text2sql.offload import json_default
+from text2sql.streaming import TokenForwarder
+
+from handler import metrics, warm_chain
+
+_DONE = object()
+
+
+def run_question(question, events):
+    """Answer ``question`` onto ``events`` and report the request's metrics.
+
+    A Lambda execution environment serves one request at a time, so the
+    shared ``metrics`` flush carries this request's values only.
+    """
+    started = time.perf_counter()
+    first_token_at = []
+
+    def on_token(token):
+        if not first_token_at:
+            first_token_at.append(time.perf_counter())
+        events.put({"type": "token", "text": token})
+
+    try:
+        inputs = {
+            "query": question,
+            "insight_callbacks": [TokenForwarder(on_token)],
+            "stage_timings": metrics.new_timings(),
+        }
+        result = warm_chain.run(lambda db_chain: db_chain(inputs, return_only_outputs=True))
+        metrics.record_outputs(result, (time.perf_counter() - started) * 1000)
+        events.put({"type": "result", "sql": result})
+    except Exception as exc:
+        metrics.put("Errors", 1)
+        events.put({"type": "error", "message": str(exc)})
+    finally:
+        if first_token_at:
+            metrics.put("TimeToFirstToken", (first_token_at[0] - started) * 1000, "Milliseconds")
+        metrics.put("Questions", 1)
+        metrics.put("Duration", (time.perf_counter() - started) * 1000, "Milliseconds")
+        metrics.set_property("WarmContext", warm_chain.stats())
+        # before the response ends, after which the environment may be frozen
+        metrics.flush()
+        events.put(_DONE)
+
+
+def encode_event(event):
+    # the status line is already sent, so a failure has to be an event
+    try:
+        return json.dumps(event, default=json_default)
+    except (TypeError, ValueError) as exc:
+        return json.dumps({"type": "error", "message": f"{event.get('type')} event not serializable: {exc}"})
+
+
+class StreamRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # readiness check of the web adapter
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        question = json.loads(self.rfile.read(length) or b"{}").get("question")
+        if not question:
+            self.send_error(400, "question is required")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        events = queue.Queue()
+        threading.Thread(target=run_question, args=(question, events), daemon=True).start()
+        while True:
+            event = events.get()
+            if event is _DONE:
+                break
+            self._write_chunk((encode_event(event) + "\n").encode("utf-8"))
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    port = int(os.getenv("PORT", "8080"))
+    ThreadingHTTPServer(("0.0.0.0", port), StreamRequestHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,100 @@
 import json
 import os
+from functools import lru_cache
 
-from langchain import SQLDatabaseChain, SQLDatabase
-from langchain import SagemakerEndpoint
-from langchain.llms.sagemaker_endpoint import LLMContentHandler
-from sqlalchemy import create_engine
+from text2sql.batch import batch_concurrency, run_batch, validate_questions
+from text2sql.context import WarmContext
+from text2sql.metrics import EMFMetrics
 
+# langchain, sqlalchemy and boto3 are imported on first use so they stay off
+# the cold-start import path (see benchmarks/import_time.py)
 
-class ContentHandler(LLMContentHandler):
-    content_type = "application/json"
-    accepts = "application/json"
 
-    def transform_input(self, prompt: str, model_kwargs={}) -> bytes:
-        input_str = json.dumps({"inputs": prompt, "parameters": model_kwargs})
-        return input_str.encode("utf-8")
+@lru_cache(maxsize=None)
+def get_llm():
+    from langchain import SagemakerEndpoint
+    from langchain.llms.sagemaker_endpoint import LLMContentHandler
 
-    def transform_output(self, output: bytes) -> str:
-        response_json = json.loads(output.read().decode("utf-8"))
-        return response_json[0]["generated_text"]
+    class ContentHandler(LLMContentHandler):
+        content_type = "application/json"
+        accepts = "application/json"
 
+        def transform_input(self, prompt: str, model_kwargs={}) -> bytes:
+            input_str = json.dumps({"inputs": prompt, "parameters": model_kwargs})
+            return input_str.encode("utf-8")
 
-content_handler = ContentHandler()
-llm = SagemakerEndpoint(
-    endpoint_name='huggingface-pytorch-tgi-inference-2023-07-16-05-23-44-657',
-    region_name='us-east-1',
-    model_kwargs={"temperature": 0.01, "max_new_tokens": 200},
-    content_handler=content_handler
-)
+        def transform_output(self, output: bytes) -> str:
+            response_json = json.loads(output.read().decode("utf-8"))
+            return response_json[0]["generated_text"]
 
+    return SagemakerEndpoint(
+        endpoint_name='huggingface-pytorch-tgi-inference-2023-07-16-05-23-44-657',
+        region_name='us-east-1',
+        model_kwargs={"temperature": 0.01, "max_new_tokens": 200},
+        content_handler=ContentHandler()
+    )
 
-def get_athena_database():
-    ATHENA_BUCKET = os.getenv('ATHENA_BUCKET')
-    ATHENA_DATABASE = os.getenv('ATHENA_DATABASE')
-    ATHENA_REGION = os.getenv('ATHENA_REGION')
 
-    conn_str = f"awsathena+rest://:@athena.{ATHENA_REGION}.amazonaws.com:443/{ATHENA_DATABASE}?s3_staging_dir=s3://{ATHENA_BUCKET}/Unsaved/"
-    database_engine = create_engine(conn_str)
-    data_base = SQLDatabase(database_engine)
+def get_database():
+    from langchain import SQLDatabase
+    from text2sql.backends import create_database
 
-    return data_base
+    # QUERY_BACKEND=duckdb answers small tables in process (text2sql/backends.py)
+    return create_database(SQLDatabase)
 
 
-def lambda_handler(event, context):
-    question = event['question']
+def build_chain():
+    from langchain import SQLDatabaseChain
+
+    data_base = get_database()
+
+    return SQLDatabaseChain.from_llm(get_llm(), data_base, verbose=True)
+
+
+# Reused across warm invocations, rebuilt when ATHENA_* changes or the connection drops
+warm_chain = WarmContext(build_chain)
+if os.getenv("PREWARM_CHAIN", "true").lower() == "true" and "AWS_LAMBDA_FUNCTION_NAME" in os.environ:
+    warm_chain.prewarm()
 
-    data_base = get_athena_database()
 
-    db_chain = SQLDatabaseChain.from_llm(llm, data_base, verbose=True)
+metrics = EMFMetrics(os.getenv("METRICS_SERVICE", "PlayGroundLambdaFn"))
 
-    result = db_chain(question)
+
+def answer_question(question):
+    from text2sql.callbacks import StageTimingCallback
+
+    callback = StageTimingCallback(metrics.new_timings())
+    return warm_chain.run(lambda db_chain: db_chain(question, callbacks=[callback]))
+
+
+@metrics.log_invocation
+def lambda_handler(event, context):
+    if 'questions' in event:
+        try:
+            questions = validate_questions(event['questions'])
+        except ValueError as exc:
+            return response(400, {'error': str(exc)})
+        metrics.put('Questions', len(questions))
+        body = {
+            'results': run_batch(
+                questions,
+                answer_question,
+                max_concurrency=batch_concurrency(event.get('max_concurrency')),
+            )
+        }
+    else:
+        metrics.put('Questions', 1)
+        body = {'sql': answer_question(event['question'])}
+
+    metrics.set_property('WarmContext', warm_chain.stats())
+    return response(200, body)
+
+
+def response(status_code, body):
     return {
-        "statusCode": 200,
+        "statusCode": status_code,
         "headers": {
             "Content-Type": "application/json"
         },
-        "body": json.dumps({
-            'sql': result
-        })
+        "body": json.dumps(body)
     }
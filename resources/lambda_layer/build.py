@@ -0,0 +1,333 @@
+"""Build the langchain Lambda layer zip from the pinned requirements.
+
+    python resources/lambda_layer/build.py --lock           # re-resolve requirements.lock
+    python resources/lambda_layer/build.py                  # dist/langchain_layer-x86_64.zip
+    python resources/lambda_layer/build.py --arch arm64     # dist/langchain_layer-arm64.zip
+
+``requirements.txt`` lists what the handlers import; ``requirements.lock``
+pins every transitive dependency for the Lambda platform and is what the
+build installs (``--no-deps``), so two builds from the same lock produce
+the same zip. The build then
+
+* drops packages the Lambda runtime already provides (boto3, botocore,
+  s3transfer, jmespath) and install tooling (pip, setuptools, wheel);
+  the runtime's botocore can predate SageMaker response streaming and
+  ``bedrock-runtime``, which fails when the chain is built, so pass
+  ``--keep-runtime-packages`` to ship the locked boto3 with
+  ``STREAM_TOKENS`` or a Bedrock ``ROUTER_STRONG_MODEL``,
+* strips tests, docs, examples, C sources/headers and unused pyarrow
+  components (Flight, Substrait, Gandiva),
+* strips symbol tables from the native libraries (``strip --strip-unneeded``;
+  libarrow and duckdb alone lose ~30 MB, without it the layer sits right at
+  Lambda's 250 MB unzipped limit),
+* precompiles bytecode with unchecked-hash pycs, since ``/opt`` is
+  read-only and Lambda would otherwise compile every module on each cold
+  start, and
+* writes the zip with sorted entries and fixed timestamps, so CDK's asset
+  hash only changes when the content does.
+
+Bytecode is specific to the Python minor version: it is only compiled when
+this interpreter matches ``--python-version``; otherwise run the build in
+the Lambda build image, e.g.
+
+    docker run --rm -v "$PWD":/src -w /src public.ecr.aws/sam/build-python3.10 \\
+        python resources/lambda_layer/build.py --arch x86_64
+
+The report (printed and saved next to the zip) lists the largest packages,
+what stripping saved and, when the host can run the layer, how long each
+top-level package takes to import from it.
+"""
+import argparse
+import compileall
+import fnmatch
+import json
+import os
+import platform
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REQUIREMENTS = os.path.join(HERE, "requirements.txt")
+LOCK = os.path.join(HERE, "requirements.lock")
+DIST = os.path.join(HERE, "dist")
+
+PLATFORMS = {
+    "x86_64": ["manylinux2014_x86_64", "manylinux_2_17_x86_64"],
+    "arm64": ["manylinux2014_aarch64", "manylinux_2_17_aarch64"],
+}
+HOST_MACHINES = {"x86_64": ("x86_64", "amd64"), "arm64": ("aarch64", "arm64")}
+
+# Already on sys.path in the Lambda Python runtime
+RUNTIME_PACKAGES = {"boto3", "botocore", "s3transfer", "jmespath"}
+BUILD_PACKAGES = {"pip", "setuptools", "wheel", "_distutils_hack"}
+
+# Directory names removed anywhere below a package
+STRIP_DIRS = {"tests", "test", "docs", "doc", "examples", "benchmarks", "__pycache__"}
+# File patterns removed anywhere in the layer
+STRIP_FILES = [
+    "*.pyx", "*.pxd", "*.pxi", "*.c", "*.cc", "*.cpp", "*.h", "*.hpp",
+    "*.pyi", "py.typed", "RECORD", "INSTALLER", "REQUESTED", "direct_url.json",
+]
+# Package-relative paths nothing in the handlers reaches
+STRIP_PATHS = [
+    "bin",
+    "numpy/core/include",
+    "pyarrow/include",
+    "pyarrow/src",
+    "pyarrow/*flight*",
+    "pyarrow/*substrait*",
+    "pyarrow/*gandiva*",
+]
+
+# Top-level imports timed in the report
+IMPORT_CHECKS = ["langchain", "sqlalchemy", "pyathena", "tabulate", "numpy", "duckdb", "pyarrow"]
+
+# Lambda's unzipped limit for a function and all of its layers
+LAMBDA_UNZIPPED_LIMIT = 250 * 2 ** 20
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def pip(*args):
+    subprocess.run([sys.executable, "-m", "pip", *args], check=True)
+
+
+def platform_args(arch, python_version):
+    args = ["--only-binary=:all:", "--implementation", "cp", "--python-version", python_version]
+    for tag in PLATFORMS[arch]:
+        args += ["--platform", tag]
+    return args
+
+
+def write_lock(arch, python_version):
+    """Resolve requirements.txt for the Lambda platform into requirements.lock."""
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "report.json")
+        pip(
+            "install", "--dry-run", "--ignore-installed", "--quiet", "--report", report,
+            "--target", tmp, *platform_args(arch, python_version), "-r", REQUIREMENTS,
+        )
+        with open(report) as f:
+            installs = json.load(f)["install"]
+    pins = sorted(
+        (item["metadata"]["name"].lower(), item["metadata"]["version"]) for item in installs
+    )
+    with open(LOCK, "w") as f:
+        f.write(
+            f"# Resolved from requirements.txt for Python {python_version} by build.py --lock;\n"
+            "# edit requirements.txt and re-run instead of changing this file.\n"
+        )
+        for name, version in pins:
+            f.write(f"{name}=={version}\n")
+    print(f"wrote {len(pins)} pins to {os.path.relpath(LOCK)}")
+
+
+def package_of(rel_path):
+    top = rel_path.split(os.sep)[0]
+    if top.endswith((".dist-info", ".data")):
+        top = top.split("-")[0]
+    for suffix in (".py", ".libs"):
+        top = top[: -len(suffix)] if top.endswith(suffix) else top
+    return top.split(".")[0].lower().replace("-", "_")
+
+
+def tree_size(root):
+    sizes = defaultdict(int)
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if not os.path.islink(path):
+                sizes[package_of(os.path.relpath(path, root))] += os.path.getsize(path)
+    return sizes
+
+
+def remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def strip(site, keep_runtime_packages):
+    removed = set(BUILD_PACKAGES)
+    if not keep_runtime_packages:
+        removed |= RUNTIME_PACKAGES
+    for entry in os.listdir(site):
+        if package_of(entry) in removed:
+            remove(os.path.join(site, entry))
+
+    for pattern in STRIP_PATHS:
+        for entry in fnmatch.filter(_walk_relative(site), pattern):
+            path = os.path.join(site, entry)
+            if os.path.lexists(path):
+                remove(path)
+
+    for dirpath, dirnames, filenames in os.walk(site, topdown=True):
+        depth = os.path.relpath(dirpath, site).count(os.sep) + (dirpath != site)
+        for name in list(dirnames):
+            # a top-level "test" or "docs" would be a package of its own
+            if name in STRIP_DIRS and depth >= 1:
+                shutil.rmtree(os.path.join(dirpath, name))
+                dirnames.remove(name)
+        for name in filenames:
+            if any(fnmatch.fnmatch(name, pattern) for pattern in STRIP_FILES):
+                os.remove(os.path.join(dirpath, name))
+
+
+def _walk_relative(site):
+    for dirpath, dirnames, filenames in os.walk(site):
+        for name in dirnames + filenames:
+            yield os.path.relpath(os.path.join(dirpath, name), site)
+
+
+def strip_binaries(site):
+    """Drop symbols the dynamic linker does not need from every ELF file; returns the count."""
+    strip_tool = shutil.which("strip")
+    if strip_tool is None:
+        print("skipping binaries: no strip on PATH", file=sys.stderr)
+        return 0
+    stripped = 0
+    for dirpath, _, filenames in os.walk(site):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                continue
+            with open(path, "rb") as f:
+                if f.read(4) != b"\x7fELF":
+                    continue
+            # a host strip cannot always handle the other architecture; leave those as they are
+            completed = subprocess.run([strip_tool, "--strip-unneeded", path], capture_output=True)
+            stripped += completed.returncode == 0
+    return stripped
+
+
+def compile_bytecode(site, python_version):
+    running = f"{sys.version_info.major}.{sys.version_info.minor}"
+    if running != python_version:
+        print(
+            f"skipping bytecode: running Python {running}, layer targets {python_version}",
+            file=sys.stderr,
+        )
+        return False
+    # stripdir/prependdir record /opt/python/... as the source path, which is
+    # where tracebacks find the files and keeps the pycs identical across builds
+    compileall.compile_dir(
+        site, quiet=2, workers=0,
+        stripdir=os.path.dirname(site), prependdir="/opt",
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+    return True
+
+
+def write_zip(build_dir, output):
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    paths = []
+    for dirpath, _, filenames in os.walk(build_dir):
+        paths += [os.path.join(dirpath, name) for name in filenames]
+    tmp = output + ".tmp"
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        for path in sorted(paths):
+            info = zipfile.ZipInfo(os.path.relpath(path, build_dir), ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            mode = 0o755 if os.access(path, os.X_OK) else 0o644
+            info.external_attr = (0o100000 | mode) << 16
+            with open(path, "rb") as f:
+                archive.writestr(info, f.read(), compresslevel=9)
+    os.replace(tmp, output)
+
+
+def import_times(site, arch, python_version):
+    """Cumulative import time (ms) of each IMPORT_CHECKS module, if the host can run the layer."""
+    running = f"{sys.version_info.major}.{sys.version_info.minor}"
+    if running != python_version or platform.machine().lower() not in HOST_MACHINES[arch]:
+        return None
+    times = {}
+    for module in IMPORT_CHECKS:
+        completed = subprocess.run(
+            # the host's site-packages stand in for the runtime's boto3
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env={**os.environ, "PYTHONPATH": site},
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            times[module] = completed.stderr.strip().splitlines()[-1]
+            continue
+        for line in completed.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                times[module] = round(int(fields[1]) / 1000, 1)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--arch", choices=sorted(PLATFORMS), default="x86_64")
+    parser.add_argument("--python-version", default="3.10", help="Lambda runtime version")
+    parser.add_argument("--lock", action="store_true", help="re-resolve requirements.lock first")
+    parser.add_argument("--keep-runtime-packages", action="store_true",
+                        help="ship boto3/botocore instead of using the runtime's")
+    parser.add_argument("--no-strip-binaries", dest="strip_binaries", action="store_false",
+                        help="keep symbol tables in native libraries")
+    parser.add_argument("--top", type=int, default=12, help="packages listed in the report")
+    args = parser.parse_args()
+
+    if args.lock or not os.path.exists(LOCK):
+        write_lock(args.arch, args.python_version)
+
+    output = os.path.join(DIST, f"langchain_layer-{args.arch}.zip")
+    with tempfile.TemporaryDirectory() as build_dir:
+        # Lambda adds /opt/python from the layer to sys.path
+        site = os.path.join(build_dir, "python")
+        pip(
+            "install", "--quiet", "--no-deps", "--no-compile", "--target", site,
+            *platform_args(args.arch, args.python_version), "-r", LOCK,
+        )
+        installed = tree_size(site)
+        strip(site, args.keep_runtime_packages)
+        binaries = strip_binaries(site) if args.strip_binaries else 0
+        compiled = compile_bytecode(site, args.python_version)
+        sizes = tree_size(site)
+        times = import_times(site, args.arch, args.python_version)
+        write_zip(build_dir, output)
+
+    unzipped = sum(sizes.values())
+    report = {
+        "zip": os.path.relpath(output, HERE),
+        "arch": args.arch,
+        "python_version": args.python_version,
+        "bytecode": compiled,
+        "binaries_stripped": binaries,
+        "zip_bytes": os.path.getsize(output),
+        "unzipped_bytes": unzipped,
+        "stripped_bytes": sum(installed.values()) - unzipped,
+        "packages": dict(sorted(sizes.items(), key=lambda item: -item[1])),
+        "import_ms": times,
+    }
+    with open(output[: -len(".zip")] + ".report.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    mib = 2 ** 20
+    print(
+        f"{report['zip']}: {report['zip_bytes'] / mib:.1f} MiB zipped, "
+        f"{unzipped / mib:.1f} MiB unzipped "
+        f"({unzipped / LAMBDA_UNZIPPED_LIMIT:.0%} of Lambda's 250 MB), "
+        f"{report['stripped_bytes'] / mib:.1f} MiB stripped ({binaries} binaries), "
+        f"bytecode {'precompiled' if compiled else 'not compiled'}"
+    )
+    for package, size in list(report["packages"].items())[: args.top]:
+        line = f"  {package:<24}{size / mib:>8.1f} MiB"
+        if times and package in times:
+            line += f"  import {times[package]} ms"
+        print(line)
+    if times is None:
+        print("  (import times need a host matching the layer's arch and Python version)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 import aws_cdk
 from aws_cdk import (
     Duration,
@@ -12,6 +14,7 @@ from aws_cdk import (
     aws_logs as logs,
     aws_lambda as _lambda,
     aws_glue as glue,
+    aws_cloudwatch as cloudwatch,
     aws_s3_deployment as s3_deployment
 )
 from constructs import Construct
@@ -21,6 +24,70 @@ from stack.helper import get_sagemaker_image_arn
 JUPYTER_SERVER_APP_IMAGE_NAME = "jupyter-server-3"
 KERNEL_GATEWAY_APP_IMAGE_NAME = "datascience-2.0"
 
+# Storage layouts of the sales table, picked with `cdk deploy -c table_format=<name>`
+TABLE_FORMATS = {
+    "csv": {
+        "prefix": "samples/data/",
+        "parameters": {"classification": "csv", },
+        "input_format": "org.apache.hadoop.mapred.TextInputFormat",
+        "output_format": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+        "serialization_library": "org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe",
+        "serde_parameters": {"field.delim": ","},
+    },
+    "parquet": {
+        "prefix": "samples/data_parquet/",
+        "parameters": {"classification": "parquet", "parquet.compression": "SNAPPY"},
+        "input_format": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+        "output_format": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+        "serialization_library": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe",
+        "serde_parameters": {"serialization.format": "1"},
+    },
+    # Parquet with one partition per transaction_date, resolved by partition
+    # projection so neither a crawler nor MSCK REPAIR TABLE is needed. The
+    # date column itself is the key, so any filter on it prunes partitions.
+    "partitioned": {
+        "prefix": "samples/data_partitioned/",
+        "parameters": {
+            "classification": "parquet",
+            "parquet.compression": "SNAPPY",
+            "projection.enabled": "true",
+            "projection.transaction_date.type": "date",
+            "projection.transaction_date.format": "yyyy-MM-dd",
+            "projection.transaction_date.range": "2022-01-01,NOW",
+            "projection.transaction_date.interval": "1",
+            "projection.transaction_date.interval.unit": "DAYS",
+        },
+        "partition_keys": ["transaction_date"],
+        "input_format": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+        "output_format": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+        "serialization_library": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe",
+        "serde_parameters": {"serialization.format": "1"},
+    },
+}
+
+# Layer zips written by resources/lambda_layer/build.py, one per architecture
+LAYER_BUILD = "resources/lambda_layer/dist/langchain_layer-{}.zip"
+LAMBDA_ARCHITECTURES = {
+    "x86_64": (_lambda.Architecture.X86_64, "LambdaAdapterLayerX86"),
+    "arm64": (_lambda.Architecture.ARM_64, "LambdaAdapterLayerArm64"),
+}
+
+# Namespace of the EMF metrics the handlers print (text2sql/metrics.py)
+METRICS_NAMESPACE = "Text2SQL"
+STAGE_METRICS = [
+    "TableInfoTime", "SqlGenerationTime", "PreflightTime", "ExecutionTime",
+    "SerializationTime", "AnswerTime", "InsightTime",
+]
+# Dashboard rows beyond stage latency, cold starts and errors, per function:
+# "caches" for SqlCacheHit/ResultCacheHit/TemplateHit and ResultRows, which
+# only SQLDatabaseChainWithInsight reports, "routing" for the model tiers,
+# "streaming" for TimeToFirstToken of stream_server.py
+CUSTOM_CHAIN_PANELS = ("caches", "routing")
+# Data bucket prefix of results too large for a Lambda response (text2sql/offload.py)
+RESULT_OFFLOAD_PREFIX = "results/"
+RESULT_OFFLOAD_EXPIRATION_DAYS = 1
+
+
 class VpcStack(NestedStack):
     def __init__(self, scope) -> None:
         super().__init__(scope, "vpc-stack")
@@ -118,11 +185,30 @@ class WorkshopStack(Stack):
 
         self._prepare_athena_data(s3_bucket)
 
+        # `cdk deploy -c lambda_architecture=arm64` runs the functions on Graviton
+        self.lambda_architecture_name = self.node.try_get_context("lambda_architecture") or "x86_64"
+        self.lambda_architecture, self.web_adapter_layer_name = \
+            LAMBDA_ARCHITECTURES[self.lambda_architecture_name]
+
         self.langchain_layer = self._prepare_lambda_langchain_layer()
 
-        self._create_custom_langchain_function(s3_bucket)
+        self.common_layer = self._prepare_lambda_common_layer()
+
+        custom_function = self._create_custom_langchain_function(s3_bucket)
 
-        self._create_langchain_function(s3_bucket)
+        # the playground runs a plain SQLDatabaseChain: no caches, no router
+        monitored_functions = {"CustomLambdaFn": (custom_function, CUSTOM_CHAIN_PANELS)}
+
+        if self.node.try_get_context("enable_streaming"):
+            streaming_function = self._create_custom_streaming_function(s3_bucket)
+            monitored_functions["CustomStreamingLambdaFn"] = (
+                streaming_function, CUSTOM_CHAIN_PANELS + ("streaming",)
+            )
+
+        playground_function = self._create_langchain_function(s3_bucket)
+        monitored_functions["PlayGroundLambdaFn"] = (playground_function, ())
+
+        self._create_monitoring(monitored_functions)
 
         self._create_sagemaker_notebook(sagemaker_role.role_arn)
 
@@ -148,6 +234,36 @@ class WorkshopStack(Stack):
         )
 
         self.glue_db_name_str = glue_db_name.value_as_string
+        self.glue_table_name_str = glue_table_name.value_as_string
+
+        table_format = self.node.try_get_context("table_format") or "csv"
+        if table_format not in TABLE_FORMATS:
+            raise ValueError(f"table_format must be one of {sorted(TABLE_FORMATS)}")
+        storage = TABLE_FORMATS[table_format]
+        self.data_prefix = storage["prefix"]
+        data_location = "s3://" + s3_bucket.bucket_name + "/" + self.data_prefix
+
+        table_parameters = dict(storage["parameters"])
+        partition_key_names = storage.get("partition_keys", [])
+        if partition_key_names:
+            table_parameters["storage.location.template"] = data_location + "".join(
+                f"{key}=${{{key}}}/" for key in partition_key_names
+            )
+
+        columns = [
+            glue.CfnTable.ColumnProperty(name="transaction_date", type="date", comment="Transaction date"),
+            glue.CfnTable.ColumnProperty(
+                name="user_id", type="string", comment="The user who make the purchase",
+            ),
+            glue.CfnTable.ColumnProperty(
+                name="product", type="string", comment="product name. e.g. 'Fruits', 'Ice scream', 'Milk'"
+            ),
+            glue.CfnTable.ColumnProperty(
+                name="price", type="double", comment="The price of the product"
+            ),
+        ]
+        partition_keys = [c for c in columns if c.name in partition_key_names]
+        columns = [c for c in columns if c.name not in partition_key_names]
 
         glue_database = glue.CfnDatabase(
             self,
@@ -167,53 +283,96 @@ class WorkshopStack(Stack):
             table_input=glue.CfnTable.TableInputProperty(
                 name=glue_table_name.value_as_string,
                 description="sample sales data",
-                parameters={"classification": "csv", },
+                parameters=table_parameters,
                 table_type='EXTERNAL_TABLE',
+                partition_keys=partition_keys or None,
                 storage_descriptor=glue.CfnTable.StorageDescriptorProperty(
-                    location="s3://"
-                             + s3_bucket.bucket_name
-                             + "/samples/data/",
+                    location=data_location,
 
-                    input_format="org.apache.hadoop.mapred.TextInputFormat",
-                    output_format="org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
-                    compressed=False,
+                    input_format=storage["input_format"],
+                    output_format=storage["output_format"],
+                    compressed=table_format != "csv",
                     serde_info=glue.CfnTable.SerdeInfoProperty(
-                        serialization_library="org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe",
-                        parameters={
-                            "field.delim": ","
-                        }
+                        serialization_library=storage["serialization_library"],
+                        parameters=storage["serde_parameters"],
                     ),
-                    columns=[
-                        glue.CfnTable.ColumnProperty(name="transaction_date", type="date", comment="Transaction date"),
-                        glue.CfnTable.ColumnProperty(
-                            name="user_id", type="string", comment="The user who make the purchase",
-                        ),
-                        glue.CfnTable.ColumnProperty(
-                            name="product", type="string", comment="product name. e.g. 'Fruits', 'Ice scream', 'Milk'"
-                        ),
-                        glue.CfnTable.ColumnProperty(
-                            name="price", type="double", comment="The price of the product"
-                        ),
-                    ],
+                    columns=columns,
                 ),
             ),
         )
 
     def _prepare_lambda_langchain_layer(self):
+        # Built by resources/lambda_layer/build.py; the hand-made zip is kept
+        # as a fallback for x86_64
+        layer_zip = LAYER_BUILD.format(self.lambda_architecture_name)
+        if not os.path.exists(layer_zip):
+            if self.lambda_architecture_name != "x86_64":
+                raise ValueError(
+                    f"{layer_zip} not found, run `python resources/lambda_layer/build.py "
+                    f"--arch {self.lambda_architecture_name}` first"
+                )
+            layer_zip = "resources/lambda_layer/langchain_layer.zip"
         return _lambda.LayerVersion(
             self,
             'GenaiWorkshopLangchainLayer',
             compatible_runtimes=[_lambda.Runtime.PYTHON_3_10],
-            code=_lambda.Code.from_asset("resources/lambda_layer/langchain_layer.zip"),
+            compatible_architectures=[self.lambda_architecture],
+            code=_lambda.Code.from_asset(layer_zip),
             layer_version_name="langchain_layer",
 
         )
 
+    def _prepare_lambda_common_layer(self):
+        # Shared helpers (warm context, caches, ...) used by both handlers
+        return _lambda.LayerVersion(
+            self,
+            'GenaiWorkshopCommonLayer',
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_10],
+            compatible_architectures=[_lambda.Architecture.X86_64, _lambda.Architecture.ARM_64],
+            code=_lambda.Code.from_asset("resources/lambda/common"),
+            layer_version_name="text2sql_common_layer",
+        )
+
+    def _query_backend_environment(self):
+        # `cdk deploy -c query_backend=duckdb` answers the sales table from an
+        # in-process DuckDB copy while it stays under DUCKDB_MAX_BYTES
+        return {
+            "QUERY_BACKEND": self.node.try_get_context("query_backend") or "athena",
+            # `-c athena_cursor=arrow` downloads results from S3 in bulk
+            "ATHENA_CURSOR": self.node.try_get_context("athena_cursor") or "rest",
+            "ATHENA_TABLE": self.glue_table_name_str,
+            "ATHENA_DATA_PREFIX": self.data_prefix,
+            # `-c preflight_max_partitions=31` refuses SQL that reads more
+            # partitions of the partitioned table (or leaves them unbounded)
+            "PREFLIGHT_MAX_PARTITIONS": str(self.node.try_get_context("preflight_max_partitions") or 0),
+            # `-c sql_candidates=3` races three generated queries per question
+            "SQL_CANDIDATES": str(self.node.try_get_context("sql_candidates") or 1),
+        }
+
+    def _model_routing_environment(self):
+        # `-c strong_model=bedrock:anthropic.claude-v1` (or sagemaker:<endpoint>)
+        # sends complex questions, and SQL the fast model got wrong, to it
+        strong_model = self.node.try_get_context("strong_model")
+        if not strong_model:
+            return {}
+        return {
+            "ROUTER_STRONG_MODEL": strong_model,
+            "ROUTER_THRESHOLD": str(self.node.try_get_context("router_threshold") or 3),
+        }
+
+    def _grant_strong_model(self, function):
+        if self.node.try_get_context("strong_model"):
+            function.add_to_role_policy(iam.PolicyStatement(
+                resources=["*"],
+                actions=["bedrock:InvokeModel"],
+            ))
+
     def _create_langchain_function(self, s3_bucket):
         lambda_function_playground = _lambda.Function(
             self,
             "PlayGroundLambdaFn",
             runtime=_lambda.Runtime.PYTHON_3_10,
+            architecture=self.lambda_architecture,
             allow_public_subnet=True,
             code=_lambda.Code.from_asset("resources/lambda/playground/"),
             handler="handler.lambda_handler",
@@ -221,12 +380,15 @@ class WorkshopStack(Stack):
             memory_size=256,
             retry_attempts=0,
             timeout=Duration.minutes(1),
-            layers=[self.langchain_layer],
+            layers=[self.langchain_layer, self.common_layer],
             log_retention=logs.RetentionDays.THREE_DAYS,
             environment={
                 "ATHENA_BUCKET": s3_bucket.bucket_name,
                 "ATHENA_DATABASE": self.glue_db_name_str,
-                "ATHENA_REGION": self.region
+                "ATHENA_REGION": self.region,
+                **self._query_backend_environment(),
+                "METRICS_SERVICE": "PlayGroundLambdaFn",
+                "METRICS_NAMESPACE": METRICS_NAMESPACE,
             },
         )
         lambda_function_playground.add_to_role_policy(iam.PolicyStatement(
@@ -250,12 +412,15 @@ class WorkshopStack(Stack):
 
         lambda_function_playground.apply_removal_policy(RemovalPolicy.DESTROY)
 
+        return lambda_function_playground
+
     def _create_custom_langchain_function(self, s3_bucket):
         # Defines trigger sns alarm Lambda resource
         custom_lambda_function = _lambda.Function(
             self,
             "CustomLambdaFn",
             runtime=_lambda.Runtime.PYTHON_3_10,
+            architecture=self.lambda_architecture,
             allow_public_subnet=True,
             code=_lambda.Code.from_asset("resources/lambda/lambda_custom/"),
             handler="handler.lambda_handler",
@@ -263,7 +428,7 @@ class WorkshopStack(Stack):
             memory_size=256,
             retry_attempts=0,
             timeout=Duration.minutes(15),
-            layers=[self.langchain_layer],
+            layers=[self.langchain_layer, self.common_layer],
             # role=lambda_role,
             # vpc=self.vpc_stack.get_vpc(),
             # vpc_subnets=self.vpc_stack.get_public_subnets(),
@@ -271,7 +436,14 @@ class WorkshopStack(Stack):
             environment={
                 "ATHENA_BUCKET": s3_bucket.bucket_name,
                 "ATHENA_DATABASE": self.glue_db_name_str,
-                "ATHENA_REGION": self.region
+                "ATHENA_REGION": self.region,
+                "RESULT_CACHE_DATA_PREFIX": self.data_prefix,
+                "RESULT_OFFLOAD_PREFIX": RESULT_OFFLOAD_PREFIX,
+                "RESULT_OFFLOAD_EXPIRATION_DAYS": str(RESULT_OFFLOAD_EXPIRATION_DAYS),
+                **self._query_backend_environment(),
+                **self._model_routing_environment(),
+                "METRICS_SERVICE": "CustomLambdaFn",
+                "METRICS_NAMESPACE": METRICS_NAMESPACE,
             },
         )
         custom_lambda_function.add_to_role_policy(iam.PolicyStatement(
@@ -292,9 +464,186 @@ class WorkshopStack(Stack):
         ))
 
         s3_bucket.grant_read_write(custom_lambda_function)
+        self._grant_strong_model(custom_lambda_function)
 
         custom_lambda_function.apply_removal_policy(RemovalPolicy.DESTROY)
 
+        return custom_lambda_function
+
+    def _create_custom_streaming_function(self, s3_bucket):
+        # Python runtimes cannot stream responses natively, so the handler runs
+        # stream_server.py behind the Lambda Web Adapter in response_stream mode
+        web_adapter_layer = _lambda.LayerVersion.from_layer_version_arn(
+            self,
+            "LambdaWebAdapterLayer",
+            f"arn:aws:lambda:{self.region}:753240598075:layer:{self.web_adapter_layer_name}:17",
+        )
+        streaming_lambda_function = _lambda.Function(
+            self,
+            "CustomStreamingLambdaFn",
+            runtime=_lambda.Runtime.PYTHON_3_10,
+            architecture=self.lambda_architecture,
+            allow_public_subnet=True,
+            code=_lambda.Code.from_asset("resources/lambda/lambda_custom/"),
+            handler="run.sh",
+            description="lambda function streaming insight tokens of the custom langchain",
+            memory_size=256,
+            retry_attempts=0,
+            timeout=Duration.minutes(15),
+            layers=[self.langchain_layer, self.common_layer, web_adapter_layer],
+            log_retention=logs.RetentionDays.THREE_DAYS,
+            environment={
+                "ATHENA_BUCKET": s3_bucket.bucket_name,
+                "ATHENA_DATABASE": self.glue_db_name_str,
+                "ATHENA_REGION": self.region,
+                "RESULT_CACHE_DATA_PREFIX": self.data_prefix,
+                "RESULT_OFFLOAD_PREFIX": RESULT_OFFLOAD_PREFIX,
+                "RESULT_OFFLOAD_EXPIRATION_DAYS": str(RESULT_OFFLOAD_EXPIRATION_DAYS),
+                **self._query_backend_environment(),
+                **self._model_routing_environment(),
+                "STREAM_TOKENS": "true",
+                "METRICS_SERVICE": "CustomStreamingLambdaFn",
+                "METRICS_NAMESPACE": METRICS_NAMESPACE,
+                "AWS_LAMBDA_EXEC_WRAPPER": "/opt/bootstrap",
+                "AWS_LWA_INVOKE_MODE": "response_stream",
+                "PORT": "8080",
+            },
+        )
+        streaming_lambda_function.add_to_role_policy(iam.PolicyStatement(
+            resources=["*"],
+            actions=[
+                "athena:StartQueryExecution",
+                "athena:StopQueryExecution",
+                "athena:GetQueryExecution",
+                "athena:GetQueryResults",
+                "athena:ListTableMetadata",
+                "glue:GetTables",
+                "glue:GetTable",
+                "athena:GetTableMetadata",
+                "logs:CreateLogStream",
+                "logs:PutLogEvents",
+                "sagemaker:InvokeEndpoint",
+                "sagemaker:InvokeEndpointWithResponseStream"
+            ],
+        ))
+
+        s3_bucket.grant_read_write(streaming_lambda_function)
+        self._grant_strong_model(streaming_lambda_function)
+
+        function_url = streaming_lambda_function.add_function_url(
+            auth_type=_lambda.FunctionUrlAuthType.AWS_IAM,
+            invoke_mode=_lambda.InvokeMode.RESPONSE_STREAM,
+        )
+        CfnOutput(self, "StreamingFunctionUrl", value=function_url.url)
+
+        streaming_lambda_function.apply_removal_policy(RemovalPolicy.DESTROY)
+
+        return streaming_lambda_function
+
+    def _create_monitoring(self, functions):
+        # Stage metrics come from the EMF lines the handlers print, so no
+        # PutMetricData permission is needed. Alarm threshold (ms) can be set
+        # with `cdk deploy -c latency_alarm_p99_ms=<ms>`.
+        threshold = float(self.node.try_get_context("latency_alarm_p99_ms") or 30000)
+        dashboard = cloudwatch.Dashboard(
+            self,
+            "Text2SqlDashboard",
+            dashboard_name=f"{self.prefix}-latency",
+        )
+
+        for service, (function, panels) in functions.items():
+            def metric(name, statistic="p99"):
+                return cloudwatch.Metric(
+                    namespace=METRICS_NAMESPACE,
+                    metric_name=name,
+                    dimensions_map={"Service": service},
+                    statistic=statistic,
+                    period=Duration.minutes(5),
+                )
+
+            duration_p99 = metric("Duration")
+            cloudwatch.Alarm(
+                self,
+                f"{service}DurationP99Alarm",
+                metric=duration_p99,
+                threshold=threshold,
+                evaluation_periods=3,
+                datapoints_to_alarm=2,
+                comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+                alarm_description=f"p99 latency of {service} above {threshold:.0f} ms",
+            )
+
+            dashboard.add_widgets(
+                cloudwatch.TextWidget(markdown=f"## {service}", width=24, height=1),
+            )
+            dashboard.add_widgets(
+                cloudwatch.GraphWidget(
+                    title=f"{service} stage p99 (ms)",
+                    left=[metric(name) for name in ["Duration"] + STAGE_METRICS],
+                    width=12,
+                ),
+                cloudwatch.GraphWidget(
+                    title=f"{service} stage p50 (ms)",
+                    left=[metric(name, "p50") for name in ["Duration"] + STAGE_METRICS],
+                    width=12,
+                ),
+            )
+            width = 8 if "caches" in panels else 24
+            row = [
+                cloudwatch.GraphWidget(
+                    title=f"{service} cold starts and errors",
+                    left=[metric("ColdStart", "Sum"), metric("Errors", "Sum")],
+                    right=[function.metric_invocations()],
+                    width=width,
+                ),
+            ]
+            if "caches" in panels:
+                row.insert(0, cloudwatch.GraphWidget(
+                    title=f"{service} cache hit rate",
+                    left=[
+                        metric("SqlCacheHit", "Average"),
+                        metric("ResultCacheHit", "Average"),
+                        # share of questions compiled from a learned template
+                        metric("TemplateHit", "Average"),
+                    ],
+                    width=width,
+                ))
+                row.append(cloudwatch.GraphWidget(
+                    title=f"{service} result rows",
+                    left=[metric("ResultRows", "p99"), metric("ResultRows", "Average")],
+                    width=width,
+                ))
+            dashboard.add_widgets(*row)
+            if "streaming" in panels:
+                dashboard.add_widgets(
+                    cloudwatch.GraphWidget(
+                        title=f"{service} time to first insight token (ms)",
+                        left=[metric("TimeToFirstToken", "p50"), metric("TimeToFirstToken", "p99")],
+                        width=24,
+                    ),
+                )
+            if "routing" in panels:
+                dashboard.add_widgets(
+                    cloudwatch.GraphWidget(
+                        title=f"{service} latency per model tier (ms)",
+                        left=[
+                            metric("FastTierLatency", "p50"),
+                            metric("FastTierLatency", "p99"),
+                            metric("StrongTierLatency", "p50"),
+                            metric("StrongTierLatency", "p99"),
+                        ],
+                        width=12,
+                    ),
+                    cloudwatch.GraphWidget(
+                        title=f"{service} model routing",
+                        left=[metric("FastTierQuestions", "Sum"), metric("StrongTierQuestions", "Sum")],
+                        # share of fast-tier questions whose SQL was rewritten by the strong model
+                        right=[metric("Escalated", "Average")],
+                        width=12,
+                    ),
+                )
+
     def _create_notebook_role(self, s3_bucket):
         # IAM Roles
         name = "Sagemaker"
@@ -456,6 +805,13 @@ class WorkshopStack(Stack):
             removal_policy=RemovalPolicy.RETAIN,
             encryption=s3.BucketEncryption.S3_MANAGED,
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            # large query results the custom functions hand out as presigned URLs
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    prefix=RESULT_OFFLOAD_PREFIX,
+                    expiration=Duration.days(RESULT_OFFLOAD_EXPIRATION_DAYS),
+                ),
+            ],
         )
 
         data_bucket.add_to_resource_policy(
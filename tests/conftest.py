@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the layout the Lambda sees (common layer, handler directory), plus the
+# benchmark stand-ins in benchmarks/fakes.py
+sys.path[:0] = [
+    os.path.join(ROOT, "resources/lambda/common/python"),
+    os.path.join(ROOT, "resources/lambda/lambda_custom"),
+    os.path.join(ROOT, "benchmarks"),
+]
+
+
+@pytest.fixture(scope="session")
+def sales_db(tmp_path_factory):
+    """``samples/data/retail.csv`` in a file-backed SQLite ``sales`` table."""
+    from fakes import sales_database
+
+    return sales_database(directory=str(tmp_path_factory.mktemp("sales")))
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """A boto3 S3 client on moto's in-memory S3 with an empty bucket."""
+    from moto import mock_aws
+
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("AWS_ENDPOINT_URL_S3", raising=False)
+    with mock_aws():
+        import boto3
+
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="text2sql-test")
+        yield client
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from text2sql.backends import DuckDBDatabase, LocalTableSource, S3TableSource
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RETAIL_CSV = os.path.join(ROOT, "samples/data/retail.csv")
+
+
+@pytest.fixture(scope="module")
+def duckdb_database(tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp("duckdb"))
+    return DuckDBDatabase.from_source(LocalTableSource(RETAIL_CSV), cache_dir=cache_dir)
+
+
+def test_copies_the_table(duckdb_database):
+    result = duckdb_database.run_query("SELECT COUNT(*) FROM sales")
+    assert result.rows[0][0] > 0
+    assert duckdb_database.dialect == "presto"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM read_csv('/proc/self/environ', sep = '\\0', header = false)",
+    f"SELECT * FROM read_csv('{RETAIL_CSV}')",
+    f"SELECT * FROM read_text('{RETAIL_CSV}')",
+    "SELECT * FROM read_parquet('https://example.com/data.parquet')",
+    "SET enable_external_access = true",
+])
+def test_queries_cannot_reach_files(duckdb_database, sql):
+    with pytest.raises(DBAPIError):
+        duckdb_database.run_query(sql)
+
+
+def test_new_data_version_replaces_the_old_files(s3_client, tmp_path):
+    with open(RETAIL_CSV, "rb") as f:
+        data = f.read()
+    source = S3TableSource("text2sql-test", "samples/data/", client=s3_client)
+    (tmp_path / "offload.jsonl.gz").write_bytes(b"x")
+
+    s3_client.put_object(Bucket="text2sql-test", Key="samples/data/retail.csv", Body=data)
+    DuckDBDatabase.from_source(source, cache_dir=str(tmp_path))
+    (first,) = [p.name for p in tmp_path.glob("sales-*.duckdb")]
+    # the download was copied into the DuckDB file
+    assert not [p for p in tmp_path.iterdir() if p.is_dir()]
+
+    s3_client.put_object(Bucket="text2sql-test", Key="samples/data/retail.csv", Body=data.split(b"\n", 1)[1])
+    database = DuckDBDatabase.from_source(source, cache_dir=str(tmp_path))
+    assert database.run_query("SELECT COUNT(*) FROM sales").rows[0][0] > 0
+    (second,) = [p.name for p in tmp_path.glob("sales-*.duckdb")]
+    assert second != first
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["offload.jsonl.gz", second]
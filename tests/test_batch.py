@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from text2sql.batch import batch_concurrency, run_batch, validate_questions
+
+
+def test_answers_in_input_order():
+    results = run_batch(["a", "b", "c"], str.upper, max_concurrency=3)
+    assert results == [
+        {"question": "a", "result": "A"},
+        {"question": "b", "result": "B"},
+        {"question": "c", "result": "C"},
+    ]
+
+
+def test_duplicates_run_once():
+    calls = []
+    lock = threading.Lock()
+
+    def run_one(question):
+        with lock:
+            calls.append(question)
+        return len(calls)
+
+    results = run_batch(["Total of Milk", " Total  of Milk "], run_one)
+    assert len(calls) == 1
+    assert results[0]["result"] == results[1]["result"]
+
+
+def test_only_whitespace_is_folded():
+    questions = ["Orders with price > 100", "Orders with price < 100", "orders with price > 100"]
+    results = run_batch(questions, lambda question: question)
+    assert [r["result"] for r in results] == questions
+
+
+@pytest.mark.parametrize("questions", ["Total of Milk", [], None, {"q": "Total of Milk"}, ["ok", 1], ["ok", " "]])
+def test_rejects_anything_but_a_list_of_questions(questions):
+    with pytest.raises(ValueError):
+        validate_questions(questions)
+    with pytest.raises(ValueError):
+        run_batch(questions, str.upper)
+
+
+def test_errors_are_per_question():
+    def run_one(question):
+        if question == "bad":
+            raise ValueError("no such column")
+        return "ok"
+
+    results = run_batch(["good", "bad"], run_one)
+    assert results[0] == {"question": "good", "result": "ok"}
+    assert results[1]["error"] == {"type": "ValueError", "message": "no such column"}
+
+
+def test_concurrency_is_capped(monkeypatch):
+    monkeypatch.setenv("BATCH_MAX_CONCURRENCY", "4")
+    assert batch_concurrency(100) == 4
+    assert batch_concurrency(2) == 2
+    assert batch_concurrency() == 4
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from sqlalchemy.exc import DisconnectionError
+
+from text2sql.context import WarmContext
+
+
+class Factory:
+    def __init__(self, fail=0):
+        self.built = []
+        self.fail = fail
+
+    def __call__(self):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("no endpoint")
+        self.built.append(object())
+        return self.built[-1]
+
+
+def test_value_is_reused_across_invocations(monkeypatch):
+    monkeypatch.setenv("ATHENA_DATABASE", "default")
+    factory = Factory()
+    context = WarmContext(factory)
+    assert context.get() is context.get() is factory.built[0]
+    assert context.stats() == {"hits": 1, "builds": 1, "invalidations": 0, "hit_rate": 0.5}
+
+
+def test_athena_environment_change_rebuilds(monkeypatch):
+    monkeypatch.setenv("ATHENA_DATABASE", "default")
+    factory = Factory()
+    context = WarmContext(factory)
+    first = context.get()
+    monkeypatch.setenv("OTHER_SETTING", "ignored")
+    assert context.get() is first
+    monkeypatch.setenv("ATHENA_DATABASE", "sales")
+    assert context.get() is factory.built[1]
+    assert context.builds == 2
+
+
+def test_connection_error_rebuilds_once():
+    factory = Factory()
+    context = WarmContext(factory)
+    used = []
+
+    def query(value):
+        used.append(value)
+        if len(used) == 1:
+            raise DisconnectionError("connection reset")
+        return "rows"
+
+    assert context.run(query) == "rows"
+    assert used == factory.built
+    assert context.stats()["invalidations"] == 1
+
+
+def test_other_errors_keep_the_value():
+    factory = Factory()
+    context = WarmContext(factory)
+
+    def query(value):
+        raise ValueError("bad SQL")
+
+    with pytest.raises(ValueError):
+        context.run(query)
+    assert context.builds == 1 and context.invalidations == 0
+
+
+def test_failed_prewarm_is_logged_and_retried(capsys):
+    factory = Factory(fail=1)
+    context = WarmContext(factory)
+    context.prewarm().join()
+    assert json.loads(capsys.readouterr().out) == {
+        "warm_context": "prewarm failed", "error": "RuntimeError('no endpoint')",
+    }
+    assert context.get() is factory.built[0]
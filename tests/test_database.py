@@ -0,0 +1,55 @@
+import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from tests.conftest import ROOT
+from text2sql.database import _restore_dates
+
+SQL = (
+    "SELECT transaction_date, product, price FROM sales "
+    "WHERE product = 'Milk' ORDER BY transaction_date, user_id"
+)
+
+
+@pytest.fixture
+def fake_athena(monkeypatch):
+    """FakeAthenaClient over the sample Parquet, with moto's S3 server as the staging bucket."""
+    from fakes import FakeAthenaClient, LocalS3
+    from pyathena.arrow.result_set import AthenaArrowResultSet
+
+    # LocalS3 and athena_database set these on os.environ; restored afterwards
+    for name in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION", "AWS_ENDPOINT_URL_S3",
+                 "ATHENA_BUCKET", "ATHENA_DATABASE", "ATHENA_REGION", "ATHENA_CURSOR", "ATHENA_UNLOAD"]:
+        monkeypatch.delenv(name, raising=False)
+    attribute = "_AthenaArrowResultSet__s3_file_system"
+    monkeypatch.setattr(AthenaArrowResultSet, attribute, getattr(AthenaArrowResultSet, attribute))
+
+    with LocalS3(bucket="text2sql-test") as s3:
+        s3.patch_arrow_filesystem()
+        table = pq.read_table(f"{ROOT}/samples/data_parquet/retail.parquet")
+        yield FakeAthenaClient(s3, table, page_latency=0)
+
+
+def test_restore_dates_casts_only_athena_date_columns():
+    stamps = pa.array([datetime.datetime(2022, 9, 1)], pa.timestamp("ms"))
+    table = pa.table({"day": stamps, "at": stamps})
+    restored = _restore_dates(table, [("day", "date"), ("at", "timestamp")])
+    assert restored.column("day").to_pylist() == [datetime.date(2022, 9, 1)]
+    assert restored.column("at").type == pa.timestamp("ms")
+    assert _restore_dates(table, None) is table
+
+
+# pyathena's UNLOAD reader passes a pyarrow option deprecated since 15.0
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("unload", [False, True])
+def test_arrow_cursor_rows_match_the_rest_cursor(fake_athena, unload):
+    from fakes import athena_database
+
+    rest = athena_database(fake_athena, "rest").run_query(SQL)
+    arrow = athena_database(fake_athena, "arrow", unload).run_query(SQL)
+    assert len(rest) > 0
+    assert isinstance(arrow.rows[0][0], datetime.date)
+    assert arrow.columns == rest.columns
+    assert [tuple(row) for row in arrow.rows] == [tuple(row) for row in rest.rows]
@@ -0,0 +1,28 @@
+import io
+import json
+
+from fakes import CANNED_SQL, RETAIL_CSV, FakeSagemakerRuntime
+
+from text2sql.streaming import iter_payload_tokens
+
+
+def test_sales_database_loads_every_row(sales_db):
+    with open(RETAIL_CSV) as f:
+        lines = sum(1 for _ in f)
+    assert [tuple(row) for row in sales_db.run_query("SELECT COUNT(*) FROM sales").rows] == [(lines,)]
+
+
+def test_runtime_answers_sql_prompts_with_the_canned_query():
+    runtime = FakeSagemakerRuntime()
+    body = json.dumps({"inputs": "Question: total of Fruits\nSQLQuery:"})
+    response = runtime.invoke_endpoint("fake", body, "application/json", "application/json")
+    assert json.load(io.TextIOWrapper(response["Body"])) == [{"generated_text": f" {CANNED_SQL}"}]
+    assert runtime.calls == 1
+
+
+def test_response_stream_reassembles_to_the_full_text():
+    runtime = FakeSagemakerRuntime()
+    body = json.dumps({"inputs": "Context\nMy Insight:"})
+    response = runtime.invoke_endpoint_with_response_stream("fake", body, "application/json")
+    text = "".join(iter_payload_tokens(response["Body"]))
+    assert text == "Fruits make up a steady share of revenue."
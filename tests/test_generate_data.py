@@ -0,0 +1,67 @@
+import datetime
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from tests.conftest import ROOT
+
+spec = importlib.util.spec_from_file_location(
+    "generate_test_data_main", os.path.join(ROOT, "generate_test_data/main.py")
+)
+generator = importlib.util.module_from_spec(spec)
+# worker processes unpickle write_shard by module name
+sys.modules[spec.name] = generator
+spec.loader.exec_module(generator)
+
+
+def generate(tmp_path, name, *options):
+    args = generator.parse_args([
+        "--rows", "2500", "--users", "20", "--seed", "7", "--chunk-rows", "1000",
+        "--output", str(tmp_path / name), *options,
+    ])
+    written, _ = generator.generate(args)
+    return written
+
+
+def test_chunk_rows_follow_the_product_list():
+    rng = np.random.default_rng(1)
+    users = generator.generate_user_ids(5, rng)
+    start, end = datetime.datetime(2022, 9, 1), datetime.datetime(2022, 12, 1)
+    table = generator.generate_chunk(1000, users, start, end, rng)
+    assert table.schema == generator.SALES_SCHEMA
+    assert all(len(user) == 36 and user[14] == "4" for user in users)
+    for row in table.to_pylist():
+        assert start.date() <= row["transaction_date"] <= end.date()
+        assert generator.product_lists[row["product"]] == row["price"]
+        assert row["user_id"] in users
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_output_does_not_depend_on_workers(tmp_path, file_format):
+    options = ["--format", file_format, "--shards", "3"]
+    assert generate(tmp_path, "serial", *options, "--workers", "1") == 2500
+    assert generate(tmp_path, "parallel", *options, "--workers", "3") == 2500
+    for shard in range(3):
+        name = f"retail-{shard:05d}.{file_format}"
+        serial = (tmp_path / "serial" / name).read_bytes()
+        assert serial == (tmp_path / "parallel" / name).read_bytes()
+
+
+def test_day_partitions_hold_every_row(tmp_path):
+    assert generate(tmp_path, "days", "--format", "parquet", "--partition-by", "day", "--workers", "1") == 2500
+    table = ds.dataset(str(tmp_path / "days"), format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 2500
+    assert set(table.column_names) == set(generator.SALES_SCHEMA.names)
+
+
+def test_parquet_row_groups_span_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, "PARQUET_ROW_GROUP_SIZE", 1500)
+    generate(tmp_path, "groups", "--format", "parquet", "--workers", "1")
+    metadata = pq.ParquetFile(str(tmp_path / "groups" / "retail.parquet")).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [1500, 1000]
+    assert pq.read_schema(str(tmp_path / "groups" / "retail.parquet")) == generator.SALES_SCHEMA
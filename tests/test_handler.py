@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("questions", ["Total of Milk", [], 42, ["Total of Milk", None]])
+def test_invalid_batches_are_bad_requests(questions):
+    from handler import lambda_handler
+
+    response = lambda_handler({"questions": questions}, None)
+    assert response["statusCode"] == 400
+    assert "questions" in json.loads(response["body"])["error"]
+
+
+def test_build_chain_loads_template_values(monkeypatch, sales_db):
+    import handler
+    from fakes import FakeSagemakerRuntime, fake_llm
+    from text2sql.templates import IntentTemplates
+
+    templates = IntentTemplates()
+    monkeypatch.setattr(handler, "intent_templates", templates)
+    monkeypatch.setattr(handler, "get_database", lambda: sales_db)
+    monkeypatch.setattr(handler, "get_llm", lambda: fake_llm(FakeSagemakerRuntime()))
+    monkeypatch.delenv("TEMPLATE_RETURN_DIRECT", raising=False)
+
+    chain = handler.build_chain()
+    assert not chain.template_return_direct
+    assert templates.extract("Total of Milk")[0] == "total of <product>"
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests.conftest import ROOT
+
+# deferred to the first request, see benchmarks/import_time.py
+HEAVY_MODULES = ["langchain", "sqlalchemy", "boto3", "botocore", "numpy", "pyathena", "duckdb"]
+
+
+@pytest.mark.parametrize("handler_dir", ["lambda_custom", "playground"])
+def test_handler_import_defers_heavy_modules(handler_dir):
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([
+            os.path.join(ROOT, "resources/lambda/common/python"),
+            os.path.join(ROOT, "resources/lambda", handler_dir),
+        ]),
+        "PREWARM_CHAIN": "false",
+        "SCHEMA_CACHE_PATH": "",
+    }
+    statement = (
+        "import sys, handler; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", statement], env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    assert completed.stdout.split() == []
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from text2sql.answers import AnswerFormatter
+from text2sql.timing import StageTimings
+
+
+class CountingTimings(StageTimings):
+    def __init__(self):
+        super().__init__()
+        self.added = []
+
+    def add(self, name, seconds):
+        super().add(name, seconds)
+        self.added.append(name)
+
+
+class BrokenFormatter(AnswerFormatter):
+    def format(self, result):
+        raise RuntimeError("formatter failed")
+
+
+def build_chain(sales_db, runtime, **kwargs):
+    from fakes import fake_llm
+    from insight_chain import SQLDatabaseChainWithInsight
+
+    return SQLDatabaseChainWithInsight.from_llm(fake_llm(runtime), sales_db, **kwargs)
+
+
+def acall(chain, timings):
+    return asyncio.run(chain.acall(
+        {"query": "What is total sale amount of Fruits", "stage_timings": timings},
+        return_only_outputs=True,
+    ))
+
+
+@pytest.mark.parametrize("formatter", [AnswerFormatter(), None])
+def test_async_answer_is_timed_once(sales_db, formatter):
+    from fakes import FakeSagemakerRuntime
+
+    runtime = FakeSagemakerRuntime()
+    chain = build_chain(sales_db, runtime, answer_formatter=formatter)
+    timings = CountingTimings()
+    outputs = acall(chain, timings)
+
+    assert outputs["result"] == "Fruits make up a steady share of revenue."
+    assert timings.added.count("answer") == 1
+    assert timings.added.count("insight") == 1
+    # SQL, insight, and the answer only without the formatter
+    assert runtime.calls == (2 if formatter else 3)
+
+
+def test_failed_answer_cancels_the_insight(sales_db):
+    from fakes import FakeSagemakerRuntime
+
+    runtime = FakeSagemakerRuntime(latency=0.2)
+    chain = build_chain(sales_db, runtime, answer_formatter=BrokenFormatter())
+    pending = []
+
+    async def run():
+        try:
+            await chain.acall({"query": "What is total sale amount of Fruits"})
+        finally:
+            pending.extend(t for t in asyncio.all_tasks() if t is not asyncio.current_task())
+
+    with pytest.raises(RuntimeError, match="formatter failed"):
+        asyncio.run(run())
+    assert pending and all(task.cancelled() or task.cancelling() for task in pending)
+
+
+def wrong_column_writer(prompt):
+    if prompt.rstrip().endswith("SQLQuery:"):
+        return " SELECT SUM(amount) FROM sales WHERE product = 'Fruits'"
+    return "Insight." if "My Insight:" in prompt else "Answer."
+
+
+def escalating_chain(sales_db):
+    from fakes import FakeSagemakerRuntime, fake_llm
+    from insight_chain import SQLDatabaseChainWithInsight
+
+    from text2sql.preflight import SQLPreflight
+    from text2sql.routing import ModelRouter
+    from text2sql.sql_cache import QuestionSQLCache
+    from text2sql.templates import IntentTemplates
+
+    fast = fake_llm(FakeSagemakerRuntime(responder=wrong_column_writer))
+    strong = fake_llm(FakeSagemakerRuntime())
+    return SQLDatabaseChainWithInsight.from_llm(
+        fast, sales_db,
+        router=ModelRouter(fast, strong, threshold=100),
+        preflight=SQLPreflight(),
+        sql_cache=QuestionSQLCache(),
+        intent_templates=IntentTemplates(min_support=1),
+    )
+
+
+def test_sync_and_async_take_the_same_steps(sales_db):
+    question = {"query": "What is total sale amount of Fruits"}
+    sync_chain, async_chain = escalating_chain(sales_db), escalating_chain(sales_db)
+
+    for _ in range(2):
+        sync_outputs = sync_chain(dict(question), return_only_outputs=True)
+        async_outputs = asyncio.run(async_chain.acall(dict(question), return_only_outputs=True))
+        assert sync_outputs == async_outputs
+
+    sql_exec_step = sync_outputs["intermediate_steps"][2]
+    # the second run reuses the strong model's SQL, which was learned as a template
+    assert sql_exec_step["template"]["hit"] is True
+    assert sql_exec_step["routing"]["escalated"] is False
+    assert sync_chain.router.stats()["escalations"] == 1
+
+
+def test_unknown_column_drops_the_cached_schema(sales_db):
+    from fakes import FakeSagemakerRuntime
+
+    from text2sql.preflight import PreflightError, SQLPreflight
+    from text2sql.schema_cache import SchemaCache
+
+    schema_cache = SchemaCache()
+    chain = build_chain(
+        sales_db, FakeSagemakerRuntime(responder=wrong_column_writer),
+        preflight=SQLPreflight(), schema_cache=schema_cache,
+    )
+    for _ in range(2):
+        with pytest.raises(PreflightError):
+            chain({"query": "What is total sale amount of Fruits"})
+        assert schema_cache.stats()["entries"] == 0
+    # each retry reads the schema again
+    assert schema_cache.stats()["misses"] == 2
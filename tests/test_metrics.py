@@ -0,0 +1,103 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from text2sql.metrics import MAX_VALUES_PER_RECORD, EMFMetrics
+
+
+def test_flush_prints_one_emf_record(capsys):
+    metrics = EMFMetrics("CustomLambdaFn", namespace="Text2SQL")
+    metrics.put("Questions", 2)
+    metrics.new_timings().add("execution", 0.25)
+    metrics.set_property("RequestId", "req-1")
+
+    (record,) = metrics.flush()
+    assert json.loads(capsys.readouterr().out) == record
+    assert record["_aws"]["CloudWatchMetrics"] == [{
+        "Namespace": "Text2SQL",
+        "Dimensions": [["Service"]],
+        "Metrics": [
+            {"Name": "Questions", "Unit": "Count"},
+            {"Name": "ExecutionTime", "Unit": "Milliseconds"},
+        ],
+    }]
+    assert isinstance(record["_aws"]["Timestamp"], int)
+    assert record["Service"] == "CustomLambdaFn"
+    assert record["RequestId"] == "req-1"
+    assert record["Questions"] == [2]
+    assert record["ExecutionTime"] == [250.0]
+    # values and properties belong to one invocation
+    assert metrics.flush() == []
+
+
+def test_more_values_than_a_record_takes_are_split(capsys):
+    metrics = EMFMetrics("CustomLambdaFn")
+    for _ in range(MAX_VALUES_PER_RECORD + 1):
+        metrics.put("SqlCacheHit", 1)
+    metrics.put("Questions", 101)
+
+    first, second = metrics.flush()
+    assert len(first["SqlCacheHit"]) == MAX_VALUES_PER_RECORD
+    assert second["SqlCacheHit"] == [1]
+    assert "Questions" not in second
+    assert [m["Name"] for m in second["_aws"]["CloudWatchMetrics"][0]["Metrics"]] == ["SqlCacheHit"]
+
+
+def test_log_invocation_records_cold_start_duration_and_errors(capsys):
+    metrics = EMFMetrics("CustomLambdaFn")
+
+    @metrics.log_invocation
+    def handler(event, context):
+        if event.get("fail"):
+            raise RuntimeError("boom")
+        return "ok"
+
+    context = SimpleNamespace(aws_request_id="req-1")
+    assert handler({}, context) == "ok"
+    with pytest.raises(RuntimeError):
+        handler({"fail": True}, context)
+
+    first, second = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert first["ColdStart"] == [1] and second["ColdStart"] == [0]
+    assert "Errors" not in first and second["Errors"] == [1]
+    assert first["RequestId"] == "req-1"
+    units = {m["Name"]: m["Unit"] for m in first["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert units["Duration"] == "Milliseconds"
+
+
+def test_record_outputs_reads_the_sql_exec_step(capsys):
+    metrics = EMFMetrics("CustomLambdaFn")
+    metrics.record_outputs({"intermediate_steps": [
+        "SELECT 1",
+        {
+            "sql_cmd": "SELECT 1",
+            "sql_cache": {"hit": True},
+            "result_cache": {"hit": False},
+            "serialization": {"mode": "full", "rows": 3},
+            "routing": {"tier": "fast", "escalated": False},
+        },
+        # text results carry no row count
+        {"sql_cmd": "SELECT 2", "serialization": {"mode": "truncated", "tokens": 10}},
+    ]}, duration_ms=120.0)
+
+    (record,) = metrics.flush()
+    assert record["SqlCacheHit"] == [1]
+    assert record["ResultCacheHit"] == [0]
+    assert record["ResultRows"] == [3]
+    assert record["FastTierQuestions"] == [1]
+    assert record["FastTierLatency"] == [120.0]
+    assert record["Escalated"] == [0]
+
+
+def test_stage_timing_callback_times_a_plain_chain(sales_db):
+    from fakes import FakeSagemakerRuntime, fake_llm
+    from langchain import SQLDatabaseChain
+
+    from text2sql.callbacks import StageTimingCallback
+    from text2sql.timing import StageTimings
+
+    timings = StageTimings()
+    chain = SQLDatabaseChain.from_llm(fake_llm(FakeSagemakerRuntime()), sales_db)
+    chain("What is total sale amount of Fruits", callbacks=[StageTimingCallback(timings)])
+    assert set(timings.as_dict()) == {"table_info", "sql_generation", "execution", "answer"}
@@ -0,0 +1,91 @@
+import gzip
+import io
+import json
+import time
+
+import pyarrow.parquet as pq
+import pytest
+
+from text2sql.database import QueryResult
+from text2sql.offload import ResultOffload
+
+BUCKET = "text2sql-test"
+
+
+def large_result(rows=2000):
+    return QueryResult(
+        columns=["user_id", "product", "price"],
+        rows=[(f"user-{i}", "Milk", i * 1.5) for i in range(rows)],
+    )
+
+
+def test_small_results_stay_inline(s3_client):
+    offload = ResultOffload(BUCKET, client=s3_client)
+    assert offload.offload(QueryResult(["price"], [(1.0,)])) is None
+    assert offload.offload("[(1.0,)]") is None
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=BUCKET)
+
+
+def test_writes_jsonl_and_returns_preview(s3_client):
+    offload = ResultOffload(BUCKET, threshold_bytes=1024, preview_rows=3, client=s3_client)
+    preview, pointer = offload.offload(large_result())
+
+    assert pointer["rows"] == 2000
+    assert pointer["uri"].startswith(f"s3://{BUCKET}/results/")
+    assert pointer["url"].startswith("https://")
+    assert preview.count("user-") == 3
+    assert preview.endswith(f"1997 more rows in {pointer['uri']}")
+
+    key = pointer["uri"].split("/", 3)[3]
+    body = s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+    lines = gzip.decompress(body).splitlines()
+    assert len(lines) == 2000
+    assert json.loads(lines[1]) == {"user_id": "user-1", "product": "Milk", "price": 1.5}
+
+
+def test_writes_parquet(s3_client):
+    offload = ResultOffload(BUCKET, threshold_bytes=1024, result_format="parquet", client=s3_client)
+    _, pointer = offload.offload(large_result())
+    key = pointer["uri"].split("/", 3)[3]
+    body = s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+    table = pq.read_table(io.BytesIO(body))
+    assert table.num_rows == 2000
+    assert table.column_names == ["user_id", "product", "price"]
+
+
+def test_same_result_shares_an_object(s3_client):
+    offload = ResultOffload(BUCKET, threshold_bytes=1024, client=s3_client)
+    _, first = offload.offload(large_result())
+    _, second = offload.offload(large_result())
+    assert first["uri"] == second["uri"]
+    assert len(s3_client.list_objects_v2(Bucket=BUCKET)["Contents"]) == 1
+
+
+def count_puts(client):
+    puts = []
+    client.meta.events.register("before-call.s3.PutObject", lambda **kwargs: puts.append(1))
+    return puts
+
+
+def test_object_about_to_expire_is_uploaded_again(s3_client):
+    now = time.time()
+    offload = ResultOffload(
+        BUCKET, threshold_bytes=1024, url_seconds=3600, expiration_days=1,
+        client=s3_client, clock=lambda: now,
+    )
+    puts = count_puts(s3_client)
+    offload.offload(large_result())
+    # 22 hours later the object would still be there when a 1-hour URL expires
+    now += 22 * 3600
+    offload.offload(large_result())
+    assert len(puts) == 1
+    # 23.5 hours later the lifecycle rule could delete it first
+    now += 1.5 * 3600
+    offload.offload(large_result())
+    assert len(puts) == 2
+
+
+def test_urls_must_expire_before_objects(s3_client):
+    with pytest.raises(ValueError):
+        ResultOffload(BUCKET, url_seconds=2 * 86400, expiration_days=1, client=s3_client)
+    assert ResultOffload(BUCKET, url_seconds=2 * 86400, expiration_days=0, client=s3_client)
@@ -0,0 +1,90 @@
+import pytest
+
+from text2sql.preflight import PreflightError, SQLPreflight, parse_table_info
+
+TABLE_INFO = """
+CREATE EXTERNAL TABLE sales (
+\ttransaction_date DATE,
+\tuser_id VARCHAR,
+\tproduct VARCHAR,
+\tprice DOUBLE
+)
+
+CREATE EXTERNAL TABLE sales_partitioned (
+\tuser_id VARCHAR,
+\tproduct VARCHAR,
+\tprice DOUBLE
+)
+COMMENT 'one partition per day'
+PARTITIONED BY (
+\ttransaction_date DATE
+)
+"""
+
+
+def check(sql, top_k=5, **kwargs):
+    return SQLPreflight(**kwargs).check(sql, TABLE_INFO, top_k, "awsathena")
+
+
+def test_parse_table_info_reads_columns_and_partitions():
+    schema = parse_table_info(TABLE_INFO)
+    assert set(schema) == {"sales", "sales_partitioned"}
+    assert schema["sales"].columns["price"] == "DOUBLE"
+    assert schema["sales_partitioned"].partition_keys == ["transaction_date"]
+
+
+def test_injects_limit():
+    report = check("SELECT product, price FROM sales")
+    assert report.limit_action == "injected"
+    assert report.sql.endswith("LIMIT 5")
+
+
+def test_caps_large_limit():
+    report = check("SELECT product FROM sales LIMIT 100000", max_limit=1000)
+    assert (report.limit, report.limit_action) == (1000, "capped")
+
+
+def test_leaves_aggregates_without_limit():
+    report = check("SELECT SUM(price) FROM sales WHERE product = 'Milk'")
+    assert report.limit_action is None
+    assert report.scopes[0].columns == ["price", "product"]
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("DROP TABLE sales", "read_only"),
+    ("DELETE FROM sales", "read_only"),
+    ("SELECT 1; SELECT 2", "statements"),
+    ("SELECT price FROM orders", "unknown_table"),
+    ("SELECT amount FROM sales", "unknown_column"),
+    ("SELECT FROM WHERE", "parse"),
+    ("SELECT * FROM read_csv('/proc/self/environ')", "file_access"),
+    ("SELECT read_text('/proc/self/environ')", "file_access"),
+    ("SELECT * FROM parquet_scan('s3://bucket/key.parquet')", "file_access"),
+    ("SELECT product FROM sales WHERE product IN (SELECT * FROM read_json_auto('/etc/passwd'))", "file_access"),
+    ("SELECT * FROM generate_series(1, 10)", "unknown_table"),
+    ("SELECT * FROM '/etc/passwd'", "unknown_table"),
+])
+def test_refuses(sql, reason):
+    with pytest.raises(PreflightError) as error:
+        check(sql)
+    assert error.value.reason == reason
+
+
+def test_allows_ctes():
+    report = check("WITH m AS (SELECT product FROM sales) SELECT product FROM m")
+    assert report.validated
+
+
+def test_counts_partitions():
+    report = check(
+        "SELECT SUM(price) FROM sales_partitioned "
+        "WHERE transaction_date BETWEEN DATE '2022-10-01' AND DATE '2022-10-31'",
+        max_partitions=31,
+    )
+    assert report.scopes[0].partitions == 31
+
+
+def test_refuses_unbounded_partition_scan():
+    with pytest.raises(PreflightError) as error:
+        check("SELECT SUM(price) FROM sales_partitioned", max_partitions=31)
+    assert error.value.reason == "scan_scope"
@@ -0,0 +1,62 @@
+from text2sql.result_cache import ResultCache, S3DataVersion, canonicalize_sql
+
+
+class Runs:
+    def __init__(self):
+        self.sql = []
+
+    def __call__(self, sql):
+        self.sql.append(sql)
+        return f"rows of {sql}"
+
+
+def test_canonical_sql_folds_case_only_outside_quotes():
+    assert canonicalize_sql("SELECT  SUM(price)\nFROM sales WHERE product = 'Ice Cream';") == \
+        "select sum(price) from sales where product = 'Ice Cream'"
+    assert canonicalize_sql('select "Product" from sales') == 'select "Product" from sales'
+    assert canonicalize_sql("select 1 where product = 'It''s  A'") == "select 1 where product = 'It''s  A'"
+    assert canonicalize_sql("SELECT 1 WHERE product = 'Milk'") != canonicalize_sql("SELECT 1 WHERE product = 'MILK'")
+
+
+def test_equivalent_query_is_a_hit(s3_client):
+    s3_client.put_object(Bucket="text2sql-test", Key="samples/data/retail.csv", Body=b"1")
+    cache = ResultCache(S3DataVersion("text2sql-test", client=s3_client))
+    run = Runs()
+
+    assert cache.get_or_run("SELECT SUM(price) FROM sales", run) == ("rows of SELECT SUM(price) FROM sales", False)
+    assert cache.get_or_run("select sum(price)\n  from sales;", run) == ("rows of SELECT SUM(price) FROM sales", True)
+    assert run.sql == ["SELECT SUM(price) FROM sales"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_changed_data_is_a_miss(s3_client):
+    s3_client.put_object(Bucket="text2sql-test", Key="samples/data/retail.csv", Body=b"1")
+    now = [0.0]
+    version = S3DataVersion("text2sql-test", client=s3_client, min_interval=30, clock=lambda: now[0])
+    cache = ResultCache(version)
+    run = Runs()
+    cache.get_or_run("SELECT 1", run)
+
+    s3_client.put_object(Bucket="text2sql-test", Key="samples/data/retail.csv", Body=b"2")
+    # the listing is reused within min_interval
+    assert cache.get_or_run("SELECT 1", run)[1] is True
+    now[0] = 30.0
+    assert cache.get_or_run("SELECT 1", run)[1] is False
+    assert len(run.sql) == 2
+
+
+def test_objects_outside_the_prefix_keep_the_token(s3_client):
+    s3_client.put_object(Bucket="text2sql-test", Key="samples/data/retail.csv", Body=b"1")
+    version = S3DataVersion("text2sql-test", client=s3_client, min_interval=0)
+    token = version.token()
+    s3_client.put_object(Bucket="text2sql-test", Key="results/abc.jsonl.gz", Body=b"x")
+    assert version.token() == token
+
+
+def test_invalidate_drops_every_entry(s3_client):
+    cache = ResultCache(S3DataVersion("text2sql-test", client=s3_client))
+    run = Runs()
+    cache.get_or_run("SELECT 1", run)
+    cache.invalidate()
+    assert cache.get_or_run("SELECT 1", run)[1] is False
+    assert run.sql == ["SELECT 1", "SELECT 1"]
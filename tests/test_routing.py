@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+from text2sql.routing import FAST, STRONG, BedrockCompletion, ModelRouter
+
+TABLE_INFO = """
+CREATE TABLE sales (
+\ttransaction_date DATE,
+\tuser_id VARCHAR,
+\tproduct VARCHAR,
+\tprice DOUBLE
+)
+"""
+
+
+def test_simple_questions_go_to_the_fast_model():
+    router = ModelRouter("fast", "strong")
+    route = router.classify("What is total sale amount of Milk", TABLE_INFO)
+    assert route.tier == FAST
+    assert router.llm(route.tier) == "fast"
+
+
+def test_complex_questions_go_to_the_strong_model():
+    router = ModelRouter("fast", "strong")
+    for question in (
+            "Compare the monthly revenue of Milk versus Chips",
+            "Which users bought Milk but never bought Chips",
+            "Show the running total of daily sales of Milk",
+    ):
+        assert router.classify(question, TABLE_INFO).tier == STRONG, question
+
+
+def test_threshold_moves_the_boundary():
+    question = "Which users bought Milk but never bought Chips"
+    assert ModelRouter("fast", "strong", threshold=100).classify(question).tier == FAST
+
+
+def test_stats_count_routes_and_escalations():
+    router = ModelRouter("fast", "strong")
+    router.classify("What is total sale amount of Milk")
+    router.classify("What is total sale amount of Chips")
+    router.record_escalation(succeeded=True)
+    assert router.stats() == {
+        "fast": 2, "strong": 0, "escalations": 1, "failed_escalations": 0, "escalation_rate": 0.5,
+    }
+
+
+class FakeBedrockRuntime:
+    def __init__(self):
+        self.bodies = []
+
+    def invoke_model(self, body, modelId, accept, contentType):
+        self.bodies.append(json.loads(body))
+        payload = json.dumps({"completion": " SELECT 1\nSQLResult: x"}).encode("utf-8")
+        return {"body": io.BytesIO(payload)}
+
+
+def test_bedrock_completion_frames_anthropic_prompts():
+    client = FakeBedrockRuntime()
+    llm = BedrockCompletion(model_id="anthropic.claude-v1", client=client)
+    text = llm("Question: hi\nSQLQuery:", stop=["\nSQLResult:"], do_sample=True, seed=1, temperature=0.7)
+
+    assert text == " SELECT 1"
+    body = client.bodies[0]
+    assert body["prompt"] == "\n\nHuman: Question: hi\nSQLQuery:\n\nAssistant:"
+    assert body["temperature"] == 0.7
+    assert "do_sample" not in body and "seed" not in body
+
+
+def test_bedrock_llm_needs_bedrock_runtime(monkeypatch):
+    import boto3
+    from botocore.exceptions import UnknownServiceError
+
+    from text2sql.routing import bedrock_llm
+
+    def client(service_name, **kwargs):
+        raise UnknownServiceError(service_name=service_name, known_service_names=["s3"])
+
+    monkeypatch.setattr(boto3, "client", client)
+    with pytest.raises(RuntimeError, match="bedrock-runtime"):
+        bedrock_llm("anthropic.claude-v1", region_name="us-east-1")
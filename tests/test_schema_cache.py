@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from text2sql.schema_cache import SchemaCache
+
+
+def entry(**overrides):
+    item = {
+        "database": "sqlite:///sales.db",
+        "tables": ["sales"],
+        "sample_rows": 3,
+        "stored_at": 100.0,
+        "table_info": "CREATE TABLE sales (...)",
+    }
+    item.update(overrides)
+    return item
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps([entry()]))
+    cache = SchemaCache(persist_path=str(path), clock=lambda: 200.0)
+    assert cache.stats()["entries"] == 1
+
+
+def test_expired_entries_are_skipped(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps([entry(stored_at=0.0)]))
+    cache = SchemaCache(ttl_seconds=10, persist_path=str(path), clock=lambda: 200.0)
+    assert cache.stats()["entries"] == 0
+    assert path.exists()
+
+
+def test_missing_snapshot_is_a_miss(tmp_path):
+    cache = SchemaCache(persist_path=str(tmp_path / "absent.json"))
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("content", [
+    json.dumps([entry()])[:40],
+    json.dumps({"database": "sqlite:///sales.db"}),
+    json.dumps([entry(), {"database": "sqlite:///sales.db"}]),
+    json.dumps([entry(tables=None)]),
+    json.dumps([entry(stored_at="yesterday")]),
+    json.dumps([entry(table_info=["sales"])]),
+    json.dumps(None),
+    json.dumps([1, 2]),
+])
+def test_bad_snapshot_is_discarded(tmp_path, capsys, content):
+    path = tmp_path / "schema.json"
+    path.write_text(content)
+    cache = SchemaCache(persist_path=str(path), clock=lambda: 200.0)
+    assert cache.stats()["entries"] == 0
+    assert not path.exists()
+    log = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert log["schema_cache"] == "discarded snapshot"
@@ -0,0 +1,70 @@
+import pytest
+from langchain import SQLDatabase
+from sqlalchemy import create_engine, text
+
+from text2sql.schema_index import SchemaIndex, tokenize
+
+TABLES = {
+    "sales": "transaction_date DATE, user_id VARCHAR, product VARCHAR, price DOUBLE",
+    "users": "user_id VARCHAR, full_name VARCHAR, email VARCHAR",
+    "inventory": "warehouse VARCHAR, sku VARCHAR, quantity INTEGER",
+    "shipments": "carrier VARCHAR, tracking_number VARCHAR, shipped_at DATE",
+    "employees": "employee_name VARCHAR, department VARCHAR, salary DOUBLE",
+}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    with engine.begin() as connection:
+        for name, columns in TABLES.items():
+            connection.execute(text(f"CREATE TABLE {name} ({columns})"))
+    return SQLDatabase(engine, sample_rows_in_table_info=0)
+
+
+def test_tokenize_splits_and_folds_plurals():
+    assert tokenize("TransactionDate of product_names and categories") == [
+        "transaction", "date", "product", "name", "category",
+    ]
+
+
+def test_question_on_sales_columns_selects_sales(catalog, monkeypatch):
+    monkeypatch.setenv("SCHEMA_INDEX_TOP_K", "2")
+    index = SchemaIndex.from_env()
+
+    tables, report = index.select(catalog, "What is the total price of each product per transaction date?")
+    assert tables[0] == "sales"
+    assert len(tables) <= 2
+    assert report["candidates"] == len(TABLES)
+    assert report["saved_tokens"] == report["schema_tokens_all"] - report["schema_tokens"] > 0
+
+
+def test_question_matching_no_table_falls_back_to_all(catalog):
+    index = SchemaIndex(top_k=2)
+
+    tables, report = index.select(catalog, "Hello there, how are you?")
+    assert tables is None
+    assert report["tables"] is None and report["saved_tokens"] == 0
+    assert index.stats()["fallbacks"] == 1
+
+
+def test_small_catalog_is_sent_whole(catalog):
+    index = SchemaIndex(top_k=len(TABLES))
+    assert index.select(catalog, "total price of Milk")[0] is None
+    assert index.stats()["fallbacks"] == 0
+
+
+def test_refresh_reindexes_only_changed_tables(catalog):
+    now = [0.0]
+    index = SchemaIndex(top_k=2, ttl_seconds=60, clock=lambda: now[0])
+    index.select(catalog, "price of products")
+    assert index.stats()["updated_tables"] == len(TABLES)
+
+    with catalog._engine.begin() as connection:
+        connection.execute(text("CREATE TABLE refunds (refund_reason VARCHAR, amount DOUBLE)"))
+    catalog = SQLDatabase(catalog._engine, sample_rows_in_table_info=0)
+    index.select(catalog, "price of products")
+    assert index.stats()["refreshes"] == 1
+    now[0] = 60.0
+    assert index.select(catalog, "refund reasons")[0][0] == "refunds"
+    assert index.stats()["updated_tables"] == len(TABLES) + 1
@@ -0,0 +1,56 @@
+from text2sql.database import QueryResult
+from text2sql.serialize import CHARS_PER_TOKEN, estimate_tokens, serialize_result
+
+
+def test_small_result_is_written_column_by_column():
+    result = QueryResult(["product", "price"], [("Milk", 1.5), ("Chips|Dip", None)])
+    text, decision = serialize_result(result)
+    assert text == "product: Milk|Chips/Dip\nprice: 1.5|"
+    assert decision == {"mode": "full", "rows": 2, "rows_shown": 2, "columns_shown": 2, "tokens": 9}
+
+
+def test_many_rows_switch_to_a_summary_with_leading_rows():
+    result = QueryResult(["product", "price"], [("Milk", 1.5), ("Chips", 2.0)] * 100)
+    text, decision = serialize_result(result, token_budget=100, max_rows=50)
+    lines = text.splitlines()
+    assert lines[:3] == [
+        "200 rows; column summary:",
+        "product: count=200 distinct=2 top=Milk (100), Chips (100)",
+        "price: count=200 sum=350 min=1.5 max=2 mean=1.75",
+    ]
+    shown = decision["rows_shown"]
+    assert 0 < shown < 50
+    assert lines[3] == f"first {shown} rows:"
+    assert lines[5] == "price: " + "|".join(["1.5", "2"] * (shown // 2) + ["1.5"] * (shown % 2))
+    assert decision["mode"] == "summary" and decision["columns_shown"] == 2
+    assert decision["tokens"] <= 100
+
+
+def test_wide_result_lists_only_the_columns_that_fit():
+    columns = [f"c{i}" for i in range(60)]
+    result = QueryResult(columns, [tuple(row * i for i in range(60)) for row in range(500)])
+    text, decision = serialize_result(result, token_budget=200)
+    assert decision["mode"] == "summary"
+    assert decision["tokens"] == estimate_tokens(text) <= 200
+    assert decision["rows_shown"] == 0
+    assert 0 < decision["columns_shown"] < 60
+    assert text.splitlines()[-1] == f"... {60 - decision['columns_shown']} more columns"
+
+
+def test_budget_too_small_for_the_header_cuts_the_text():
+    result = QueryResult(["total"], [(i,) for i in range(100)])
+    text, decision = serialize_result(result, token_budget=3, max_rows=10)
+    assert len(text) <= 3 * CHARS_PER_TOKEN and text.endswith("...")
+    assert decision["tokens"] <= 3
+
+
+def test_plain_text_is_cut_to_the_budget():
+    text, decision = serialize_result("x" * 1000, token_budget=10)
+    assert text == "x" * (10 * CHARS_PER_TOKEN - 3) + "..."
+    assert decision == {"mode": "truncated", "tokens": 10}
+    assert serialize_result("[(1,)]", token_budget=10) == ("[(1,)]", {"mode": "full", "tokens": 2})
+
+
+def test_statement_without_rows_is_empty():
+    result = QueryResult([], returns_rows=False)
+    assert serialize_result(result) == ("", {"mode": "full", "rows": 0, "rows_shown": 0, "tokens": 0})
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from text2sql.database import CancelToken, QueryCancelled
+from text2sql.speculative import SQLCandidateRace
+
+
+def racing():
+    """``run(sql, token)`` where each SQL text names its outcome.
+
+    "ok" returns at once, "fail" raises at once and "slow" runs until its
+    token is cancelled.
+    """
+    stopped = {}
+
+    def run(sql, token):
+        if sql.startswith("fail"):
+            raise ValueError(sql)
+        if sql.startswith("slow"):
+            stop = threading.Event()
+            token.attach(stop.set)
+            stopped[sql] = (token, stop)
+            if not stop.wait(5):
+                return f"rows of {sql}"
+            raise QueryCancelled(sql)
+        # let the slow candidates start first
+        time.sleep(0.05)
+        return f"rows of {sql}"
+
+    return run, stopped
+
+
+def test_first_success_wins_and_the_rest_are_cancelled():
+    race = SQLCandidateRace()
+    run, stopped = racing()
+
+    result = race.run([(0, "slow 0"), (1, "ok 1"), (2, "slow 2")], run)
+    assert (result.index, result.sql, result.result) == (1, "ok 1", "rows of ok 1")
+    assert (result.executed, result.failed, result.cancelled) == (3, 0, 2)
+    for token, stop in stopped.values():
+        assert token.cancelled and stop.is_set()
+    assert race.stats()["sampled_wins"] == 1
+    assert race.stats()["queries_cancelled"] == 2
+
+
+def test_failed_candidates_do_not_win():
+    race = SQLCandidateRace()
+    run, _ = racing()
+
+    result = race.run([(0, "fail 0"), (1, "ok 1")], run)
+    assert (result.index, result.failed) == (1, 1)
+
+
+def test_all_failing_raises_the_primary_error():
+    race = SQLCandidateRace()
+    run, _ = racing()
+
+    with pytest.raises(ValueError, match="fail 0"):
+        race.run([(2, "fail 2"), (0, "fail 0"), (1, "fail 1")], run)
+    assert race.stats()["exhausted"] == 1
+    assert race.stats()["candidates_failed"] == 3
+
+
+def test_token_cancelled_before_the_query_starts():
+    token = CancelToken()
+    assert token.cancel() is False
+    with pytest.raises(QueryCancelled):
+        token.attach(lambda: None)
+
+
+def test_cancel_interrupts_a_running_sqlite_query(sales_db):
+    from sqlalchemy.exc import OperationalError
+
+    token = CancelToken()
+    endless = (
+        "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+        "SELECT COUNT(*) FROM c"
+    )
+    timer = threading.Timer(0.2, token.cancel)
+    timer.start()
+    with pytest.raises(OperationalError, match="interrupted"):
+        sales_db.run_query(endless, cancel_token=token)
+    timer.join()
+    assert token.cancelled
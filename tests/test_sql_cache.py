@@ -0,0 +1,42 @@
+from text2sql.sql_cache import InMemoryBackend, QuestionSQLCache, normalize_question
+
+
+def test_normalize_folds_case_and_whitespace():
+    assert normalize_question("  What is  total\tSALE amount ") == "what is total sale amount"
+
+
+def test_normalize_drops_only_trailing_sentence_punctuation():
+    assert normalize_question("Total sale amount of Milk?") == "total sale amount of milk"
+    assert normalize_question("Users who spent over $1,000.") == "users who spent over $1,000"
+
+
+def test_operators_and_signs_are_kept_apart():
+    make_key = QuestionSQLCache.make_key
+    assert make_key("Orders with price > 100") != make_key("Orders with price < 100")
+    assert make_key("Products with growth above 5%") != make_key("Products with growth above 5")
+    assert make_key("Days with change of -5") != make_key("Days with change of 5")
+
+
+def test_get_put_invalidate():
+    cache = QuestionSQLCache()
+    assert cache.get("total of Milk") is None
+    cache.put("total of Milk", "SELECT 1")
+    assert cache.get("TOTAL of   milk") == "SELECT 1"
+    cache.invalidate("total of milk")
+    assert cache.get("total of Milk") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 0.3333}
+
+
+def test_scope_separates_entries():
+    cache = QuestionSQLCache()
+    cache.put("total of Milk", "SELECT 1", scope=["db1"])
+    assert cache.get("total of Milk", scope=["db2"]) is None
+
+
+def test_in_memory_backend_evicts_least_recent():
+    backend = InMemoryBackend(max_size=2)
+    backend.put("a", "1")
+    backend.put("b", "2")
+    backend.get("a")
+    backend.put("c", "3")
+    assert (backend.get("a"), backend.get("b"), backend.evictions) == ("1", None, 1)
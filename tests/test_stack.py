@@ -0,0 +1,128 @@
+import os
+
+import pytest
+
+os.environ.setdefault("JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION", "1")
+
+import aws_cdk as cdk  # noqa: E402
+from aws_cdk.assertions import Match, Template  # noqa: E402
+
+from stack.cdk_stack import RESULT_OFFLOAD_EXPIRATION_DAYS, RESULT_OFFLOAD_PREFIX, WorkshopStack  # noqa: E402
+from tests.conftest import ROOT  # noqa: E402
+
+# asset paths in the stack are relative to the project root, as under `cdk synth`
+pytestmark = pytest.mark.skipif(os.getcwd() != ROOT, reason="run from the project root")
+
+
+def synth(**context):
+    app = cdk.App(context=context)
+    return Template.from_stack(WorkshopStack(app, "genai-text-to-sql-workshop"))
+
+
+@pytest.fixture(scope="module")
+def template():
+    return synth()
+
+
+@pytest.fixture(scope="module")
+def partitioned():
+    return synth(table_format="partitioned", query_backend="duckdb", enable_streaming=True)
+
+
+def test_csv_table_is_not_partitioned(template):
+    template.has_resource_properties("AWS::Glue::Table", {
+        "TableInput": Match.object_like({
+            "PartitionKeys": Match.absent(),
+            "StorageDescriptor": Match.object_like({
+                "Location": Match.any_value(),
+                "Compressed": False,
+            }),
+        }),
+    })
+
+
+def test_partitioned_table_uses_partition_projection(partitioned):
+    partitioned.has_resource_properties("AWS::Glue::Table", {
+        "TableInput": Match.object_like({
+            "PartitionKeys": [{"Name": "transaction_date", "Type": "date", "Comment": "Transaction date"}],
+            "Parameters": Match.object_like({
+                "projection.enabled": "true",
+                "projection.transaction_date.type": "date",
+                "projection.transaction_date.format": "yyyy-MM-dd",
+                "projection.transaction_date.range": "2022-01-01,NOW",
+                "projection.transaction_date.interval.unit": "DAYS",
+                "storage.location.template": Match.any_value(),
+            }),
+            "StorageDescriptor": Match.object_like({
+                "Columns": [
+                    Match.object_like({"Name": "user_id"}),
+                    Match.object_like({"Name": "product"}),
+                    Match.object_like({"Name": "price"}),
+                ],
+            }),
+        }),
+    })
+
+
+def function_environment(template, **variables):
+    functions = template.find_resources("AWS::Lambda::Function", {
+        "Properties": {"Environment": {"Variables": Match.object_like(variables)}},
+    })
+    assert len(functions) == 1, variables
+    (function,) = functions.values()
+    return function["Properties"]["Environment"]["Variables"]
+
+
+def test_custom_function_environment(template):
+    env = function_environment(template, METRICS_SERVICE="CustomLambdaFn")
+    assert env["QUERY_BACKEND"] == "athena"
+    assert env["RESULT_OFFLOAD_PREFIX"] == RESULT_OFFLOAD_PREFIX
+    assert env["RESULT_OFFLOAD_EXPIRATION_DAYS"] == str(RESULT_OFFLOAD_EXPIRATION_DAYS)
+    assert env["RESULT_CACHE_DATA_PREFIX"] == "samples/data/"
+    assert "ROUTER_STRONG_MODEL" not in env
+
+
+def test_context_reaches_the_functions(partitioned):
+    custom = function_environment(partitioned, METRICS_SERVICE="CustomLambdaFn")
+    streaming = function_environment(partitioned, STREAM_TOKENS="true")
+    for env in (custom, streaming):
+        assert env["QUERY_BACKEND"] == "duckdb"
+        assert env["RESULT_CACHE_DATA_PREFIX"] == "samples/data_partitioned/"
+        assert env["RESULT_OFFLOAD_PREFIX"] == RESULT_OFFLOAD_PREFIX
+
+
+def test_results_expire_from_the_data_bucket(template):
+    template.has_resource_properties("AWS::S3::Bucket", {
+        "LifecycleConfiguration": {
+            "Rules": [{
+                "ExpirationInDays": RESULT_OFFLOAD_EXPIRATION_DAYS,
+                "Prefix": RESULT_OFFLOAD_PREFIX,
+                "Status": "Enabled",
+            }],
+        },
+    })
+
+
+def dashboard_body(template):
+    (dashboard,) = template.find_resources("AWS::CloudWatch::Dashboard").values()
+    parts = dashboard["Properties"]["DashboardBody"]["Fn::Join"][1]
+    return "".join(part for part in parts if isinstance(part, str))
+
+
+def test_dashboard_panels_follow_the_function(template):
+    body = dashboard_body(template)
+    for title in ("cache hit rate", "result rows", "model routing", "cold starts and errors"):
+        assert f"CustomLambdaFn {title}" in body
+    assert "PlayGroundLambdaFn cold starts and errors" in body
+    for title in ("cache hit rate", "result rows", "model routing"):
+        assert f"PlayGroundLambdaFn {title}" not in body
+
+
+def test_streaming_function_reports_time_to_first_token(partitioned):
+    env = function_environment(partitioned, STREAM_TOKENS="true")
+    assert env["METRICS_SERVICE"] == "CustomStreamingLambdaFn"
+    assert "CustomStreamingLambdaFn time to first insight token (ms)" in dashboard_body(partitioned)
+    partitioned.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "Dimensions": [{"Name": "Service", "Value": "CustomStreamingLambdaFn"}],
+        "MetricName": "Duration",
+    })
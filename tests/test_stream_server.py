@@ -0,0 +1,73 @@
+import datetime
+import http.client
+import json
+import threading
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from text2sql.metrics import EMFMetrics
+
+
+class FakeWarmChain:
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def run(self, fn):
+        return fn(self.chain)
+
+    def chain(self, inputs, return_only_outputs=False):
+        for callback in inputs["insight_callbacks"]:
+            callback.on_llm_new_token("Fruits")
+            callback.on_llm_new_token(" sell")
+        return self.outputs
+
+    def stats(self):
+        return {"hits": 1, "builds": 1}
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    import stream_server
+
+    metrics = EMFMetrics("CustomStreamingLambdaFn")
+    monkeypatch.setattr(stream_server, "metrics", metrics)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stream_server.StreamRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(outputs):
+        monkeypatch.setattr(stream_server, "warm_chain", FakeWarmChain(outputs))
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        connection.request("POST", "/", body=json.dumps({"question": "Total of Fruits"}))
+        response = connection.getresponse()
+        return response.status, [json.loads(line) for line in response.read().splitlines()]
+
+    yield post
+    server.shutdown()
+
+
+def test_tokens_then_a_result_with_dates_and_decimals(stream, capsys):
+    status, events = stream({"result": [[datetime.date(2022, 9, 1), Decimal("15.5")]]})
+    assert status == 200
+    assert events == [
+        {"type": "token", "text": "Fruits"},
+        {"type": "token", "text": " sell"},
+        {"type": "result", "sql": {"result": [["2022-09-01", 15.5]]}},
+    ]
+    (record,) = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert record["Service"] == "CustomStreamingLambdaFn"
+    assert len(record["TimeToFirstToken"]) == 1
+    assert record["Questions"] == [1]
+    units = {m["Name"]: m["Unit"] for m in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert units["TimeToFirstToken"] == "Milliseconds"
+
+
+def test_unserializable_event_becomes_an_error_event():
+    from stream_server import encode_event
+
+    outputs = {}
+    outputs["self"] = outputs
+    event = json.loads(encode_event({"type": "result", "sql": outputs}))
+    assert event["type"] == "error"
+    assert event["message"].startswith("result event not serializable")
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from langchain.callbacks.base import AsyncCallbackHandler
+
+from text2sql.streaming import StreamingSagemakerEndpoint, TokenForwarder
+
+
+class OldSagemakerRuntime:
+    """A client from a botocore without SageMaker response streaming."""
+
+    def invoke_endpoint(self, **kwargs):
+        raise AssertionError("not called")
+
+
+@pytest.fixture
+def old_botocore(monkeypatch):
+    import boto3
+
+    monkeypatch.setattr(boto3.Session, "client", lambda self, *args, **kwargs: OldSagemakerRuntime())
+
+
+def endpoint(**kwargs):
+    from insight_chain import ContentHandler
+
+    return StreamingSagemakerEndpoint(
+        endpoint_name="fake-endpoint",
+        region_name="us-east-1",
+        content_handler=ContentHandler(),
+        **kwargs,
+    )
+
+
+def test_streaming_needs_response_stream_api(old_botocore):
+    with pytest.raises(ValueError, match="--keep-runtime-packages"):
+        endpoint(streaming=True)
+
+
+def test_old_client_is_fine_without_streaming(old_botocore):
+    assert isinstance(endpoint().client, OldSagemakerRuntime)
+
+
+def test_current_botocore_streams():
+    assert endpoint(streaming=True).streaming
+
+
+class CollectTokens(AsyncCallbackHandler):
+    def __init__(self):
+        self.tokens = []
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.tokens.append(token)
+
+
+def respond(prompt):
+    return "SELECT SUM(price) FROM sales WHERE product = 'Milk'"
+
+
+def test_async_streaming_reports_tokens_in_order():
+    from fakes import FakeSagemakerRuntime, fake_llm
+
+    llm = fake_llm(FakeSagemakerRuntime(responder=respond), streaming=True)
+    collect, forwarded = CollectTokens(), []
+    text = asyncio.run(llm.apredict("Question", callbacks=[collect, TokenForwarder(forwarded.append)]))
+
+    assert text == respond("Question")
+    assert "".join(collect.tokens) == text
+    assert len(collect.tokens) == len(text.split(" "))
+    assert forwarded == collect.tokens
+
+
+def test_async_call_without_streaming_reports_no_tokens():
+    from fakes import FakeSagemakerRuntime, fake_llm
+
+    llm = fake_llm(FakeSagemakerRuntime(responder=respond))
+    collect = CollectTokens()
+    assert asyncio.run(llm.apredict("Question", callbacks=[collect])) == respond("Question")
+    assert collect.tokens == []
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from text2sql.templates import IntentTemplates
+
+SQL = "SELECT SUM(price) FROM sales WHERE product = '{}'"
+
+
+@pytest.fixture
+def templates(sales_db):
+    templates = IntentTemplates(min_support=2)
+    templates.load_values(sales_db)
+    return templates
+
+
+def test_extracts_known_values_and_numbers(templates):
+    pattern, slots = templates.extract("Top 5 users by spend on Ice cream")
+    assert pattern == "top <number> users by spend on <product>"
+    assert [(s.name, s.value) for s in slots] == [("number_0", 5), ("product_0", "Ice cream")]
+
+
+def test_operators_stay_in_the_pattern(templates):
+    above, _ = templates.extract("Users who paid > 100 for Milk?")
+    below, _ = templates.extract("Users who paid < 100 for Milk")
+    assert above == "users who paid > <number> for <product>"
+    assert below == "users who paid < <number> for <product>"
+
+
+def test_learns_after_min_support(templates, sales_db):
+    assert not templates.learn(sales_db, "What is total sale amount of Milk", SQL.format("Milk"))
+    assert templates.match(sales_db, "What is total sale amount of Chips") is None
+    assert templates.learn(sales_db, "What is total sale amount of Chips", SQL.format("Chips"))
+
+    match = templates.match(sales_db, "What is total sale amount of Fruits")
+    assert match.sql == SQL.format("Fruits")
+    assert match.slots == {"product_0": "Fruits"}
+
+
+def test_unknown_values_are_not_matched(templates, sales_db):
+    for product in ("Milk", "Chips"):
+        templates.learn(sales_db, f"What is total sale amount of {product}", SQL.format(product))
+    assert templates.match(sales_db, "What is total sale amount of Bread") is None
+
+
+def test_sql_without_the_value_is_not_learned(templates, sales_db):
+    sql = "SELECT SUM(price) FROM sales"
+    assert not templates.learn(sales_db, "What is total sale amount of Milk", sql)
+    assert not templates.learn(sales_db, "What is total sale amount of Chips", sql)
+
+
+def test_invalidate_forgets_template(templates, sales_db):
+    for product in ("Milk", "Chips"):
+        templates.learn(sales_db, f"What is total sale amount of {product}", SQL.format(product))
+    match = templates.match(sales_db, "What is total sale amount of Fruits")
+    templates.invalidate(match)
+    assert templates.match(sales_db, "What is total sale amount of Fruits") is None
+    assert templates.stats()["templates"] == 0
+
+
+def test_expired_values_refresh_in_the_background(sales_db, monkeypatch):
+    now = [0.0]
+    templates = IntentTemplates(ttl_seconds=60, clock=lambda: now[0])
+    templates.load_values(sales_db)
+
+    threads = []
+    monkeypatch.setattr(templates, "load_values", lambda db: threads.append(threading.current_thread()))
+    templates.match(sales_db, "What is total sale amount of Milk")
+    assert threads == []
+
+    now[0] = 61.0
+    assert templates.match(sales_db, "What is total sale amount of Milk") is None
+    for thread in threading.enumerate():
+        if thread.name == "template-values":
+            thread.join()
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+    # the values are still the old ones, so the question was matched against them
+    assert templates.extract("What is total sale amount of Milk")[0] == "what is total sale amount of <product>"
+
+
+def test_values_load_inline_before_the_first_match(sales_db):
+    templates = IntentTemplates()
+    templates.match(sales_db, "What is total sale amount of Milk")
+    assert templates.extract("Total of Chips")[0] == "total of <product>"